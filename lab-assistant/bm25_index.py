@@ -0,0 +1,130 @@
+# Langchain dependencies
+from langchain.schema import Document # Importing Document schema from Langchain
+
+from collections import Counter # Importing Counter for term frequencies
+import heapq # Importing heapq to pick the top-k scores
+import json # Importing json module to store chunk metadata
+import math # Importing math for the IDF logarithm
+import os # Importing os module for operating system functionalities
+import re # Importing re module for tokenization
+import sqlite3 # Importing sqlite3 for the on-disk inverted index
+import threading # Importing threading so the index can be shared across worker threads
+
+from .constants import CHROMA_PATH, BM25_INDEX_FILE # Importing constants from constants.py
+
+# Keeps reagent names and catalogue numbers such as "A1234-56", "v2.1" or "p/n" together
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+STOPWORDS = frozenset(
+  "a an and are as at be by for from has how in is it of on or that the this to was what when where which who why with".split()
+)
+
+def tokenize(text: str) -> list[str]:
+  """
+  Split text into lowercase search terms. Compound tokens are kept whole and also split into
+  their parts, so "A1234-56" matches both "a1234-56" and "a1234".
+  Args:
+    text (str): Text to tokenize.
+  Returns:
+    list[str]: The terms, stopwords removed.
+  """
+  terms = []
+  for token in TOKEN_PATTERN.findall(text.lower()):
+    terms.append(token)
+    if not token.isalnum():
+      terms.extend(re.split(r"[-./]", token))
+  return [term for term in terms if term not in STOPWORDS]
+
+class BM25Index:
+  """
+  On-disk BM25 inverted index over the chunks, kept in SQLite next to the vector store.
+  Scores are normalised by the score of an average-length chunk containing every query term
+  once and capped at 1, so they read as the share of the query's IDF weight a chunk matches
+  and can be compared against a relevance threshold.
+  """
+
+  def __init__(self, persist_directory: str = CHROMA_PATH, k1: float = 1.5, b: float = 0.75):
+    self.k1 = k1
+    self.b = b
+    os.makedirs(persist_directory, exist_ok=True)
+    self.lock = threading.Lock()
+    self.conn = sqlite3.connect(os.path.join(persist_directory, BM25_INDEX_FILE), check_same_thread=False)
+    self.conn.execute("CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, source TEXT, length INTEGER NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL)")
+    self.conn.execute("CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL, PRIMARY KEY (term, doc_id)) WITHOUT ROWID")
+    self.conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_doc_id ON postings (doc_id)")
+    self.conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_source ON docs (source)")
+    self.conn.commit()
+
+  def __len__(self) -> int:
+    with self.lock:
+      return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+  def add_documents(self, documents: list[Document], ids: list[str]):
+    """Index documents under the given IDs, replacing any with the same IDs."""
+    self.delete(ids)
+    with self.lock:
+      for doc_id, doc in zip(ids, documents):
+        terms = Counter(tokenize(doc.page_content))
+        self.conn.execute(
+          "INSERT OR REPLACE INTO docs (doc_id, source, length, text, metadata) VALUES (?, ?, ?, ?, ?)",
+          (doc_id, doc.metadata.get("source"), sum(terms.values()), doc.page_content, json.dumps(doc.metadata)),
+        )
+        self.conn.executemany(
+          "INSERT OR REPLACE INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+          ((term, doc_id, tf) for term, tf in terms.items()),
+        )
+
+  def delete(self, ids: list[str]):
+    """Remove documents by ID; unknown IDs are ignored."""
+    with self.lock:
+      self.conn.executemany("DELETE FROM postings WHERE doc_id = ?", ((doc_id,) for doc_id in ids))
+      self.conn.executemany("DELETE FROM docs WHERE doc_id = ?", ((doc_id,) for doc_id in ids))
+
+  def persist(self):
+    with self.lock:
+      self.conn.commit()
+
+  def search(self, query_text: str, k: int, sources: list[str] = None) -> list[tuple[Document, float]]:
+    """
+    Find the k chunks with the highest BM25 score for a query.
+    Args:
+      query_text (str): The question.
+      k (int): Number of results.
+      sources (list[str], optional): Only return chunks from these source files.
+    Returns:
+      list[tuple[Document, float]]: (document, normalised score) pairs, best first.
+    """
+    terms = set(tokenize(query_text))
+    if not terms:
+      return []
+    source_filter, source_params = "", []
+    if sources:
+      source_filter = f" AND d.source IN ({','.join('?' * len(sources))})"
+      source_params = list(sources)
+
+    with self.lock:
+      doc_count, average_length = self.conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+      if not doc_count:
+        return []
+      scores = Counter()
+      full_match = 0.0
+      for term in terms:
+        document_frequency = self.conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+        idf = math.log(1 + (doc_count - document_frequency + 0.5) / (document_frequency + 0.5))
+        full_match += idf
+        postings = self.conn.execute(
+          "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.doc_id = p.doc_id WHERE p.term = ?" + source_filter,
+          [term] + source_params,
+        )
+        for doc_id, tf, length in postings:
+          scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / average_length))
+
+      top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+      results = []
+      for doc_id, score in top:
+        text, metadata = self.conn.execute("SELECT text, metadata FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+        results.append((Document(page_content=text, metadata=json.loads(metadata)), min(score / full_match, 1.0)))
+      return results
+
+  def search_many(self, query_texts: list[str], k: int, sources: list[str] = None) -> list[list[tuple[Document, float]]]:
+    """Run search for several questions."""
+    return [self.search(query_text, k, sources) for query_text in query_texts]
@@ -1,3 +1,13 @@
 # Path to the directory to save Chroma database
 CHROMA_PATH = "chroma"
-DEFAULT_DATA_PATH = "data/"
\ No newline at end of file
+DEFAULT_DATA_PATH = "data/"
+# Manifest of indexed source files (path -> content hash -> chunk IDs), kept with the Chroma database
+MANIFEST_PATH = "chroma/manifest.json"
+# Directory of the persistent embedding cache shared by indexing and querying
+EMBEDDING_CACHE_PATH = "embedding_cache"
+# Number of chunks embedded and upserted per batch while indexing
+INDEX_BATCH_SIZE = 256
+# File in the Chroma directory recording which embedding backend built the index
+EMBEDDING_BACKEND_FILE = "embedding_backend.json"
+# File in the index directory holding the BM25 inverted index over the chunks
+BM25_INDEX_FILE = "bm25.sqlite3"
@@ -0,0 +1,163 @@
+# Langchain dependencies
+from langchain.embeddings import OpenAIEmbeddings # Importing OpenAI embeddings from Langchain
+from langchain_core.embeddings import Embeddings # Importing the embeddings interface from Langchain
+
+import json # Importing json module to read and write the index's backend record
+import os # Importing os module for operating system functionalities
+
+from .constants import CHROMA_PATH, EMBEDDING_BACKEND_FILE # Importing constants from constants.py
+
+class EmbeddingBackendMismatch(ValueError):
+  """
+  Raised when an index was built with a different embedding backend than the one used to read or update it.
+  """
+
+class EmbeddingBackend(Embeddings):
+  """
+  Embedding function with a stable identity, e.g. "openai:text-embedding-ada-002".
+  Vectors from backends with different identities are not comparable, so the identity is
+  recorded with the index and used as the embedding cache key.
+  """
+
+  identity: str
+
+  def embed_queries(self, texts: list[str]) -> list[list[float]]:
+    """Embed several query texts, by default one at a time."""
+    return [self.embed_query(text) for text in texts]
+
+class OpenAIBackend(EmbeddingBackend):
+  """
+  OpenAI embeddings over the network.
+  """
+
+  def __init__(self, model_name: str = None):
+    self.embeddings = OpenAIEmbeddings(model=model_name) if model_name else OpenAIEmbeddings()
+    self.identity = f"openai:{self.embeddings.model}"
+
+  def embed_documents(self, texts: list[str]) -> list[list[float]]:
+    return self.embeddings.embed_documents(texts)
+
+  def embed_query(self, text: str) -> list[float]:
+    return self.embeddings.embed_query(text)
+
+  def embed_queries(self, texts: list[str]) -> list[list[float]]:
+    # OpenAI embeds queries and documents the same way, so a batch of queries is one request
+    return self.embeddings.embed_documents(texts)
+
+class LocalBackend(EmbeddingBackend):
+  """
+  CPU-only sentence-transformers model, for offline and air-gapped deployments.
+  Requires the optional `sentence-transformers` package.
+  """
+
+  DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+  def __init__(self, model_name: str = DEFAULT_MODEL, batch_size: int = 64, num_threads: int = None):
+    try:
+      import torch # Importing torch to control the inference thread count
+      from sentence_transformers import SentenceTransformer # Importing the local embedding model
+    except ImportError as e:
+      raise ImportError("The local embedding backend needs `pip install sentence-transformers`.") from e
+
+    if num_threads:
+      torch.set_num_threads(num_threads)
+    self.model = SentenceTransformer(model_name, device="cpu")
+    self.batch_size = batch_size
+    self.identity = f"local:{model_name}"
+
+  def _encode(self, texts: list[str]) -> list[list[float]]:
+    vectors = self.model.encode(
+      texts,
+      batch_size=self.batch_size, # Texts per forward pass
+      normalize_embeddings=True, # Unit vectors, so L2 and cosine rankings agree
+      convert_to_numpy=True,
+      show_progress_bar=False,
+    )
+    return vectors.tolist()
+
+  def embed_documents(self, texts: list[str]) -> list[list[float]]:
+    return self._encode(texts)
+
+  def embed_query(self, text: str) -> list[float]:
+    return self._encode([text])[0]
+
+  def embed_queries(self, texts: list[str]) -> list[list[float]]:
+    return self._encode(texts)
+
+BACKENDS = {
+  "openai": OpenAIBackend,
+  "local": LocalBackend,
+}
+
+def get_backend(name: str = None, model_name: str = None, num_threads: int = None) -> EmbeddingBackend:
+  """
+  Build an embedding backend, by default from the EMBEDDING_BACKEND, EMBEDDING_MODEL and
+  EMBEDDING_THREADS environment variables.
+  Args:
+    name (str, optional): Backend name, "openai" (default) or "local".
+    model_name (str, optional): Model to load, defaults to the backend's own default.
+    num_threads (int, optional): Inference threads for local backends.
+  Returns:
+    EmbeddingBackend: The embedding backend.
+  """
+  name = name or os.getenv("EMBEDDING_BACKEND", "openai")
+  model_name = model_name or os.getenv("EMBEDDING_MODEL")
+  if name not in BACKENDS:
+    raise ValueError(f"Unknown embedding backend {name!r}, expected one of {sorted(BACKENDS)}.")
+  if name == "local":
+    num_threads = num_threads or int(os.getenv("EMBEDDING_THREADS", "0"))
+    return LocalBackend(model_name or LocalBackend.DEFAULT_MODEL, num_threads=num_threads)
+  return BACKENDS[name](model_name)
+
+def read_index_backend(persist_directory: str = CHROMA_PATH) -> dict:
+  """
+  Read the embedding backend and vector store an index was built with.
+  Args:
+    persist_directory (str): Directory of the index.
+  Returns:
+    dict: {"identity": ..., "store": ...}, or None for an index that has no record yet.
+  """
+  path = os.path.join(persist_directory, EMBEDDING_BACKEND_FILE)
+  if not os.path.exists(path):
+    return None
+  with open(path, "r", encoding="utf-8") as file:
+    return json.load(file)
+
+def check_index_backend(identity: str, persist_directory: str = CHROMA_PATH, store: str = "chroma"):
+  """
+  Reject an embedding backend or vector store that differs from the one the index was built with.
+  Args:
+    identity (str): Identity of the backend about to be used.
+    persist_directory (str): Directory of the index.
+    store (str): Kind of vector store about to be used.
+  Returns:
+    None
+  """
+  recorded = read_index_backend(persist_directory)
+  if recorded is None:
+    return
+  if recorded["identity"] != identity:
+    raise EmbeddingBackendMismatch(
+      f"Index in {persist_directory} was built with {recorded['identity']} embeddings but {identity} was requested. "
+      f"Use the same backend or rebuild the index."
+    )
+  if recorded["store"] != store:
+    raise EmbeddingBackendMismatch(
+      f"Index in {persist_directory} was built with the {recorded['store']} vector store but {store} was requested. "
+      f"Use the same store or rebuild the index."
+    )
+
+def record_index_backend(identity: str, persist_directory: str = CHROMA_PATH, store: str = "chroma"):
+  """
+  Record the backend and store an index is built with, after checking they match any earlier record.
+  Args:
+    identity (str): Identity of the backend used to build the index.
+    persist_directory (str): Directory of the index.
+    store (str): Kind of vector store the index is kept in.
+  Returns:
+    None
+  """
+  check_index_backend(identity, persist_directory, store)
+  os.makedirs(persist_directory, exist_ok=True)
+  with open(os.path.join(persist_directory, EMBEDDING_BACKEND_FILE), "w", encoding="utf-8") as file:
+    json.dump({"identity": identity, "store": store}, file)
@@ -0,0 +1,106 @@
+# Langchain dependencies
+from langchain_core.embeddings import Embeddings # Importing the embeddings interface from Langchain
+
+import hashlib # Importing hashlib to key cached vectors by text hash
+import os # Importing os module for operating system functionalities
+import sqlite3 # Importing sqlite3 for the cache index
+import threading # Importing threading so the cache can be shared across worker threads
+import numpy as np # Importing numpy to pack vectors as float32 BLOBs
+
+from .constants import EMBEDDING_CACHE_PATH # Importing constants from constants.py
+from .embedding_backends import EmbeddingBackend, get_backend # Importing the pluggable embedding backends
+
+class CachedEmbeddings(Embeddings):
+  """
+  Embedding function that wraps an embedding backend with a persistent local cache.
+  Vectors are keyed on (backend identity, text hash) and stored as float32 BLOBs in
+  SQLite, so indexing and querying processes can share the cache safely. Cache
+  misses are sent to the wrapped embedding function in one bulk request.
+  """
+
+  def __init__(self, embeddings: EmbeddingBackend, cache_path: str = EMBEDDING_CACHE_PATH):
+    self.embeddings = embeddings
+    self.identity = embeddings.identity
+    # One cache directory per backend, since vector sizes differ between models
+    self.cache_path = os.path.join(cache_path, hashlib.sha256(self.identity.encode("utf-8")).hexdigest()[:16])
+    os.makedirs(self.cache_path, exist_ok=True)
+
+    # SQLite serialises writers across processes; WAL lets readers carry on meanwhile
+    self.lock = threading.Lock()
+    self.conn = sqlite3.connect(os.path.join(self.cache_path, "index.sqlite3"), timeout=30, check_same_thread=False)
+    self.conn.execute("PRAGMA journal_mode=WAL")
+    self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+    self.conn.commit()
+
+    self.hits = 0
+    self.misses = 0
+
+  def _key(self, kind: str, text: str) -> str:
+    return hashlib.sha256(f"{self.identity}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+
+  def _lookup(self, keys: list[str]) -> dict[str, np.ndarray]:
+    found = {}
+    unique_keys = list(dict.fromkeys(keys))
+    for start in range(0, len(unique_keys), 500): # Stay under SQLite's bound-parameter limit
+      batch = unique_keys[start:start + 500]
+      placeholders = ",".join("?" * len(batch))
+      rows = self.conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+      found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+    return found
+
+  def _store(self, keys: list[str], vectors: list[list[float]]) -> dict[str, np.ndarray]:
+    stored = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(keys, vectors)}
+    self.conn.executemany(
+      "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+      ((key, vector.tobytes()) for key, vector in stored.items()),
+    )
+    self.conn.commit()
+    return stored
+
+  def _embed(self, kind: str, texts: list[str], embed_missing) -> list[list[float]]:
+    keys = [self._key(kind, text) for text in texts]
+    with self.lock:
+      found = self._lookup(keys)
+
+    # Embed every distinct cache miss in one bulk request
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
+    miss_count = sum(1 for key in keys if key not in found)
+    self.hits += len(keys) - miss_count
+    self.misses += miss_count
+    if missing:
+      vectors = embed_missing(list(missing.values()))
+      with self.lock:
+        found.update(self._store(list(missing), vectors))
+
+    # Cached or not, callers get the same float32-rounded values
+    return [found[key].tolist() for key in keys]
+
+  def embed_documents(self, texts: list[str]) -> list[list[float]]:
+    """Embed document texts, reusing cached vectors."""
+    return self._embed("document", texts, self.embeddings.embed_documents)
+
+  def embed_query(self, text: str) -> list[float]:
+    """Embed a query text, reusing a cached vector."""
+    return self._embed("query", [text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+  def embed_queries(self, texts: list[str]) -> list[list[float]]:
+    """Embed several query texts, sending all cache misses in one request."""
+    return self._embed("query", texts, self.embeddings.embed_queries)
+
+  @property
+  def hit_ratio(self) -> float:
+    total = self.hits + self.misses
+    return self.hits / total if total else 0.0
+
+  def report(self) -> str:
+    return f"Embedding cache: {self.hits} hits, {self.misses} misses ({self.hit_ratio:.0%} hit ratio)"
+
+def get_embedding_function(backend: EmbeddingBackend = None) -> CachedEmbeddings:
+  """
+  Embedding function shared by indexing and querying: the configured backend behind the local cache.
+  Args:
+    backend (EmbeddingBackend, optional): Backend to wrap, defaults to get_backend().
+  Returns:
+    CachedEmbeddings: The cached embedding function.
+  """
+  return CachedEmbeddings(backend or get_backend())
@@ -1,49 +1,224 @@
 # Langchain dependencies
-from langchain.embeddings import OpenAIEmbeddings # Importing OpenAI embeddings from Langchain
 from langchain.schema import Document # Importing Document schema from Langchain
-from langchain.vectorstores.chroma import Chroma # Importing Chroma vector store from Langchain
 
-from .utils import load_documents, split_text
+from .utils import list_source_files, iter_pages, iter_chunks, batched, IngestProgress
+from .embedding_cache import get_embedding_function # Importing the cached embedding function
+from .embedding_backends import record_index_backend # Importing the index backend record
+from .vector_stores import get_vector_store # Importing the pluggable vector stores
+from .bm25_index import BM25Index # Importing the lexical index
 
 from dotenv import load_dotenv # Importing dotenv to get API key from .env file
 import os # Importing os module for operating system functionalities
-import shutil # Importing shutil module for high-level file operations
+import json # Importing json module to read and write the index manifest
+import hashlib # Importing hashlib to fingerprint source files and chunks
+from typing import Iterable, Iterator # Importing typing helpers for chunk streams
 
-from .constants import CHROMA_PATH # Importing constants from constants.py
+from .constants import CHROMA_PATH, DEFAULT_DATA_PATH, MANIFEST_PATH, INDEX_BATCH_SIZE # Importing constants from constants.py
 
-def save_to_chroma(chunks: list[Document]):
+def file_hash(path: str) -> str:
   """
-  Save the given list of Document objects to a Chroma database.
+  Compute the SHA-256 of a source file's bytes.
   Args:
-  chunks (list[Document]): List of Document objects representing text chunks to save.
+    path (str): Path to the file.
   Returns:
-  None
+    str: Hex digest of the file content.
+  """
+  digest = hashlib.sha256()
+  with open(path, "rb") as file:
+    for block in iter(lambda: file.read(1024 * 1024), b""):
+      digest.update(block)
+  return digest.hexdigest()
+
+def chunk_id(chunk: Document) -> str:
+  """
+  Build a deterministic ID for a chunk from its source, page, start index and text.
+  Args:
+    chunk (Document): A split text chunk.
+  Returns:
+    str: ID that stays the same as long as the chunk does.
+  """
+  metadata = chunk.metadata
+  text_hash = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()[:16]
+  return f"{metadata.get('source')}:{metadata.get('page', 0)}:{metadata.get('start_index', 0)}:{text_hash}"
+
+def load_manifest() -> dict:
+  """
+  Load the index manifest mapping source path -> {"hash": ..., "chunk_ids": [...]}.
+  Returns:
+    dict: The manifest, empty if nothing has been indexed yet.
   """
+  if not os.path.exists(MANIFEST_PATH):
+    return {}
+  with open(MANIFEST_PATH, "r", encoding="utf-8") as file:
+    return json.load(file)
+
+def save_manifest(manifest: dict):
+  """
+  Write the index manifest atomically.
+  Args:
+    manifest (dict): The manifest to persist.
+  Returns:
+    None
+  """
+  os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+  tmp_path = MANIFEST_PATH + ".tmp"
+  with open(tmp_path, "w", encoding="utf-8") as file:
+    json.dump(manifest, file, indent=2)
+  os.replace(tmp_path, MANIFEST_PATH)
+
+class IndexWriter:
+  """
+  Applies source-level replacements and chunk batches to the vector store, the BM25 index
+  and the manifest, all opened once. Used by both file indexing and the scrape pipeline.
+  """
+
+  def __init__(self):
+    self.manifest = load_manifest()
+
+    # Open the existing vector store (created on first use) with the cached embedding backend,
+    # refusing to mix vectors from a different backend or store into an existing index
+    self.embedding_function = get_embedding_function()
+    self.db = get_vector_store(self.embedding_function)
+    record_index_backend(self.embedding_function.identity, store=self.db.kind)
+    self.lexical_index = BM25Index()
 
-  # Clear out the existing database directory if it exists
-  if os.path.exists(CHROMA_PATH):
-    shutil.rmtree(CHROMA_PATH)
+    self.source_count = 0
+    self.chunk_count = 0
+    self.stale_count = 0
 
-  # Create a new Chroma database from the documents using OpenAI embeddings
-  db = Chroma.from_documents(
-    chunks,
-    OpenAIEmbeddings(),
-    persist_directory=CHROMA_PATH
-  )
+  def replace_sources(self, file_hashes: dict[str, str], removed_sources: list[str] = ()):
+    """
+    Drop the chunks of removed sources and of sources about to be re-indexed, and open
+    fresh manifest entries for the latter.
+    Args:
+      file_hashes (dict[str, str]): Content hash of each new or changed source.
+      removed_sources (list[str]): Sources that no longer exist.
+    Returns:
+      None
+    """
+    stale_ids = []
+    for source in list(removed_sources) + list(file_hashes):
+      stale_ids.extend(self.manifest.pop(source, {}).get("chunk_ids", []))
+    self.db.delete(stale_ids)
+    self.lexical_index.delete(stale_ids)
+    self.stale_count += len(stale_ids)
 
+    # Group the new chunks by source so each source gets its own manifest entry
+    for source, hash_value in file_hashes.items():
+      self.manifest[source] = {"hash": hash_value, "chunk_ids": []}
+    self.source_count += len(file_hashes)
+
+  def add_batch(self, chunks: list[Document]):
+    """
+    Embed and upsert one batch of chunks whose sources were passed to replace_sources.
+    Args:
+      chunks (list[Document]): The chunks.
+    Returns:
+      None
+    """
+    ids = []
+    for chunk in chunks:
+      ids.append(chunk_id(chunk))
+      self.manifest[chunk.metadata.get("source")]["chunk_ids"].append(ids[-1])
+    self.db.add_documents(chunks, ids)
+    self.lexical_index.add_documents(chunks, ids)
+    self.chunk_count += len(chunks)
+
+  def forget_sources(self, sources: list[str]):
+    """
+    Drop the manifest entries of sources that could not be indexed, so the next run retries them.
+    Args:
+      sources (list[str]): Sources passed to replace_sources that produced no chunks.
+    Returns:
+      None
+    """
+    for source in sources:
+      if self.manifest.pop(source, None) is not None:
+        self.source_count -= 1
+
+  def checkpoint(self):
+    """
+    Persist the stores and the manifest, so everything added so far survives a crash.
+    """
+    self.db.persist()
+    self.lexical_index.persist()
+    save_manifest(self.manifest)
+
+  def close(self):
+    # Closing the store merges what the checkpoints flushed, once per run
+    self.db.close()
+    self.lexical_index.persist()
+    save_manifest(self.manifest)
+    print(self.embedding_function.report())
+    print(f"Saved {self.chunk_count} chunks from {self.source_count} sources and removed {self.stale_count} stale chunks in {CHROMA_PATH}.")
+
+def save_to_chroma(chunk_batches: Iterable[list[Document]], file_hashes: dict[str, str], removed_sources: list[str] = (), failed_sources: list[str] = ()):
+  """
+  Upsert the chunks of new or changed source files into the vector store batch by batch and
+  delete the chunks of changed or removed files, keeping the manifest in step.
+  Args:
+  chunk_batches (Iterable[list[Document]]): Batches of chunks of the new or changed source files.
+  file_hashes (dict[str, str]): Content hash of each new or changed source file.
+  removed_sources (list[str]): Source files that no longer exist.
+  failed_sources (list[str]): Filled with the files that failed to parse while the batches are consumed.
+  Returns:
+  None
+  """
+  writer = IndexWriter()
+  writer.replace_sources(file_hashes, removed_sources)
+  # Only the new or changed chunks are embedded, one fixed-size batch at a time
+  for chunks in chunk_batches:
+    writer.add_batch(chunks)
+  # Files that failed to parse stay out of the manifest and are retried on the next run
+  writer.forget_sources(failed_sources)
   # Persist the database to disk
-  db.persist()
-  print(f"Saved {len(chunks)} chunks to {CHROMA_PATH}.")
-  
-def generate_data_store():
+  writer.close()
+
+def stream_chunk_batches(paths: list[str], batch_size: int = INDEX_BATCH_SIZE, workers: int = None, failed: list[str] = None) -> Iterator[list[Document]]:
+  """
+  Parse source files in parallel, chunk their pages on the fly and yield fixed-size chunk batches,
+  so memory is bounded by the batch size rather than the corpus size.
+  Args:
+    paths (list[str]): Source files to ingest.
+    batch_size (int): Number of chunks per embedding/upsert batch.
+    workers (int, optional): Number of parser processes, defaults to the CPU count.
+    failed (list[str], optional): Collects the files that failed to parse and were skipped.
+  Returns:
+    Iterator[list[Document]]: Batches of chunks.
+  """
+  progress = IngestProgress(total_files=len(paths))
+
+  def pages():
+    for _path, file_pages in iter_pages(paths, workers=workers, failed=failed):
+      progress.update(files=1, pages=len(file_pages))
+      yield from file_pages
+
+  for batch in batched(iter_chunks(pages()), batch_size):
+    progress.update(chunks=len(batch))
+    yield batch
+  progress.finish()
+
+def generate_data_store(data_path: str = DEFAULT_DATA_PATH):
   """
-  Function to generate vector database in chroma from documents.
+  Function to incrementally update the vector database in chroma from documents.
+  Only files whose content hash differs from the manifest are loaded and embedded.
   """
-  documents = load_documents() # Load documents from a source
-  chunks = split_text(documents) # Split documents into manageable chunks
-  save_to_chroma(chunks) # Save the processed data to a data store
+  manifest = load_manifest()
+  current_hashes = {path: file_hash(path) for path in list_source_files(data_path)} # Fingerprint every source file
+
+  changed = {path: hash_value for path, hash_value in current_hashes.items() if manifest.get(path, {}).get("hash") != hash_value}
+  # Scraped sources are keyed by URL and maintained by the scrape pipeline, not by the data directory
+  removed = [path for path in manifest if path not in current_hashes and "://" not in path]
+  if not changed and not removed:
+    print(f"Index in {CHROMA_PATH} is up to date ({len(current_hashes)} files).")
+    return
+
+  failed = [] # Files that fail to parse are skipped and left out of the manifest
+  chunk_batches = stream_chunk_batches(list(changed), failed=failed) # Parse, split and batch only new or changed documents
+  save_to_chroma(chunk_batches, changed, removed, failed) # Save the processed data to a data store
 
-# Load environment variables from a .env file
-load_dotenv()
-# Generate the data store
-generate_data_store()
\ No newline at end of file
+if __name__ == "__main__":
+  # Load environment variables from a .env file
+  load_dotenv()
+  # Generate the data store
+  generate_data_store()
@@ -1,12 +1,20 @@
 """main.py (query.py)"""
 
-from langchain.vectorstores.chroma import Chroma # Importing Chroma vector store from Langchain
-from langchain.embeddings import OpenAIEmbeddings # Importing OpenAI embeddings from 
 
 from dotenv import load_dotenv # Importing dotenv to get API key from .env file
 from langchain.chat_models import ChatOpenAI # Import OpenAI LLM
+from langchain.prompts import ChatPromptTemplate # Importing prompt template from Langchain
+from langchain.schema import Document # Importing Document schema from Langchain
+
+import asyncio # Importing asyncio to run blocking store lookups off the event loop
+import functools # Importing functools to share one default engine
 
 from .constants import CHROMA_PATH # Importing constants from constants.py
+from .embedding_cache import get_embedding_function # Importing the cached embedding function
+from .embedding_backends import check_index_backend # Importing the index backend check
+from .vector_stores import get_vector_store # Importing the pluggable vector stores
+from .bm25_index import BM25Index # Importing the lexical index
+from .index_docs import chunk_id # Importing chunk IDs to merge results from both retrievers
 
 PROMPT_TEMPLATE = """
 Answer the question based only on the following context:
@@ -16,6 +24,195 @@ Answer the question based on the above context: {question}
 """
 
 
+NO_MATCH_RESPONSE = "Unable to find matching results."
+
+def reciprocal_rank_fusion(result_lists: list[list[tuple[Document, float]]], k: int, rrf_k: int = 60) -> list[tuple[Document, float]]:
+  """
+  Merge ranked result lists with reciprocal-rank fusion: each chunk scores the sum of
+  1 / (rrf_k + rank) over the lists it appears in.
+  Args:
+    result_lists (list[list[tuple[Document, float]]]): Ranked (document, relevance score) lists, one per retriever.
+    k (int): Number of fused results to keep.
+    rrf_k (int): Rank offset damping the weight of the top ranks.
+  Returns:
+    list[tuple[Document, float]]: The top-k chunks in fused order, each with its relevance score from the first
+    list, or 0.0 if only the other retrievers found it. Scores from different retrievers are on different scales.
+  """
+  fused_scores, documents, relevance = {}, {}, {}
+  for list_index, results in enumerate(result_lists):
+    for rank, (doc, score) in enumerate(results, start=1):
+      key = chunk_id(doc)
+      fused_scores[key] = fused_scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+      documents.setdefault(key, doc)
+      if list_index == 0:
+        relevance[key] = score
+      else:
+        relevance.setdefault(key, 0.0)
+  best = sorted(fused_scores, key=fused_scores.get, reverse=True)[:k]
+  return [(documents[key], relevance[key]) for key in best]
+
+class RagEngine:
+  """
+  Long-lived Retrieval-Augmented Generation engine. The vector store, the BM25 index, the
+  embedding function, the chat model and the parsed prompt template are created once and
+  reused across queries.
+
+  Retrieval is hybrid: vector and BM25 candidates are merged with reciprocal-rank fusion, so
+  exact reagent names and catalogue numbers are found even when embeddings miss them.
+  Questions with no chunk whose vector similarity reaches `relevance_threshold` are answered
+  with NO_MATCH_RESPONSE without calling the chat model. BM25 scores only affect ranking: a
+  one-word lexical hit scores near 1.0 however unrelated the question is.
+  """
+
+  def __init__(self, persist_directory: str = CHROMA_PATH, embedding_function=None, model=None, k: int = 3, relevance_threshold: float = 0.7, candidates: int = 20):
+    # YOU MUST - Use same embedding function as before (cached, so repeated queries skip the API)
+    self.embedding_function = embedding_function or get_embedding_function()
+    self.store = get_vector_store(self.embedding_function, persist_directory)
+    check_index_backend(self.embedding_function.identity, persist_directory, store=self.store.kind)
+    self.lexical_index = BM25Index(persist_directory)
+    self.model = model or ChatOpenAI()
+    self.prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+    self.k = k
+    self.relevance_threshold = relevance_threshold
+    self.candidates = candidates # Results taken from each retriever before fusion
+
+  def retrieve(self, query_text: str, sources: list[str] = None) -> list[tuple[Document, float]]:
+    """
+    Retrieve the context for one question with hybrid vector and BM25 search.
+    Args:
+      query_text (str): The question.
+      sources (list[str], optional): Only search chunks from these source files.
+    Returns:
+      list[tuple[Document, float]]: (document, relevance score) pairs in fused order.
+    """
+    vector_results = self.store.search_by_vectors([self.embedding_function.embed_query(query_text)], self.candidates, sources)[0]
+    lexical_results = self.lexical_index.search(query_text, self.candidates, sources)
+    return reciprocal_rank_fusion([vector_results, lexical_results], self.k)
+
+  def retrieve_many(self, query_texts: list[str], sources: list[str] = None) -> list[list[tuple[Document, float]]]:
+    """
+    Retrieve the context for several questions, embedding them all in one request and
+    running the similarity searches as one batch.
+    Args:
+      query_texts (list[str]): The questions.
+      sources (list[str], optional): Only search chunks from these source files.
+    Returns:
+      list[list[tuple[Document, float]]]: (document, relevance score) pairs per question.
+    """
+    all_vector_results = self.store.search_by_vectors(self.embedding_function.embed_queries(query_texts), self.candidates, sources)
+    all_lexical_results = self.lexical_index.search_many(query_texts, self.candidates, sources)
+    return [
+      reciprocal_rank_fusion([vector_results, lexical_results], self.k)
+      for vector_results, lexical_results in zip(all_vector_results, all_lexical_results)
+    ]
+
+  def is_relevant(self, results: list[tuple[Document, float]]) -> bool:
+    """
+    Whether any retrieved chunk's vector similarity reaches the relevance threshold, i.e. whether generation is worth it.
+    Args:
+      results (list[tuple[Document, float]]): Retrieved (document, vector relevance score) pairs.
+    Returns:
+      bool: True if the chat model should be called.
+    """
+    return any(score >= self.relevance_threshold for _doc, score in results)
+
+  def _build_prompt(self, query_text: str, results: list[tuple[Document, float]]) -> str:
+    # Combine context from matching documents
+    context_text = "\n\n - -\n\n".join([doc.page_content for doc, _score in results])
+    return self.prompt_template.format(context=context_text, question=query_text)
+
+  def _format_response(self, response_text: str, results: list[tuple[Document, float]]) -> tuple[str, str]:
+    # Get sources of the matching documents
+    sources = [doc.metadata.get("source", None) for doc, _score in results]
+    formatted_response = f"Response: {response_text}\nSources: {sources}"
+    return formatted_response, response_text
+
+  def _no_match(self) -> tuple[str, str]:
+    print(NO_MATCH_RESPONSE)
+    return self._format_response(NO_MATCH_RESPONSE, [])
+
+  def query(self, query_text: str, sources: list[str] = None) -> tuple[str, str]:
+    """
+    Answer one question.
+    Args:
+      query_text (str): The text to query the RAG system with.
+      sources (list[str], optional): Only search chunks from these source files.
+    Returns:
+      tuple[str, str]: Formatted response including sources, and the generated response text.
+    """
+    results = self.retrieve(query_text, sources)
+    if not self.is_relevant(results):
+      return self._no_match()
+    response_text = self.model.predict(self._build_prompt(query_text, results))
+    return self._format_response(response_text, results)
+
+  async def aquery(self, query_text: str, sources: list[str] = None) -> tuple[str, str]:
+    """
+    Async version of query; the store lookup runs in a worker thread.
+    Args:
+      query_text (str): The text to query the RAG system with.
+      sources (list[str], optional): Only search chunks from these source files.
+    Returns:
+      tuple[str, str]: Formatted response including sources, and the generated response text.
+    """
+    results = await asyncio.to_thread(self.retrieve, query_text, sources)
+    if not self.is_relevant(results):
+      return self._no_match()
+    response_text = await self.model.apredict(self._build_prompt(query_text, results))
+    return self._format_response(response_text, results)
+
+  def _relevant_prompts(self, query_texts: list[str], all_results: list[list[tuple[Document, float]]]) -> dict[int, str]:
+    return {
+      index: self._build_prompt(query_text, results)
+      for index, (query_text, results) in enumerate(zip(query_texts, all_results))
+      if self.is_relevant(results)
+    }
+
+  def _collect_responses(self, all_results: list[list[tuple[Document, float]]], prompts: dict[int, str], responses: list) -> list[tuple[str, str]]:
+    answers = dict(zip(prompts, responses))
+    return [
+      self._format_response(answers[index].content, results) if index in answers else self._no_match()
+      for index, results in enumerate(all_results)
+    ]
+
+  def query_many(self, query_texts: list[str], sources: list[str] = None) -> list[tuple[str, str]]:
+    """
+    Answer several questions: one embedding request, one batched similarity search,
+    then the chat model calls for the questions with relevant context run concurrently.
+    Args:
+      query_texts (list[str]): The questions.
+      sources (list[str], optional): Only search chunks from these source files.
+    Returns:
+      list[tuple[str, str]]: (formatted response, response text) per question, in order.
+    """
+    all_results = self.retrieve_many(query_texts, sources)
+    prompts = self._relevant_prompts(query_texts, all_results)
+    responses = self.model.batch(list(prompts.values())) if prompts else []
+    return self._collect_responses(all_results, prompts, responses)
+
+  async def aquery_many(self, query_texts: list[str], sources: list[str] = None) -> list[tuple[str, str]]:
+    """
+    Async version of query_many.
+    Args:
+      query_texts (list[str]): The questions.
+      sources (list[str], optional): Only search chunks from these source files.
+    Returns:
+      list[tuple[str, str]]: (formatted response, response text) per question, in order.
+    """
+    all_results = await asyncio.to_thread(self.retrieve_many, query_texts, sources)
+    prompts = self._relevant_prompts(query_texts, all_results)
+    responses = await self.model.abatch(list(prompts.values())) if prompts else []
+    return self._collect_responses(all_results, prompts, responses)
+
+@functools.lru_cache(maxsize=1)
+def get_engine() -> RagEngine:
+  """
+  Shared engine used by query_rag, created on first use.
+  Returns:
+    RagEngine: The default engine.
+  """
+  return RagEngine()
+
 def query_rag(query_text):
   """
   Query a Retrieval-Augmented Generation (RAG) system using Chroma database and OpenAI.
@@ -25,38 +222,7 @@ def query_rag(query_text):
     - formatted_response (str): Formatted response including the generated text and sources.
     - response_text (str): The generated response text.
   """
-  # YOU MUST - Use same embedding function as before
-  embedding_function = OpenAIEmbeddings()
-
-  # Prepare the database
-  db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
-  
-  # Retrieving the context from the DB using similarity search
-  results = db.similarity_search_with_relevance_scores(query_text, k=3)
-
-  # Check if there are any matching results or if the relevance score is too low
-  if len(results) == 0 or results[0][1] < 0.7:
-    print(f"Unable to find matching results.")
-
-  # Combine context from matching documents
-  context_text = "\n\n - -\n\n".join([doc.page_content for doc, _score in results])
- 
-  # Create prompt template using context and query text
-  prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
-  prompt = prompt_template.format(context=context_text, question=query_text)
-  
-  # Initialize OpenAI chat model
-  model = ChatOpenAI()
-
-  # Generate response text based on the prompt
-  response_text = model.predict(prompt)
- 
-   # Get sources of the matching documents
-  sources = [doc.metadata.get("source", None) for doc, _score in results]
- 
-  # Format and return response including generated text and sources
-  formatted_response = f"Response: {response_text}\nSources: {sources}"
-  return formatted_response, response_text
+  return get_engine().query(query_text)
 
 if __name__ == "__main__":
   import argparse
@@ -69,4 +235,5 @@ if __name__ == "__main__":
   # Let's call our function we have defined
   formatted_response, response_text = query_rag(query_text)
   # and finally, inspect our final response!
-  print(response_text)
\ No newline at end of file
+  print(response_text)
+  print(get_engine().embedding_function.report())
\ No newline at end of file
@@ -0,0 +1,193 @@
+# Langchain dependencies
+from langchain.schema import Document # Importing Document schema from Langchain
+
+from dotenv import load_dotenv # Importing dotenv to get API key from .env file
+import argparse # Importing argparse for the command line
+import asyncio # Importing asyncio to run the crawl, chunk and index stages concurrently
+import hashlib # Importing hashlib to fingerprint scraped protocols
+import time # Importing time to space out checkpoints
+
+from .utils import get_text_splitter # Importing the shared text splitter
+from .index_docs import IndexWriter # Importing the index writer shared with file indexing
+from .scripts.opentron_scrape import ( # Importing the crawler and its defaults
+  DEFAULT_BASE_URL, DEFAULT_CONCURRENCY, DEFAULT_PER_HOST, DEFAULT_RATE, DEFAULT_PARSE_WORKERS, scrape_categories,
+)
+from .constants import CHROMA_PATH, INDEX_BATCH_SIZE # Importing constants from constants.py
+
+DOCUMENT_QUEUE_SIZE = 64 # Scraped protocols waiting to be chunked
+BATCH_QUEUE_SIZE = 2 # Chunk batches waiting to be embedded and upserted
+CHECKPOINT_BATCHES = 20 # Checkpoint the index at least every this many batches...
+CHECKPOINT_INTERVAL = 60.0 # ...or this many seconds, whichever comes first
+_DONE = None # End-of-stream marker passed down the queues
+
+class _ProtocolCommits:
+  """
+  Crawl-state commits of one protocol and of every other listing of the same URL, run together
+  once its chunks are checkpointed. Listings that arrive after that are committed at once.
+  """
+
+  def __init__(self, commit):
+    self.commits = [commit]
+    self.done = False
+
+  def add(self, commit):
+    if self.done:
+      commit()
+    else:
+      self.commits.append(commit)
+
+  def __call__(self):
+    self.done = True
+    for commit in self.commits:
+      commit()
+
+class ScrapeIndexPipeline:
+  """
+  Crawl -> chunk -> embed/upsert pipeline: scraped protocols go straight into the index as
+  Documents with their URL as source, without intermediate text files.
+
+  The stages are connected by bounded queues, so a slow embedding backend slows the crawl
+  instead of letting scraped pages pile up in memory. A protocol's crawl state is only
+  recorded once its chunks are indexed and checkpointed, so an interrupted run re-fetches
+  whatever had not reached the index yet. Checkpoints run every `checkpoint_batches` batches or
+  `checkpoint_interval` seconds rather than after every batch.
+  """
+
+  def __init__(self, batch_size: int = INDEX_BATCH_SIZE, document_queue_size: int = DOCUMENT_QUEUE_SIZE, batch_queue_size: int = BATCH_QUEUE_SIZE,
+               checkpoint_batches: int = CHECKPOINT_BATCHES, checkpoint_interval: float = CHECKPOINT_INTERVAL):
+    self.batch_size = batch_size
+    self.checkpoint_batches = checkpoint_batches
+    self.checkpoint_interval = checkpoint_interval
+    self.documents = asyncio.Queue(maxsize=document_queue_size)
+    self.batches = asyncio.Queue(maxsize=batch_queue_size)
+    self.text_splitter = get_text_splitter()
+
+  async def submit(self, url: str, protocol_name: str, content: str, commit):
+    """
+    Crawler sink: queue one new or changed protocol, waiting while the queue is full.
+    Args:
+      url (str): The protocol page, used as the chunks' source.
+      protocol_name (str): Protocol ID from the URL.
+      content (str): The extracted protocol text.
+      commit (callable): Records the page's crawl state; called once the protocol is indexed.
+    Returns:
+      None
+    """
+    document = Document(page_content=content, metadata={"source": url, "title": protocol_name})
+    await self.documents.put((document, commit))
+
+  async def chunk_stage(self):
+    """
+    Split queued protocols and group the chunks into fixed-size batches. Each batch carries the
+    hashes of the sources first seen since the previous batch, and the commits of the protocols
+    whose last chunk it contains.
+    """
+    seen = {} # source -> commits of its first listing
+    chunks, file_hashes, commits = [], {}, [] # commits: (index of the protocol's last chunk, commit)
+    while True:
+      item = await self.documents.get()
+      if item is _DONE:
+        break
+      document, commit = item
+      source = document.metadata["source"]
+      if source in seen: # A protocol listed under several subcategories is indexed once...
+        seen[source].add(commit) # ...and every listing is committed once that copy is checkpointed
+        continue
+      seen[source] = _ProtocolCommits(commit)
+      file_hashes[source] = hashlib.sha256(document.page_content.encode("utf-8")).hexdigest()
+      chunks.extend(self.text_splitter.split_documents([document]))
+      commits.append((len(chunks) - 1, seen[source]))
+
+      while len(chunks) >= self.batch_size:
+        batch, chunks = chunks[:self.batch_size], chunks[self.batch_size:]
+        done = [commit for last, commit in commits if last < self.batch_size]
+        commits = [(last - self.batch_size, commit) for last, commit in commits if last >= self.batch_size]
+        await self.batches.put((file_hashes, batch, done))
+        file_hashes = {}
+
+    if chunks or file_hashes or commits:
+      await self.batches.put((file_hashes, chunks, [commit for _last, commit in commits]))
+    await self.batches.put(_DONE)
+
+  async def index_stage(self, writer: IndexWriter):
+    """
+    Embed and upsert chunk batches in a worker thread, and record the crawl state of the
+    protocols they completed once a checkpoint has made them durable.
+    """
+    uncommitted = []
+    batches = 0
+    last_checkpoint = time.monotonic()
+    while True:
+      item = await self.batches.get()
+      if item is _DONE:
+        break
+      file_hashes, chunks, commits = item
+      await asyncio.to_thread(self._write_batch, writer, file_hashes, chunks)
+      uncommitted.extend(commits)
+      batches += 1
+      if batches >= self.checkpoint_batches or time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+        await self._checkpoint(writer, uncommitted)
+        uncommitted = []
+        batches = 0
+        last_checkpoint = time.monotonic()
+    await self._checkpoint(writer, uncommitted)
+
+  @staticmethod
+  async def _checkpoint(writer: IndexWriter, commits: list):
+    await asyncio.to_thread(writer.checkpoint)
+    for commit in commits:
+      commit()
+
+  @staticmethod
+  def _write_batch(writer: IndexWriter, file_hashes: dict[str, str], chunks: list[Document]):
+    writer.replace_sources(file_hashes)
+    if chunks:
+      writer.add_batch(chunks)
+
+  async def _crawl(self, base_url: str, stages: list[asyncio.Task], **crawl_options):
+    async def drain():
+      # The crawl state stays open until the last batch is indexed and its protocols committed
+      await self.documents.put(_DONE)
+      await asyncio.gather(*stages)
+    await scrape_categories(base_url, CHROMA_PATH, sink=self.submit, drain=drain, **crawl_options)
+
+  async def run(self, base_url: str = DEFAULT_BASE_URL, **crawl_options):
+    """
+    Crawl the site and index every new or changed protocol.
+    Args:
+      base_url (str): Category page to start from.
+      **crawl_options: Passed to scrape_categories (concurrency, per_host, rate, extractor, parse_workers).
+    Returns:
+      None
+    """
+    writer = await asyncio.to_thread(IndexWriter)
+    stages = [asyncio.create_task(self.chunk_stage()), asyncio.create_task(self.index_stage(writer))]
+    tasks = stages + [asyncio.create_task(self._crawl(base_url, stages, **crawl_options))]
+    # A failing stage would leave the others blocked on a full or empty queue: cancel them and re-raise
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    for task in pending:
+      task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    try:
+      for task in done:
+        task.result()
+    finally:
+      writer.close()
+
+if __name__ == "__main__":
+  # Load environment variables from a .env file
+  load_dotenv()
+
+  parser = argparse.ArgumentParser(description="Scrape Opentrons protocols straight into the index")
+  parser.add_argument("--url", type=str, default=DEFAULT_BASE_URL, help="Category page to crawl")
+  parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Maximum concurrent requests in total")
+  parser.add_argument("--per-host", type=int, default=DEFAULT_PER_HOST, help="Maximum concurrent requests per host")
+  parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Maximum requests per second per host")
+  parser.add_argument("--parse-workers", type=int, default=DEFAULT_PARSE_WORKERS, help="Processes parsing HTML off the event loop")
+  parser.add_argument("--batch-size", type=int, default=INDEX_BATCH_SIZE, help="Chunks per embedding/upsert batch")
+  args = parser.parse_args()
+
+  pipeline = ScrapeIndexPipeline(batch_size=args.batch_size)
+  asyncio.run(pipeline.run(
+    args.url, concurrency=args.concurrency, per_host=args.per_host, rate=args.rate, parse_workers=args.parse_workers,
+  ))
@@ -0,0 +1,64 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+from protocol_extractors import EXTRACTORS, SoupExtractor
+
+# Directory of saved pages (see opentron_scrape.py --save-html)
+DEFAULT_FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+METHODS = ["protocol_text", "protocol_links", "subcategory_links"]
+
+# Function to pick the extraction the crawler would run on a page, using the reference extractor
+def page_method(reference, html):
+    for method in METHODS:
+        if getattr(reference, method)(html):
+            return method
+    return None
+
+# Function to time one extractor over all pages; returns (seconds per page, mismatched pages)
+def bench(extractor, pages, expected, repeat):
+    mismatches = [name for name, (method, html) in pages.items() if getattr(extractor, method)(html) != expected[name]]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for method, html in pages.values():
+            getattr(extractor, method)(html)
+    return (time.perf_counter() - started) / (repeat * len(pages)), mismatches
+
+# Main function to set up argument parsing
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the scraper's HTML extractors over saved pages")
+    parser.add_argument('--pages', type=str, default=DEFAULT_FIXTURES_PATH, help="Directory of saved .html pages")
+    parser.add_argument('--repeat', type=int, default=50, help="Passes over the pages per extractor")
+    args = parser.parse_args()
+
+    reference = SoupExtractor()
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(args.pages, "*.html"))):
+        with open(path, 'r', encoding='utf-8') as file:
+            html = file.read()
+        method = page_method(reference, html)
+        if method:
+            pages[os.path.basename(path)] = (method, html)
+    if not pages:
+        sys.exit(f"No protocol, subcategory or category pages found in {args.pages}")
+    expected = {name: getattr(reference, method)(html) for name, (method, html) in pages.items()}
+
+    print(f"{len(pages)} pages, {args.repeat} passes")
+    baseline = None
+    failed = False
+    for name, extractor_class in EXTRACTORS.items():
+        try:
+            extractor = extractor_class()
+        except ImportError as e:
+            print(f"{name:>10}: skipped ({e})")
+            continue
+        seconds, mismatches = bench(extractor, pages, expected, args.repeat)
+        baseline = baseline or seconds
+        print(f"{name:>10}: {seconds * 1000:7.3f} ms/page  {baseline / seconds:5.1f}x" + (f"  MISMATCH: {mismatches}" if mismatches else ""))
+        failed = failed or bool(mismatches)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
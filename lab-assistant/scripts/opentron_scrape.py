@@ -1,90 +1,343 @@
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urljoin, urlsplit
+import hashlib
+import json
 import os
+import sqlite3
+import time
 import argparse
+import functools
+
+if __package__:
+    from .protocol_extractors import EXTRACTORS, extract, init_worker
+else:
+    from protocol_extractors import EXTRACTORS, extract, init_worker
 
 # Base URL and default storage directory
 DEFAULT_BASE_URL = "https://protocols.opentrons.com"
 DEFAULT_STORAGE_PATH = "data/"
+# Crawl state file (URL -> ETag/Last-Modified/content hash), kept with the scraped files
+CRAWL_STATE_FILE = ".crawl_state.sqlite3"
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PER_HOST = 4
+DEFAULT_RATE = 8.0  # Requests per second per host
+DEFAULT_PARSE_WORKERS = os.cpu_count() or 1
+MAX_RETRIES = 3
+
+# On-disk crawl state: validators and content hash per URL, plus the crawl each URL was last seen in
+class CrawlState:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+            "content_hash TEXT, links TEXT, crawl_id INTEGER)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS crawls (crawl_id INTEGER PRIMARY KEY AUTOINCREMENT, started_at REAL, finished_at REAL)"
+        )
+        # Pages that failed permanently (4xx, unparseable); they are retried by the next crawl, not by resuming this one
+        self.conn.execute("CREATE TABLE IF NOT EXISTS failures (url TEXT PRIMARY KEY, crawl_id INTEGER, error TEXT)")
+        self.conn.commit()
+
+    # Resume the last crawl if it never finished, otherwise start a new one
+    def begin_crawl(self):
+        row = self.conn.execute("SELECT crawl_id, finished_at FROM crawls ORDER BY crawl_id DESC LIMIT 1").fetchone()
+        if row and row[1] is None:
+            print(f"Resuming interrupted crawl {row[0]}")
+            return row[0]
+        cursor = self.conn.execute("INSERT INTO crawls (started_at) VALUES (?)", (time.time(),))
+        self.conn.commit()
+        return cursor.lastrowid
+
+    def finish_crawl(self, crawl_id):
+        self.conn.execute("UPDATE crawls SET finished_at = ? WHERE crawl_id = ?", (time.time(), crawl_id))
+        self.conn.commit()
+
+    def get(self, url):
+        row = self.conn.execute(
+            "SELECT etag, last_modified, content_hash, links, crawl_id FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "etag": row[0],
+            "last_modified": row[1],
+            "content_hash": row[2],
+            "links": json.loads(row[3]) if row[3] else None,
+            "crawl_id": row[4],
+        }
+
+    # Record a page as done for this crawl; committed at once so an interrupted crawl can resume
+    def put(self, url, crawl_id, etag=None, last_modified=None, content_hash=None, links=None):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages (url, etag, last_modified, content_hash, links, crawl_id) VALUES (?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, content_hash, json.dumps(links) if links is not None else None, crawl_id),
+        )
+        self.conn.execute("DELETE FROM failures WHERE url = ?", (url,))
+        self.conn.commit()
+
+    def put_failure(self, url, crawl_id, error):
+        self.conn.execute("INSERT OR REPLACE INTO failures (url, crawl_id, error) VALUES (?, ?, ?)", (url, crawl_id, error))
+        self.conn.commit()
+
+    def failures(self):
+        return self.conn.execute("SELECT url, crawl_id, error FROM failures ORDER BY url").fetchall()
+
+    def close(self):
+        self.conn.close()
+
+# Spaces out request starts to the same host so the crawl stays under `rate` requests per second
+class HostRateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot = {}
+        self.lock = asyncio.Lock()
+
+    async def wait(self, host):
+        async with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+# Pooled HTTP client with per-host concurrency limits, rate limiting, retries and conditional requests
+class Fetcher:
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, rate=DEFAULT_RATE):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.rate_limiter = HostRateLimiter(rate)
+        self.session = None
+        self.requests = 0
+        self.not_modified = 0
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=60))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    # Fetch a URL, sending the stored validators; returns (status, text, etag, last_modified)
+    async def fetch(self, url, cached=None):
+        headers = {}
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        for attempt in range(MAX_RETRIES + 1):
+            await self.rate_limiter.wait(urlsplit(url).netloc)
+            self.requests += 1
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    if response.status == 304:
+                        self.not_modified += 1
+                        return 304, None, cached["etag"], cached["last_modified"]
+                    if response.status == 429 or response.status >= 500:
+                        # Back off, honouring Retry-After when the server sends it
+                        retry_after = response.headers.get("Retry-After", "")
+                        delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+                        if attempt < MAX_RETRIES:
+                            await asyncio.sleep(delay)
+                            continue
+                    response.raise_for_status()
+                    text = await response.text()
+                    return response.status, text, response.headers.get("ETag"), response.headers.get("Last-Modified")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt == MAX_RETRIES:
+                    raise
+                await asyncio.sleep(2 ** attempt)
+
+# Errors worth resuming the crawl for: the same request may well succeed later
+def is_transient(error):
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
 
 # Function to save text to a file in the specified path
 def save_text_to_file(protocol_name, content, storage_path):
     # Ensure the storage directory exists
     os.makedirs(storage_path, exist_ok=True)
-    
+
     filename = os.path.join(storage_path, f"{protocol_name}.txt")
     # Create the file and write the content
     with open(filename, 'w', encoding='utf-8') as file:
         file.write(content)
     print(f"Saved protocol '{protocol_name}' to {filename}")
 
-# Function to extract protocol information from the protocol page
-def extract_protocol_data(protocol_url, base_url, storage_path):
-    response = requests.get(base_url + protocol_url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    # Find the div with the class 'selected-protocol'
-    protocol_div = soup.find('div', class_='selected-protocol')
-    if protocol_div:
-        # Extract the text content
-        protocol_content = protocol_div.get_text(separator="\n", strip=True)
-        protocol_name = protocol_url.split("/")[-1]  # Use the protocol ID or name in URL for the file name
-        save_text_to_file(protocol_name, protocol_content, storage_path)
-    else:
-        print(f"No protocol data found for {protocol_url}")
-
-# Function to scrape protocols in each subcategory
-def scrape_subcategory(subcategory_url, base_url, storage_path):
-    response = requests.get(base_url + subcategory_url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    # Find all protocols in the subcategory page
-    protocols = soup.find_all('div', class_='protocol')
-    for protocol in protocols:
-        # Extract the href link for the protocol
-        protocol_link = protocol.find('a', href=True)
-        if protocol_link:
-            protocol_url = protocol_link['href']
-            extract_protocol_data(protocol_url, base_url, storage_path)
-
-# Function to recursively navigate subcategories
-def scrape_categories(base_url, storage_path):
-    response = requests.get(base_url)
-    soup = BeautifulSoup(response.text, 'html.parser')
-
-    # Find all 'subCategory' links
-    subcategories = soup.find_all('a', class_='subCategory')
-    
-    for subcategory in subcategories:
-        subcategory_url = subcategory['href']
+# Crawls the category page, its subcategories and their protocols concurrently
+class ProtocolCrawler:
+    def __init__(self, base_url, storage_path, fetcher, state, parse_pool, save_html=None, sink=None):
+        self.base_url = base_url
+        self.storage_path = storage_path
+        self.fetcher = fetcher
+        self.state = state
+        self.parse_pool = parse_pool
+        self.save_html = save_html
+        # Optional async callable(url, protocol_name, content, commit) receiving new or changed protocols instead of files
+        self.sink = sink
+        self.crawl_id = None
+        # Protocols listed under several subcategories are fetched once per crawl
+        self.seen_urls = set()
+        self.saved = 0
+        self.unchanged = 0
+        self.failed = 0
+        self.transient_failures = 0
+
+    # Parse a page in the worker pool so the event loop keeps fetching
+    async def parse_page(self, method, url, html):
+        if self.save_html:
+            # Keep the raw page as a fixture for the extractor benchmark
+            name = urlsplit(url).path.strip("/").replace("/", "_") or "index"
+            with open(os.path.join(self.save_html, f"{name}.html"), 'w', encoding='utf-8') as file:
+                file.write(html)
+        return await asyncio.get_running_loop().run_in_executor(self.parse_pool, extract, method, html)
+
+    # Count a failed page; only transient failures keep the crawl open for resuming
+    def record_failure(self, url, error):
+        self.failed += 1
+        if is_transient(error):
+            self.transient_failures += 1
+        else:
+            self.state.put_failure(url, self.crawl_id, f"{type(error).__name__}: {error}")
+        print(f"Failed to scrape {url}: {type(error).__name__}: {error}")
+
+    # Fetch a listing page and return its links, reusing the stored links when it is unchanged
+    async def fetch_links(self, url, method):
+        cached = self.state.get(url)
+        status, html, etag, last_modified = await self.fetcher.fetch(url, cached)
+        if status == 304 and cached["links"] is not None:
+            links = cached["links"]
+        else:
+            links = await self.parse_page(method, url, html)
+        self.state.put(url, self.crawl_id, etag, last_modified, links=links)
+        return links
+
+    # Function to extract protocol information from the protocol page
+    async def scrape_protocol(self, protocol_url):
+        url = urljoin(self.base_url, protocol_url)
+        if url in self.seen_urls:
+            return  # Already fetched, or being fetched, from another subcategory
+        self.seen_urls.add(url)
+        cached = self.state.get(url)
+        if cached and cached["crawl_id"] == self.crawl_id:
+            return  # Already done earlier in this (resumed) crawl
+
+        try:
+            status, html, etag, last_modified = await self.fetcher.fetch(url, cached)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.record_failure(url, e)
+            return
+
+        content_hash = cached["content_hash"] if cached else None
+        if status == 304:
+            self.unchanged += 1
+        else:
+            try:
+                protocol_content = await self.parse_page("protocol_text", url, html)
+            except Exception as e:
+                # A page the extractor chokes on fails on its own, not the whole crawl
+                self.record_failure(url, e)
+                return
+            if protocol_content is None:
+                print(f"No protocol data found for {protocol_url}")
+            else:
+                new_hash = hashlib.sha256(protocol_content.encode("utf-8")).hexdigest()
+                if new_hash == content_hash:
+                    self.unchanged += 1
+                else:
+                    protocol_name = protocol_url.rstrip("/").split("/")[-1]  # Use the protocol ID or name in URL for the file name
+                    self.saved += 1
+                    if self.sink:
+                        # Pipeline mode: the sink records the page state through `commit` once the protocol is indexed
+                        commit = functools.partial(self.state.put, url, self.crawl_id, etag, last_modified, content_hash=new_hash)
+                        await self.sink(url, protocol_name, protocol_content, commit)
+                        return
+                    save_text_to_file(protocol_name, protocol_content, self.storage_path)
+                content_hash = new_hash
+        self.state.put(url, self.crawl_id, etag, last_modified, content_hash=content_hash)
+
+    # Function to scrape protocols in each subcategory
+    async def scrape_subcategory(self, subcategory_url):
         print(f"Scraping subcategory: {subcategory_url}")
-        scrape_subcategory(subcategory_url, base_url, storage_path)
+        try:
+            protocol_urls = await self.fetch_links(urljoin(self.base_url, subcategory_url), "protocol_links")
+        except Exception as e:
+            self.record_failure(urljoin(self.base_url, subcategory_url), e)
+            return
+        await asyncio.gather(*(self.scrape_protocol(protocol_url) for protocol_url in protocol_urls))
+
+    # Function to navigate the category page and all subcategories
+    async def crawl(self):
+        started = time.monotonic()
+        self.crawl_id = self.state.begin_crawl()
+        subcategory_urls = await self.fetch_links(self.base_url, "subcategory_links")
+        await asyncio.gather(*(self.scrape_subcategory(subcategory_url) for subcategory_url in subcategory_urls))
+        if not self.transient_failures:
+            # Permanent failures are in the failures table; resuming would only skip pages that changed since
+            self.state.finish_crawl(self.crawl_id)
+        print(
+            f"Crawl finished in {time.monotonic() - started:.1f}s: {self.saved} saved, {self.unchanged} unchanged, "
+            f"{self.failed} failed, {self.fetcher.requests} requests ({self.fetcher.not_modified} not modified)"
+        )
+
+async def scrape_categories(base_url, storage_path, concurrency=DEFAULT_CONCURRENCY, per_host=DEFAULT_PER_HOST, rate=DEFAULT_RATE,
+                            extractor="auto", parse_workers=DEFAULT_PARSE_WORKERS, save_html=None, sink=None, drain=None):
+    os.makedirs(storage_path, exist_ok=True)
+    if save_html:
+        os.makedirs(save_html, exist_ok=True)
+    state = CrawlState(os.path.join(storage_path, CRAWL_STATE_FILE))
+    parse_pool = ProcessPoolExecutor(max_workers=parse_workers, initializer=init_worker, initargs=(extractor,))
+    try:
+        async with Fetcher(concurrency, per_host, rate) as fetcher:
+            await ProtocolCrawler(base_url, storage_path, fetcher, state, parse_pool, save_html, sink).crawl()
+        if drain:
+            await drain()  # Let the sink's consumers call their pending commits while the crawl state is open
+    finally:
+        parse_pool.shutdown()
+        state.close()
 
 # Main function to set up argument parsing
 def main():
     parser = argparse.ArgumentParser(description="Recursive web scraper for Opentrons protocol library")
-    
+
     # Argument for the storage path
     parser.add_argument(
-        '--path', 
-        type=str, 
-        default=DEFAULT_STORAGE_PATH, 
+        '--path',
+        type=str,
+        default=DEFAULT_STORAGE_PATH,
         help="Path to store scraped text files (default: 'data/')"
     )
-    
+
     # Argument for the root URL
     parser.add_argument(
-        '--url', 
-        type=str, 
-        default=DEFAULT_BASE_URL, 
+        '--url',
+        type=str,
+        default=DEFAULT_BASE_URL,
         help="Root URL to start scraping (default: 'https://protocols.opentrons.com/')"
     )
-    
+
+    # Arguments for politeness limits
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Maximum concurrent requests in total")
+    parser.add_argument('--per-host', type=int, default=DEFAULT_PER_HOST, help="Maximum concurrent requests per host")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="Maximum requests per second per host")
+
+    # Arguments for HTML extraction
+    parser.add_argument('--extractor', choices=["auto"] + sorted(EXTRACTORS), default="auto", help="HTML extractor (default: lxml if installed)")
+    parser.add_argument('--parse-workers', type=int, default=DEFAULT_PARSE_WORKERS, help="Processes parsing HTML off the event loop")
+    parser.add_argument('--save-html', type=str, default=None, help="Directory to save raw pages to, as extractor benchmark fixtures")
+
     # Parse the arguments
     args = parser.parse_args()
-    
+
     # Call the scrape function with provided arguments
-    scrape_categories(args.url, args.path)
+    asyncio.run(scrape_categories(
+        args.url, args.path, args.concurrency, args.per_host, args.rate, args.extractor, args.parse_workers, args.save_html
+    ))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,105 @@
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Pluggable extraction of the three things the scraper needs from a page:
+# the protocol text, the subcategory links and the protocol links.
+# Every extractor returns exactly what the full BeautifulSoup parse returns.
+
+# Reference extractor: builds the full BeautifulSoup tree
+class SoupExtractor:
+    name = "soup"
+
+    def __init__(self, parser='html.parser'):
+        self.parser = parser
+
+    def _soup(self, html, parse_only=None):
+        return BeautifulSoup(html, self.parser)
+
+    # Function to extract the protocol text from a protocol page
+    def protocol_text(self, html):
+        soup = self._soup(html, SoupStrainer('div', class_='selected-protocol'))
+        # Find the div with the class 'selected-protocol'
+        protocol_div = soup.find('div', class_='selected-protocol')
+        if protocol_div:
+            # Extract the text content
+            return protocol_div.get_text(separator="\n", strip=True)
+        return None
+
+    # Function to extract the 'subCategory' links of the category page
+    def subcategory_links(self, html):
+        soup = self._soup(html, SoupStrainer('a', class_='subCategory'))
+        return [subcategory['href'] for subcategory in soup.find_all('a', class_='subCategory', href=True)]
+
+    # Function to extract the protocol links of a subcategory page
+    def protocol_links(self, html):
+        soup = self._soup(html, SoupStrainer('div', class_='protocol'))
+        links = []
+        for protocol in soup.find_all('div', class_='protocol'):
+            # Extract the href link for the protocol
+            protocol_link = protocol.find('a', href=True)
+            if protocol_link:
+                links.append(protocol_link['href'])
+        return links
+
+# BeautifulSoup restricted by a SoupStrainer: only the matching elements and their children are built
+class StrainedSoupExtractor(SoupExtractor):
+    name = "strained"
+
+    def _soup(self, html, parse_only=None):
+        return BeautifulSoup(html, self.parser, parse_only=parse_only)
+
+# lxml with XPath class matches: a C parser and no Python object per node
+class LxmlExtractor:
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        self.parse = lxml.html.fromstring
+
+    @staticmethod
+    def _has_class(name):
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    def protocol_text(self, html):
+        divs = self.parse(html).xpath(f"//div[{self._has_class('selected-protocol')}]")
+        if not divs:
+            return None
+        # Same text nodes BeautifulSoup's get_text keeps: no comments, scripts or styles
+        texts = divs[0].xpath(".//text()[not(ancestor::script) and not(ancestor::style)]")
+        return "\n".join(text.strip() for text in texts if text.strip())
+
+    def subcategory_links(self, html):
+        return [str(href) for href in self.parse(html).xpath(f"//a[{self._has_class('subCategory')}][@href]/@href")]
+
+    def protocol_links(self, html):
+        links = []
+        for protocol in self.parse(html).xpath(f"//div[{self._has_class('protocol')}]"):
+            hrefs = protocol.xpath("(.//a[@href])[1]/@href")
+            if hrefs:
+                links.append(str(hrefs[0]))
+        return links
+
+EXTRACTORS = {
+    "soup": SoupExtractor,
+    "strained": StrainedSoupExtractor,
+    "lxml": LxmlExtractor,
+}
+
+# Function to build an extractor by name; "auto" picks lxml when it is installed
+def get_extractor(name="auto"):
+    if name == "auto":
+        try:
+            return LxmlExtractor()
+        except ImportError:
+            return StrainedSoupExtractor()
+    return EXTRACTORS[name]()
+
+_worker_extractor = None
+
+# Worker-pool initializer: build the extractor once per process
+def init_worker(name):
+    global _worker_extractor
+    _worker_extractor = get_extractor(name)
+
+# Function run in the worker pool: apply one extraction method to a page
+def extract(method, html):
+    return getattr(_worker_extractor, method)(html)
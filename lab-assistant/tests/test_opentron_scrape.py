@@ -0,0 +1,107 @@
+# tests/test_opentron_scrape.py
+# Crawls a local fixture site instead of protocols.opentrons.com
+
+import asyncio
+import os
+import sqlite3
+import sys
+from collections import Counter
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# The scraper runs as a standalone script, so import it the same way
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from opentron_scrape import CRAWL_STATE_FILE, scrape_categories  # noqa: E402
+
+CATEGORY = """<html><body>
+<a class="subCategory" href="/sub/a">A</a>
+<a class="subCategory" href="/sub/b">B</a>
+</body></html>"""
+
+SUBCATEGORIES = {
+    # "shared" is listed under both subcategories
+    "a": ["/protocols/shared", "/protocols/first"],
+    "b": ["/protocols/shared", "/protocols/broken"],
+}
+
+PROTOCOL = """<html><body><div class="selected-protocol"><h1>{name}</h1><p>Transfer 10 uL.</p></div></body></html>"""
+
+
+def fixture_site(hits, subcategories=SUBCATEGORIES, bodies=None):
+    bodies = bodies or {}
+
+    async def category(request):
+        hits[request.path] += 1
+        return web.Response(text=CATEGORY, content_type="text/html")
+
+    async def subcategory(request):
+        hits[request.path] += 1
+        links = "".join(f'<div class="protocol"><a href="{link}">x</a></div>' for link in subcategories[request.match_info["name"]])
+        return web.Response(text=f"<html><body>{links}</body></html>", content_type="text/html")
+
+    async def protocol(request):
+        hits[request.path] += 1
+        name = request.match_info["name"]
+        if name in bodies:
+            return web.Response(text=bodies[name], content_type="text/html")
+        if name == "gone":
+            return web.Response(status=404)
+        # An empty document makes the lxml extractor raise
+        return web.Response(text="" if name == "broken" else PROTOCOL.format(name=name), content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/", category)
+    app.router.add_get("/sub/{name}", subcategory)
+    app.router.add_get("/protocols/{name}", protocol)
+    return app
+
+
+def crawl(storage_path, hits, site=None, **kwargs):
+    async def run():
+        async with TestServer(site or fixture_site(hits)) as server:
+            await scrape_categories(str(server.make_url("/")), storage_path, rate=0, extractor="lxml", parse_workers=1, **kwargs)
+    asyncio.run(run())
+
+
+def test_shared_protocol_is_fetched_once_and_a_broken_page_fails_alone(tmp_path):
+    hits = Counter()
+    sunk = []
+
+    async def sink(url, protocol_name, content, commit):
+        sunk.append(protocol_name)
+        commit()
+
+    crawl(str(tmp_path), hits, sink=sink)
+
+    assert hits["/protocols/shared"] == 1
+    assert hits["/protocols/broken"] == 1
+    assert sorted(sunk) == ["first", "shared"]
+
+
+def test_files_are_written_once_per_protocol(tmp_path, capsys):
+    hits = Counter()
+
+    crawl(str(tmp_path), hits)
+
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".txt")) == ["first.txt", "shared.txt"]
+    assert capsys.readouterr().out.count("Saved protocol 'shared'") == 1
+
+
+def test_permanent_failure_does_not_stop_later_crawls_seeing_changes(tmp_path):
+    hits = Counter()
+    subcategories = {"a": ["/protocols/first", "/protocols/gone"], "b": ["/protocols/broken"]}
+    bodies = {"first": PROTOCOL.format(name="first v1")}
+
+    crawl(str(tmp_path), hits, fixture_site(hits, subcategories, bodies))
+    bodies["first"] = PROTOCOL.format(name="first v2")
+    crawl(str(tmp_path), hits, fixture_site(hits, subcategories, bodies))
+
+    assert hits["/protocols/first"] == 2
+    assert "first v2" in (tmp_path / "first.txt").read_text(encoding="utf-8")
+    with sqlite3.connect(tmp_path / CRAWL_STATE_FILE) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM crawls WHERE finished_at IS NULL").fetchone()[0] == 0
+        failed = [url for url, in conn.execute("SELECT url FROM failures")]
+    # Each run serves the site on a new port, so compare paths
+    assert sorted({url.rsplit("/", 1)[-1] for url in failed}) == ["broken", "gone"]
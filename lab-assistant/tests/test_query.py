@@ -0,0 +1,73 @@
+# tests/test_query.py
+# Retrieval and the relevance gate over a small numpy/BM25 index, with a bag-of-words embedding
+
+import hashlib
+import importlib
+import os
+import sys
+
+import numpy as np
+import pytest
+from langchain.schema import Document
+
+# The package directory name is not an identifier, so import its modules by name from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+query = importlib.import_module("lab-assistant.query")
+index_docs = importlib.import_module("lab-assistant.index_docs")
+vector_stores = importlib.import_module("lab-assistant.vector_stores")
+bm25_index = importlib.import_module("lab-assistant.bm25_index")
+
+CHUNKS = [
+  "Add 10 uL Taq polymerase to the PCR master mix",
+  "Label every tube in capital letters before the run",
+  "Incubate the plate at 37 C for one hour",
+]
+
+class BagOfWords:
+  identity = "test:bag-of-words"
+
+  def _embed(self, text):
+    vector = np.zeros(64)
+    for word in text.lower().split():
+      vector[int(hashlib.sha256(word.encode()).hexdigest(), 16) % 64] += 1
+    return vector.tolist()
+
+  def embed_documents(self, texts):
+    return [self._embed(text) for text in texts]
+
+  def embed_query(self, text):
+    return self._embed(text)
+
+  def embed_queries(self, texts):
+    return self.embed_documents(texts)
+
+class NoModel:
+  def predict(self, prompt):
+    return "answer"
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+  monkeypatch.setenv("VECTOR_STORE", "numpy")
+  documents = [Document(page_content=text, metadata={"source": f"protocol-{i}.txt"}) for i, text in enumerate(CHUNKS)]
+  ids = [index_docs.chunk_id(doc) for doc in documents]
+  store = vector_stores.NumpyStore(BagOfWords(), str(tmp_path))
+  store.add_documents(documents, ids)
+  store.close()
+  lexical_index = bm25_index.BM25Index(str(tmp_path))
+  lexical_index.add_documents(documents, ids)
+  lexical_index.persist()
+  return query.RagEngine(str(tmp_path), embedding_function=BagOfWords(), model=NoModel())
+
+def test_relevant_question_reaches_the_model(engine):
+  formatted_response, response_text = engine.query("Add 10 uL Taq polymerase to the PCR master mix")
+
+  assert response_text == "answer"
+  assert "protocol-0.txt" in formatted_response
+
+def test_one_word_lexical_hit_does_not_pass_the_relevance_gate(engine):
+  # BM25 alone rates this a full match, since "capital" is the only query term
+  assert engine.lexical_index.search("capital", 1)[0][1] == pytest.approx(1.0)
+
+  results = engine.retrieve("capital")
+  assert not engine.is_relevant(results)
+  assert engine.query("capital")[1] == query.NO_MATCH_RESPONSE
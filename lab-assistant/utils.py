@@ -1,50 +1,191 @@
 # Langchain dependencies
-from langchain.document_loaders.pdf import PyPDFDirectoryLoader # Importing PDF loader from Langchain
+from langchain.document_loaders import PyPDFLoader # Importing single-file PDF loader from Langchain
+from langchain.document_loaders import TextLoader, Docx2txtLoader # Importing text and Word loaders from Langchain
 from langchain.text_splitter import RecursiveCharacterTextSplitter # Importing text splitter from Langchain
 from langchain.schema import Document # Importing Document schema from Langchain
 
+from pathlib import Path # Importing Path for directory listing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED # Importing process pool to parse files in parallel
+from itertools import islice # Importing islice to cut streams into batches
+from typing import Iterable, Iterator # Importing typing helpers for generators
+import os # Importing os module for operating system functionalities
+import time # Importing time module for throughput reporting
+
 from .constants import DEFAULT_DATA_PATH # Importing constants from constants.py
 
-def load_documents(DATA_PATH = DEFAULT_DATA_PATH):
+# Loader for each supported source file type
+LOADERS = {
+  ".pdf": PyPDFLoader,
+  ".txt": lambda path: TextLoader(path, encoding="utf-8"),
+  ".docx": Docx2txtLoader,
+}
+
+def list_source_files(DATA_PATH = DEFAULT_DATA_PATH):
+  """
+  List the supported source files (.pdf, .txt, .docx) under the specified directory.
+  Returns:
+  list[str]: Sorted file paths.
+  """
+  return sorted(str(path) for path in Path(DATA_PATH).rglob("*") if path.is_file() and path.suffix.lower() in LOADERS)
+
+def load_documents(DATA_PATH = DEFAULT_DATA_PATH, paths = None):
   
   """
-  Load PDF documents from the specified directory using PyPDFDirectoryLoader.
+  Load the PDF, text and Word documents from the specified directory.
+  Args:
+    DATA_PATH (str): Directory to your source files.
+    paths (list[str], optional): Load only these files instead of the whole directory.
   Returns:
-  # Directory to your pdf files:
-  List of Document objects: Loaded PDF documents represented as Langchain
+  List of Document objects: Loaded documents represented as Langchain
                                                           Document objects.
   """
-  # Initialize PDF loader with specified directory
-  document_loader = PyPDFDirectoryLoader(DATA_PATH) 
-  # Load PDF documents and return them as a list of Document objects
-  return document_loader.load() 
+  if paths is None:
+    paths = list_source_files(DATA_PATH)
+  # Load just the requested files, e.g. the ones that changed since the last index run
+  documents = []
+  for path in paths:
+    documents.extend(_load_source_pages(path))
+  return documents
 
 # documents = load_documents() # Call the function
 # # Inspect the contents of the first document as well as metadata
 # print(documents[0])
 
-def split_text(documents: list[Document]):
+def _load_source_pages(path: str) -> list[Document]:
   """
-  Split the text content of the given list of Document objects into smaller chunks.
+  Parse one source file with the loader for its type. Runs inside a worker process.
   Args:
-    documents (list[Document]): List of Document objects containing text content to split.
+    path (str): Path to a .pdf, .txt or .docx file.
   Returns:
-    list[Document]: List of Document objects representing the split text chunks.
+    list[Document]: One Document per PDF page, or one for a whole text or Word file.
   """
-  # Initialize text splitter with specified parameters
-  text_splitter = RecursiveCharacterTextSplitter(
+  return LOADERS[Path(path).suffix.lower()](path).load()
+
+def iter_pages(paths: list[str], workers: int = None, failed: list[str] = None) -> Iterator[tuple[str, list[Document]]]:
+  """
+  Parse source files in a process pool and yield their pages file by file as they finish.
+  Each file is parsed whole, and at most two files per worker are in flight (parsing or
+  waiting to be consumed), so peak memory is about 2 * workers parsed files plus the one
+  being consumed: bounded by the file count, not by the number of paths given.
+  Files that fail to parse are reported and skipped rather than aborting the run.
+  Args:
+    paths (list[str]): Source files to parse.
+    workers (int, optional): Number of worker processes, defaults to the CPU count.
+    failed (list[str], optional): Collects the paths of files that failed to parse.
+  Returns:
+    Iterator[tuple[str, list[Document]]]: (path, pages) for each parsed file.
+  """
+  workers = workers or os.cpu_count() or 1
+  pending_paths = iter(paths)
+  with ProcessPoolExecutor(max_workers=workers) as executor:
+    in_flight = {executor.submit(_load_source_pages, path): path for path in islice(pending_paths, 2 * workers)}
+    while in_flight:
+      done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+      for future in done:
+        path = in_flight.pop(future)
+        # Keep the pool busy before handing the finished file to the consumer
+        for next_path in islice(pending_paths, 1):
+          in_flight[executor.submit(_load_source_pages, next_path)] = next_path
+        try:
+          pages = future.result()
+        except Exception as e:
+          # One corrupt file should not abort the whole ingestion
+          print(f"Skipping {path}: failed to parse ({type(e).__name__}: {e}).")
+          if failed is not None:
+            failed.append(path)
+          continue
+        yield path, pages
+
+def iter_chunks(pages: Iterable[Document], text_splitter: RecursiveCharacterTextSplitter = None) -> Iterator[Document]:
+  """
+  Split pages into chunks on the fly, one page at a time.
+  Args:
+    pages (Iterable[Document]): Pages to split.
+    text_splitter (RecursiveCharacterTextSplitter, optional): Splitter to use, defaults to the one split_text uses.
+  Returns:
+    Iterator[Document]: The split text chunks.
+  """
+  text_splitter = text_splitter or get_text_splitter()
+  for page in pages:
+    yield from text_splitter.split_documents([page])
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+  """
+  Group a stream into lists of at most `size` items.
+  Args:
+    items (Iterable): The stream to group.
+    size (int): Maximum batch size.
+  Returns:
+    Iterator[list]: The batches.
+  """
+  items = iter(items)
+  while batch := list(islice(items, size)):
+    yield batch
+
+class IngestProgress:
+  """
+  Progress and throughput reporter for streaming ingestion.
+  Prints a line at most every `interval` seconds and a summary on finish.
+  """
+
+  def __init__(self, total_files: int, interval: float = 5.0):
+    self.total_files = total_files
+    self.interval = interval
+    self.files = 0
+    self.pages = 0
+    self.chunks = 0
+    self.started = time.monotonic()
+    self.last_report = self.started
+
+  def update(self, files: int = 0, pages: int = 0, chunks: int = 0):
+    self.files += files
+    self.pages += pages
+    self.chunks += chunks
+    now = time.monotonic()
+    if now - self.last_report >= self.interval:
+      self.last_report = now
+      print(self.summary())
+
+  def summary(self) -> str:
+    elapsed = max(time.monotonic() - self.started, 1e-9)
+    return (
+      f"{self.files}/{self.total_files} files, {self.pages} pages, {self.chunks} chunks "
+      f"in {elapsed:.1f}s ({self.pages / elapsed:.1f} pages/s, {self.chunks / elapsed:.1f} chunks/s)"
+    )
+
+  def finish(self):
+    print(f"Ingested {self.summary()}.")
+
+def get_text_splitter() -> RecursiveCharacterTextSplitter:
+  """
+  Build the text splitter used for every document, so chunk boundaries (and chunk IDs) stay stable.
+  Returns:
+    RecursiveCharacterTextSplitter: The configured splitter.
+  """
+  return RecursiveCharacterTextSplitter(
     chunk_size=300, # Size of each chunk in characters
     chunk_overlap=100, # Overlap between consecutive chunks
     length_function=len, # Function to compute the length of the text
     add_start_index=True, # Flag to add start index to each chunk
   )
 
+def split_text(documents: list[Document]):
+  """
+  Split the text content of the given list of Document objects into smaller chunks.
+  Args:
+    documents (list[Document]): List of Document objects containing text content to split.
+  Returns:
+    list[Document]: List of Document objects representing the split text chunks.
+  """
+  # Initialize text splitter with specified parameters
+  text_splitter = get_text_splitter()
+
   # Split documents into smaller chunks using text splitter
   chunks = text_splitter.split_documents(documents)
   print(f"Split {len(documents)} documents into {len(chunks)} chunks.")
 
   # Print example of page content and metadata for a chunk
-  document = chunks[0]
+  # document = chunks[0]
   # print(document.page_content)
   # print(document.metadata)
 
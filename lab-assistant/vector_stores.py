@@ -0,0 +1,386 @@
+# Langchain dependencies
+from langchain.schema import Document # Importing Document schema from Langchain
+from langchain.vectorstores.chroma import Chroma # Importing Chroma vector store from Langchain
+from langchain_core.embeddings import Embeddings # Importing the embeddings interface from Langchain
+
+import json # Importing json module to store chunk texts and metadata
+import os # Importing os module for operating system functionalities
+import numpy as np # Importing numpy for the in-process vector index
+
+from .constants import CHROMA_PATH # Importing constants from constants.py
+
+class VectorStore:
+  """
+  Interface shared by the vector store backends. Every store lives in the index directory,
+  next to the manifest and the embedding backend record.
+  """
+
+  kind: str
+
+  def add_documents(self, documents: list[Document], ids: list[str]):
+    """Embed and upsert documents under the given IDs."""
+    raise NotImplementedError
+
+  def delete(self, ids: list[str]):
+    """Delete documents by ID; unknown IDs are ignored."""
+    raise NotImplementedError
+
+  def persist(self):
+    """Flush pending changes to disk."""
+
+  def close(self):
+    """Flush pending changes and compact the store; called once when a writer is done."""
+    self.persist()
+
+  def search_by_vectors(self, query_vectors: list[list[float]], k: int, sources: list[str] = None) -> list[list[tuple[Document, float]]]:
+    """
+    Find the top-k documents for each query vector.
+    Args:
+      query_vectors (list[list[float]]): One embedding per query.
+      k (int): Number of results per query.
+      sources (list[str], optional): Only return chunks whose `source` metadata is one of these.
+    Returns:
+      list[list[tuple[Document, float]]]: (document, relevance score) pairs per query, best first.
+    """
+    raise NotImplementedError
+
+class ChromaStore(VectorStore):
+  """
+  The on-disk Chroma database.
+  """
+
+  kind = "chroma"
+
+  def __init__(self, embedding_function: Embeddings, persist_directory: str = CHROMA_PATH):
+    self.db = Chroma(persist_directory=persist_directory, embedding_function=embedding_function)
+
+  def add_documents(self, documents: list[Document], ids: list[str]):
+    self.db.add_documents(documents, ids=ids)
+
+  def delete(self, ids: list[str]):
+    if ids:
+      self.db.delete(ids=ids)
+
+  def persist(self):
+    self.db.persist()
+
+  def search_by_vectors(self, query_vectors: list[list[float]], k: int, sources: list[str] = None) -> list[list[tuple[Document, float]]]:
+    # All queries go to Chroma in one collection query
+    results = self.db._collection.query(
+      query_embeddings=query_vectors,
+      n_results=k,
+      where={"source": {"$in": list(sources)}} if sources else None,
+      include=["documents", "metadatas", "distances"],
+    )
+    relevance_score_fn = self.db._select_relevance_score_fn()
+    return [
+      [
+        (Document(page_content=text, metadata=metadata or {}), relevance_score_fn(distance))
+        for text, metadata, distance in zip(texts, metadatas, distances)
+      ]
+      for texts, metadatas, distances in zip(results["documents"], results["metadatas"], results["distances"])
+    ]
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+  norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+  return vectors / np.maximum(norms, 1e-12)
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+  # argpartition finds the k best in linear time; only those k are then sorted
+  k = min(k, scores.shape[0])
+  if k == 0:
+    return np.empty(0, dtype=np.int64)
+  best = np.argpartition(-scores, k - 1)[:k]
+  best = best[np.argsort(-scores[best])]
+  return best[np.isfinite(scores[best])]
+
+class NumpyStore(VectorStore):
+  """
+  In-process index: float32 unit vectors in memory-mapped .npy files, scored with one matrix
+  product per query batch. Relevance scores are cosine similarities.
+
+  Added rows are buffered in memory; persist() writes the buffer out as a new segment file and
+  close() merges the base matrix and every segment into a new base once, so ingesting N rows costs
+  O(N) rather than rewriting the whole index on every batch. Files are never rewritten in place:
+  each one is written under a new name and index.json, replaced atomically, names the set of files
+  that make up the index, so a reader or a crash never sees new vectors with old documents.
+
+  With `ivf_lists` set, close() clusters the vectors with k-means and stores each cluster's rows
+  contiguously; a query then only scores the rows of its `nprobe` closest clusters (plus the rows
+  not merged yet), so a corpus larger than RAM is read from the memory map a few slices at a time.
+  """
+
+  kind = "numpy"
+  BLOCK = 65536 # Rows per block when streaming vectors through k-means and merges
+
+  def __init__(self, embedding_function: Embeddings, persist_directory: str = CHROMA_PATH, ivf_lists: int = 0, nprobe: int = 8):
+    self.embedding_function = embedding_function
+    self.directory = os.path.join(persist_directory, "numpy")
+    self.ivf_lists = ivf_lists
+    self.nprobe = nprobe
+    self._load()
+
+  def _path(self, name: str) -> str:
+    return os.path.join(self.directory, name)
+
+  def _read_records(self, name: str) -> list[dict]:
+    with open(self._path(name), "r", encoding="utf-8") as file:
+      return [json.loads(line) for line in file]
+
+  def _write_records(self, name: str, records: list[dict]):
+    with open(self._path(name), "w", encoding="utf-8") as file:
+      for record in records:
+        file.write(json.dumps(record) + "\n")
+
+  @staticmethod
+  def _empty_index(generation: int) -> dict:
+    return {
+      "generation": generation, "segments": [], "removed": [],
+      "vectors": None, "documents": None, "ivf_centroids": None, "ivf_offsets": None,
+    }
+
+  def _load(self):
+    if os.path.exists(self._path("index.json")):
+      with open(self._path("index.json"), "r", encoding="utf-8") as file:
+        self.index = json.load(file)
+    else:
+      # No index written yet
+      self.index = self._empty_index(0)
+
+    self.records = []
+    self.vectors = None
+    if self.index["vectors"]:
+      self.vectors = np.load(self._path(self.index["vectors"]), mmap_mode="r")
+      self.records.extend(self._read_records(self.index["documents"]))
+    self.centroids = None
+    self.list_offsets = None
+    if self.index["ivf_centroids"]:
+      self.centroids = np.load(self._path(self.index["ivf_centroids"]))
+      self.list_offsets = np.load(self._path(self.index["ivf_offsets"]))
+
+    self.segments = []
+    for name in self.index["segments"]:
+      self.segments.append(np.load(self._path(name + ".npy"), mmap_mode="r"))
+      self.records.extend(self._read_records(name + ".jsonl"))
+    self.pending = []
+    self.pending_rows = 0
+
+    # Rows are numbered across the base, the segments and the pending buffer; removed rows
+    # keep their number until the next merge
+    self.removed = set(self.index["removed"])
+    self.row_of = {record["id"]: row for row, record in enumerate(self.records) if row not in self.removed}
+    self.sources = [record["metadata"].get("source") for record in self.records]
+    self._live = None
+
+  def _extra_blocks(self) -> list[np.ndarray]:
+    """Rows not merged into the base yet: the flushed segments, then the pending buffer."""
+    return self.segments + self.pending
+
+  def _blocks(self) -> list[np.ndarray]:
+    return ([self.vectors] if self.vectors is not None else []) + self._extra_blocks()
+
+  def _live_mask(self) -> np.ndarray:
+    if self._live is None:
+      self._live = np.ones(len(self.records), dtype=bool)
+      self._live[list(self.removed)] = False
+    return self._live
+
+  def add_documents(self, documents: list[Document], ids: list[str]):
+    if not documents:
+      return
+    vectors = _normalize(np.asarray(self.embedding_function.embed_documents([doc.page_content for doc in documents]), dtype=np.float32))
+    self.pending.append(vectors)
+    self.pending_rows += len(documents)
+    for doc_id, doc in zip(ids, documents):
+      # Upsert: the previous row with this ID is hidden and dropped at the next merge
+      if doc_id in self.row_of:
+        self.removed.add(self.row_of[doc_id])
+      self.row_of[doc_id] = len(self.records)
+      self.records.append({"id": doc_id, "text": doc.page_content, "metadata": doc.metadata})
+      self.sources.append(doc.metadata.get("source"))
+    self._live = None
+
+  def delete(self, ids: list[str]):
+    for doc_id in ids:
+      row = self.row_of.pop(doc_id, None)
+      if row is not None:
+        self.removed.add(row)
+        self._live = None
+
+  def _commit(self, index: dict):
+    """
+    Atomically switch to the files named by `index`, then delete files no index refers to.
+    """
+    with open(self._path("index.json.tmp"), "w", encoding="utf-8") as file:
+      json.dump(index, file)
+    os.replace(self._path("index.json.tmp"), self._path("index.json"))
+    self.index = index
+
+    referenced = {index[name] for name in ("vectors", "documents", "ivf_centroids", "ivf_offsets") if index.get(name)}
+    referenced.update(name + suffix for name in index["segments"] for suffix in (".npy", ".jsonl"))
+    for name in os.listdir(self.directory):
+      if name.endswith((".npy", ".jsonl")) and name not in referenced:
+        os.remove(self._path(name))
+
+  def persist(self):
+    """
+    Checkpoint: write the pending rows as one new segment and record removed rows. Costs O(new rows).
+    """
+    os.makedirs(self.directory, exist_ok=True)
+    removed = sorted(self.removed)
+    if not self.pending and removed == self.index["removed"]:
+      return
+    index = dict(self.index, removed=removed)
+    if self.pending:
+      name = f"segment-{index['generation']}-{len(index['segments'])}"
+      with open(self._path(name + ".npy"), "wb") as file:
+        np.save(file, np.concatenate(self.pending))
+      self._write_records(name + ".jsonl", self.records[len(self.records) - self.pending_rows:])
+      index["segments"] = index["segments"] + [name]
+    self._commit(index)
+    if self.pending:
+      # Serve the flushed rows from the memory map instead of RAM
+      self.segments.append(np.load(self._path(name + ".npy"), mmap_mode="r"))
+      self.pending = []
+      self.pending_rows = 0
+
+  def close(self):
+    """
+    Merge the base and all segments into a new base, dropping removed rows and rebuilding
+    the IVF clusters. Runs once per writer, so the whole index is rewritten once per run.
+    """
+    self.persist()
+    live_rows = np.flatnonzero(self._live_mask())
+    use_ivf = bool(self.ivf_lists) and len(live_rows) > self.ivf_lists
+    if not self.index["segments"] and not self.removed and use_ivf == (self.centroids is not None):
+      return
+
+    generation = self.index["generation"] + 1
+    index = self._empty_index(generation)
+    if len(live_rows):
+      # Stream the surviving rows of every block into one new matrix
+      staging = f"merge-{generation}.npy"
+      merged = np.lib.format.open_memmap(self._path(staging), mode="w+", dtype=np.float32, shape=(len(live_rows), self._blocks()[0].shape[1]))
+      live = self._live_mask()
+      written = 0
+      first_row = 0
+      for block in self._blocks():
+        for start in range(0, block.shape[0], self.BLOCK):
+          piece = np.asarray(block[start:start + self.BLOCK])
+          piece = piece[live[first_row + start:first_row + start + len(piece)]]
+          merged[written:written + len(piece)] = piece
+          written += len(piece)
+        first_row += block.shape[0]
+      records = [self.records[row] for row in live_rows]
+
+      vectors_name = f"vectors-{generation}.npy"
+      if use_ivf:
+        order, centroids, list_offsets = self._build_ivf(merged)
+        # Write the rows cluster by cluster so each cluster is one contiguous slice
+        ordered = np.lib.format.open_memmap(self._path(vectors_name), mode="w+", dtype=np.float32, shape=merged.shape)
+        for start in range(0, len(order), self.BLOCK):
+          ordered[start:start + self.BLOCK] = merged[order[start:start + self.BLOCK]]
+        ordered.flush()
+        del ordered
+        records = [records[row] for row in order]
+        index["ivf_centroids"] = f"ivf_centroids-{generation}.npy"
+        index["ivf_offsets"] = f"ivf_offsets-{generation}.npy"
+        np.save(self._path(index["ivf_centroids"]), centroids)
+        np.save(self._path(index["ivf_offsets"]), list_offsets)
+        del merged
+        os.remove(self._path(staging))
+      else:
+        merged.flush()
+        del merged
+        os.replace(self._path(staging), self._path(vectors_name))
+      index["vectors"] = vectors_name
+      index["documents"] = f"documents-{generation}.jsonl"
+      self._write_records(index["documents"], records)
+
+    self._commit(index)
+    self._load()
+
+  def _build_ivf(self, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Cluster the vectors with spherical k-means, reading them a block at a time.
+    Returns:
+      tuple: (row order that makes each cluster contiguous, centroids, list offsets)
+    """
+    rng = np.random.default_rng(0)
+    centroids = np.asarray(vectors[np.sort(rng.choice(vectors.shape[0], self.ivf_lists, replace=False))])
+    for _ in range(10):
+      sums = np.zeros_like(centroids)
+      for start in range(0, vectors.shape[0], self.BLOCK):
+        block = np.asarray(vectors[start:start + self.BLOCK])
+        np.add.at(sums, np.argmax(block @ centroids.T, axis=1), block)
+      # Empty clusters keep their previous centroid
+      filled = np.linalg.norm(sums, axis=1) > 0
+      centroids = _normalize(np.where(filled[:, None], sums, centroids))
+    assignments = self._assign(vectors, centroids)
+    order = np.argsort(assignments, kind="stable")
+    list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=self.ivf_lists))])
+    return order, centroids.astype(np.float32), list_offsets
+
+  @classmethod
+  def _assign(cls, vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([
+      np.argmax(vectors[start:start + cls.BLOCK] @ centroids.T, axis=1)
+      for start in range(0, vectors.shape[0], cls.BLOCK)
+    ])
+
+  def _document(self, row: int) -> Document:
+    record = self.records[row]
+    return Document(page_content=record["text"], metadata=record["metadata"])
+
+  def search_by_vectors(self, query_vectors: list[list[float]], k: int, sources: list[str] = None) -> list[list[tuple[Document, float]]]:
+    if not self.row_of:
+      return [[] for _ in query_vectors]
+    queries = _normalize(np.asarray(query_vectors, dtype=np.float32))
+    allowed = self._live_mask()
+    if sources:
+      allowed = allowed & np.isin(np.array(self.sources, dtype=object), list(sources))
+
+    if self.centroids is None:
+      # Exact search: one (queries x corpus) matrix product per block for the whole batch
+      scores = np.concatenate([queries @ block.T for block in self._blocks()], axis=1)
+      scores[:, ~allowed] = -np.inf
+      return [[(self._document(row), float(row_scores[row])) for row in _top_k(row_scores, k)] for row_scores in scores]
+
+    # IVF search: score only the rows of each query's closest clusters, plus every unmerged row
+    base_rows = self.vectors.shape[0]
+    extra_rows = np.arange(base_rows, len(self.records))
+    extra_blocks = self._extra_blocks()
+    extra_scores = np.concatenate([queries @ block.T for block in extra_blocks], axis=1) if extra_blocks else np.zeros((len(queries), 0), dtype=np.float32)
+    nprobe = min(self.nprobe, self.centroids.shape[0])
+    probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+    results = []
+    for query, lists, query_extra_scores in zip(queries, probes, extra_scores):
+      rows = np.concatenate([np.arange(self.list_offsets[list_id], self.list_offsets[list_id + 1]) for list_id in lists])
+      scores = np.concatenate([self.vectors[rows] @ query, query_extra_scores])
+      rows = np.concatenate([rows, extra_rows])
+      scores[~allowed[rows]] = -np.inf
+      results.append([(self._document(rows[i]), float(scores[i])) for i in _top_k(scores, k)])
+    return results
+
+STORES = {
+  "chroma": ChromaStore,
+  "numpy": NumpyStore,
+}
+
+def get_vector_store(embedding_function: Embeddings, persist_directory: str = CHROMA_PATH, kind: str = None) -> VectorStore:
+  """
+  Open a vector store, by default the one named by the VECTOR_STORE environment variable.
+  VECTOR_STORE_IVF_LISTS enables IVF clustering for the numpy store.
+  Args:
+    embedding_function (Embeddings): Embedding function used to embed added documents.
+    persist_directory (str): Directory of the index.
+    kind (str, optional): "chroma" (default) or "numpy".
+  Returns:
+    VectorStore: The vector store.
+  """
+  kind = kind or os.getenv("VECTOR_STORE", "chroma")
+  if kind not in STORES:
+    raise ValueError(f"Unknown vector store {kind!r}, expected one of {sorted(STORES)}.")
+  if kind == "numpy":
+    return NumpyStore(embedding_function, persist_directory, ivf_lists=int(os.getenv("VECTOR_STORE_IVF_LISTS", "0")))
+  return ChromaStore(embedding_function, persist_directory)
@@ -1,10 +1,13 @@
 # auth.py
 from fastapi import APIRouter, HTTPException, Depends, Request, Header
 import firebase_admin
-from firebase_admin import auth as firebase_auth, credentials
+from firebase_admin import credentials
 from dotenv import load_dotenv
 import os
 
+from services.metrics import span
+from services.token_service import GoogleKeySet, TokenVerifier
+
 router = APIRouter(tags=["auth"])
 
 # Load environment variables
@@ -15,12 +18,15 @@ if not firebase_admin._apps:
     cred = credentials.Certificate(os.getenv("FIREBASE_CREDENTIALS_PATH"))
     firebase_admin.initialize_app(cred)
 
-def verify_firebase_token(authorization: str = Header(...)):
+# Verified tokens are cached until they expire; signing certs refresh in the background
+token_verifier = TokenVerifier(GoogleKeySet(), project_id=firebase_admin.get_app().project_id)
+
+async def verify_firebase_token(authorization: str = Header(...)):
     """
     Verifies the Firebase ID token provided in the Authorization header.
 
     Args:
-        request (Request): The current request.
+        authorization (str): The Authorization header value.
 
     Returns:
         dict: The decoded Firebase ID token.
@@ -33,7 +39,8 @@ def verify_firebase_token(authorization: str = Header(...)):
         raise HTTPException(status_code=401, detail="Invalid authorization header format")
     id_token = authorization.split("Bearer ")[1]
     try:
-        decoded_token = firebase_auth.verify_id_token(id_token)
+        with span("verify_token"):
+            decoded_token = await token_verifier.verify(id_token)
         return decoded_token
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid token: " + str(e))
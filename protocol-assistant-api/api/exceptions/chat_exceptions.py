@@ -0,0 +1,16 @@
+# exceptions/chat_exceptions.py
+from typing import Any, Dict, Optional
+
+
+class ChatPipelineError(Exception):
+    def __init__(self, detail: str, status_code: int = 500, error: Optional[str] = None):
+        self.detail = detail
+        self.status_code = status_code
+        self.error = error
+        super().__init__(self.detail)
+
+    def to_content(self) -> Dict[str, Any]:
+        content = {"detail": self.detail}
+        if self.error is not None:
+            content["error"] = self.error
+        return content
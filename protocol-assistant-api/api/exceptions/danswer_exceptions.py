@@ -0,0 +1,7 @@
+# exceptions/danswer_exceptions.py
+class DanswerAPIError(Exception):
+    def __init__(self, message: str, status_code: int = 502, response_text: str = ""):
+        self.message = message
+        self.status_code = status_code
+        self.response_text = response_text
+        super().__init__(self.message)
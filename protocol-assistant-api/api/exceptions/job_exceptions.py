@@ -0,0 +1,6 @@
+# exceptions/job_exceptions.py
+class JobQueueFullError(Exception):
+    def __init__(self, queue_depth: int, retry_after: int = 5):
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+        super().__init__(f"Job queue is full ({queue_depth} jobs waiting)")
@@ -1,13 +1,136 @@
 # main.py
+from contextlib import asynccontextmanager
 from email.mime import base
 from fastapi import FastAPI
-from auth import router as auth_router
+from auth import router as auth_router, token_verifier
 from routes.upload_protocol import router as file_router
 from routes.chat import router as chat_router
+from routes.jobs import router as jobs_router
+from routes.metrics import router as metrics_router
+from services.config_registry import ConfigRegistry
+from services.chat_service import ProtocolReviewPipeline
+from services.danswer_client import DanswerClient
+from services.job_runner import JobRunner
+from services.job_store import JobStore
+from services.metrics import MetricsMiddleware, metrics
+from services.prompt_catalogue import PromptCatalogue
+from services.review_cache import ReviewCache
+from services.session_pool import ChatSessionPool
+from services.upload_cache import FileDescriptorCache
+from config.headers import get_headers
+from utils.initialize import (
+    CHAT_SESSION_MAX_AGE,
+    CHAT_SESSION_POOL_SIZE,
+    DANSWER_BASE_URL,
+    DANSWER_POOL_SIZE,
+    DANSWER_REQUEST_TIMEOUT,
+    DANSWER_STREAM_TIMEOUT,
+    JOB_CONCURRENCY,
+    JOB_QUEUE_DEPTH,
+    JOB_SPOOL_DIR,
+    JOB_STORE_PATH,
+    JOB_TTL,
+    METRICS_ENABLED,
+    PROMPT_CATALOGUE_TTL,
+    REVIEW_CACHE_MAX_ENTRIES,
+    REVIEW_CACHE_TTL,
+    UPLOAD_CACHE_MAX_AGE,
+    UPLOAD_CACHE_MAX_ENTRIES,
+    UPLOAD_CACHE_PATH,
+)
 
-app = FastAPI(root_path="/api")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Config is parsed once here and hot-reloaded when the files change
+    config_registry = ConfigRegistry()
+    await config_registry.start()
+    app.state.config_registry = config_registry
+
+    # One pooled Danswer session per worker process
+    danswer_client = DanswerClient(
+        base_url=DANSWER_BASE_URL,
+        headers=get_headers(),
+        endpoints=config_registry.snapshot.endpoints.model_dump(),
+        pool_size=DANSWER_POOL_SIZE,
+        request_timeout=DANSWER_REQUEST_TIMEOUT,
+        stream_timeout=DANSWER_STREAM_TIMEOUT,
+    )
+    config_registry.add_listener(lambda snapshot: danswer_client.set_endpoints(snapshot.endpoints.model_dump()))
+    await danswer_client.start()
+    app.state.danswer_client = danswer_client
+    prompt_catalogue = PromptCatalogue(danswer_client, ttl=PROMPT_CATALOGUE_TTL)
+    app.state.prompt_catalogue = prompt_catalogue
+    session_pool = None
+    if CHAT_SESSION_POOL_SIZE > 0:
+        session_pool = ChatSessionPool(danswer_client, CHAT_SESSION_POOL_SIZE, max_age=CHAT_SESSION_MAX_AGE)
+        await session_pool.start()
+    app.state.session_pool = session_pool
+    descriptor_cache = None
+    if UPLOAD_CACHE_PATH:
+        descriptor_cache = FileDescriptorCache(
+            UPLOAD_CACHE_PATH, max_entries=UPLOAD_CACHE_MAX_ENTRIES, max_age=UPLOAD_CACHE_MAX_AGE
+        )
+    app.state.descriptor_cache = descriptor_cache
+    app.state.review_cache = (
+        ReviewCache(REVIEW_CACHE_TTL, max_entries=REVIEW_CACHE_MAX_ENTRIES) if REVIEW_CACHE_TTL > 0 else None
+    )
+    await token_verifier.start()
+
+    # Background review jobs share the pools and caches above
+    job_store = None
+    job_runner = None
+    if JOB_STORE_PATH:
+        job_store = JobStore(JOB_STORE_PATH)
+        job_runner = JobRunner(
+            job_store,
+            lambda: ProtocolReviewPipeline(
+                danswer_client, config_registry.snapshot, session_pool, descriptor_cache, prompt_catalogue
+            ),
+            JOB_SPOOL_DIR,
+            concurrency=JOB_CONCURRENCY,
+            queue_depth=JOB_QUEUE_DEPTH,
+            ttl=JOB_TTL,
+        )
+        await job_runner.start()
+    app.state.job_runner = job_runner
+
+    # Component stats are read when /metrics is scraped
+    metrics.register_collector("token_cache", token_verifier.stats)
+    metrics.register_collector("prompt_catalogue", prompt_catalogue.stats)
+    if session_pool is not None:
+        metrics.register_collector("session_pool", session_pool.stats)
+    if descriptor_cache is not None:
+        metrics.register_collector("upload_cache", descriptor_cache.stats)
+    if app.state.review_cache is not None:
+        metrics.register_collector("review_cache", app.state.review_cache.stats)
+    if job_runner is not None:
+        metrics.register_collector("jobs", job_runner.stats)
+    try:
+        yield
+    finally:
+        for component in ("token_cache", "prompt_catalogue", "session_pool", "upload_cache", "review_cache", "jobs"):
+            metrics.unregister_collector(component)
+        # Stop the workers before the clients they use are closed
+        if job_runner is not None:
+            await job_runner.close()
+            job_store.close()
+        await token_verifier.close()
+        if session_pool is not None:
+            await session_pool.close()
+        await danswer_client.close()
+        await config_registry.close()
+        if descriptor_cache is not None:
+            descriptor_cache.close()
+
+
+app = FastAPI(root_path="/api", lifespan=lifespan)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
 
 app.include_router(auth_router, prefix="/auth")
 app.include_router(file_router, prefix="/protocol-assistant")
 app.include_router(chat_router, prefix="/protocol-assistant")
-
+app.include_router(jobs_router, prefix="/protocol-assistant")
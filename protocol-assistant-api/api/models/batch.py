@@ -0,0 +1,8 @@
+# models/batch.py
+from pydantic import BaseModel, Field
+from typing import List
+
+class BatchItem(BaseModel):
+    user_request: str
+    # Positions in the request's `files` list; items may share files
+    files: List[int] = Field(default_factory=list)
@@ -0,0 +1,19 @@
+# models/config.py
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Tuple
+
+class DanswerEndpoints(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    send_message: str
+    create_chat_session: str
+    upload_file: str
+    input_prompt: str
+
+class ConfigSnapshot(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    endpoints: DanswerEndpoints
+    # Reviewer prompt first, action prompt second
+    prompt_sequence: Tuple[str, ...] = Field(min_length=2)
+    version: str
@@ -0,0 +1,73 @@
+# endpoints/jobs.py
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, Form, Query, UploadFile
+from fastapi.responses import JSONResponse
+
+from auth import verify_firebase_token
+from exceptions.job_exceptions import JobQueueFullError
+from exceptions.upload_exceptions import FileValidationError
+from services.job_runner import JobRunner, get_job_runner
+from utils.initialize import JOB_MAX_WAIT
+
+router = APIRouter()
+
+
+def job_content(job: dict) -> dict:
+    """Public view of a job record"""
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+
+@router.post("/jobs", status_code=202)
+async def create_job(
+    user_request: str = Form(...),
+    files: Optional[List[UploadFile]] = File(None),
+    token_data=Depends(verify_firebase_token),
+    job_runner: Optional[JobRunner] = Depends(get_job_runner)
+):
+    """
+    Queue a protocol review and return its job ID at once. Poll
+    `GET /jobs/{job_id}`, optionally with `?wait=<seconds>` to long-poll.
+    """
+    if job_runner is None:
+        return JSONResponse(status_code=503, content={"detail": "Job API is disabled"})
+    try:
+        job = await job_runner.submit(token_data["uid"], user_request, files)
+    except JobQueueFullError as e:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(e)},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except FileValidationError as e:
+        return JSONResponse(status_code=e.status_code, content={"detail": "Failed to upload files", "error": e.message})
+    return JSONResponse(
+        status_code=202,
+        content={**job_content(job), "status_url": f"/protocol-assistant/jobs/{job['job_id']}"}
+    )
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, description="Seconds to wait for the job to finish"),
+    token_data=Depends(verify_firebase_token),
+    job_runner: Optional[JobRunner] = Depends(get_job_runner)
+):
+    """Return the job's status, and its result or error once finished"""
+    if job_runner is None:
+        return JSONResponse(status_code=503, content={"detail": "Job API is disabled"})
+    job = await job_runner.get(job_id)
+    # Other users' jobs are indistinguishable from unknown ones, and are never waited on
+    if job is None or job["owner"] != token_data["uid"]:
+        return JSONResponse(status_code=404, content={"detail": "Job not found"})
+    if wait > 0:
+        job = await job_runner.wait(job_id, min(wait, JOB_MAX_WAIT)) or job
+    return job_content(job)
@@ -0,0 +1,13 @@
+# endpoints/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from services.metrics import metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus scrape target: request, stage and upstream latencies plus cache stats"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,84 @@
+# services/batch_service.py
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+from fastapi import UploadFile
+
+from exceptions.chat_exceptions import ChatPipelineError
+from models.batch import BatchItem
+from services.chat_service import ProtocolReviewPipeline
+
+logger = logging.getLogger(__name__)
+
+Upload = Union[Dict[str, Any], ChatPipelineError]
+
+
+class BatchReview:
+    """
+    Reviews many protocols in one request: each file an item attaches is
+    uploaded once with bounded concurrency, then the items' chat turns run
+    concurrently and each result is yielded as soon as it is ready.
+    """
+
+    UPLOAD_CONCURRENCY = 4
+    REVIEW_CONCURRENCY = 8
+
+    def __init__(
+        self,
+        pipeline: ProtocolReviewPipeline,
+        upload_concurrency: int = UPLOAD_CONCURRENCY,
+        review_concurrency: int = REVIEW_CONCURRENCY,
+    ):
+        self.pipeline = pipeline
+        self._upload_slots = asyncio.Semaphore(upload_concurrency)
+        self._review_slots = asyncio.Semaphore(review_concurrency)
+
+    async def _upload_one(self, file: UploadFile) -> Upload:
+        async with self._upload_slots:
+            try:
+                descriptors = await self.pipeline.upload_files([file])
+                if len(descriptors) != 1:
+                    raise ChatPipelineError(
+                        "Failed to upload files", 502, f"Expected 1 file descriptor for {file.filename}, got {len(descriptors)}"
+                    )
+                return descriptors[0]
+            except ChatPipelineError as e:
+                # Only the items attaching this file fail
+                return e
+
+    async def upload(self, files: Optional[List[UploadFile]], items: List[BatchItem]) -> Dict[int, Upload]:
+        """
+        Upload every file some item attaches, returning its descriptor or the
+        error it failed with by position in `files`
+        """
+        positions = sorted({position for item in items for position in item.files})
+        uploads = await asyncio.gather(*(self._upload_one(files[position]) for position in positions))
+        return dict(zip(positions, uploads))
+
+    async def _review_one(self, index: int, item: BatchItem, uploads: Dict[int, Upload]) -> Dict[str, Any]:
+        try:
+            descriptors = [uploads[position] for position in item.files]
+            failed = next((upload for upload in descriptors if isinstance(upload, ChatPipelineError)), None)
+            if failed is not None:
+                raise failed
+            async with self._review_slots:
+                result = await self.pipeline.review(item.user_request, descriptors)
+        except ChatPipelineError as e:
+            return {"index": index, "status": "failed", "error": {"status_code": e.status_code, **e.to_content()}}
+        except Exception:
+            logger.exception("Batch item %d failed", index)
+            return {"index": index, "status": "failed", "error": {"status_code": 500, "detail": "Internal server error"}}
+        return {"index": index, "status": "succeeded", "result": result}
+
+    async def results(self, items: List[BatchItem], uploads: Dict[int, Upload]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield one record per item in completion order; `index` is the item's position in the request"""
+        tasks = [asyncio.create_task(self._review_one(index, item, uploads)) for index, item in enumerate(items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The client went away mid-stream; stop the reviews still running
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,282 @@
+# services/chat_service.py
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+from config.base_chat_payload import get_base_payload
+from exceptions.chat_exceptions import ChatPipelineError
+from exceptions.danswer_exceptions import DanswerAPIError
+from exceptions.upload_exceptions import FileValidationError
+from logging_config import Payload
+from models.config import ConfigSnapshot
+from services.danswer_client import DanswerClient
+from services.file_service import FileService
+from services.metrics import metered_stream, span
+from services.prompt_catalogue import PromptCatalogue
+from services.review_cache import ReviewCache
+from services.session_pool import ChatSessionPool
+from services.upload_cache import FileDescriptorCache
+from services.upload_service import UploadService
+from utils.parsing import extract_json_from_message
+from utils.streaming import DanswerStreamParser, StreamError, TokenDelta
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class PipelineEvent:
+    event: str
+    data: Any
+
+
+class ProtocolReviewPipeline:
+    """The upload -> session -> reviewer turn -> action turn sequence behind /chat"""
+
+    def __init__(
+        self,
+        client: DanswerClient,
+        config: ConfigSnapshot,
+        session_pool: Optional[ChatSessionPool] = None,
+        descriptor_cache: Optional[FileDescriptorCache] = None,
+        prompt_catalogue: Optional[PromptCatalogue] = None,
+    ):
+        self.client = client
+        self.config = config
+        self.session_pool = session_pool
+        self.descriptor_cache = descriptor_cache
+        self.prompt_catalogue = prompt_catalogue
+        self._resolved_prompts: Optional[Tuple[str, str]] = None
+        prompts = config.prompt_sequence
+        self.protocol_reviewer_prompt, self.protocol_action_prompt = prompts[0], prompts[1]
+
+    async def upload_files(
+        self,
+        files: Optional[List[UploadFile]],
+        digests: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Upload files to Danswer and return the file descriptors to attach"""
+        if not files:
+            return []
+        try:
+            with span("upload"):
+                upload_response = await UploadService(self.client).forward_files(files, self.descriptor_cache, digests)
+        except DanswerAPIError as e:
+            upload_response = {"error": e.response_text}
+        except FileValidationError as e:
+            upload_response = {"error": e.message}
+        if "files" not in upload_response:
+            logger.error("Failed to upload files, unexpected response format")
+            raise ChatPipelineError("Failed to upload files", 500, upload_response.get("error", "Unknown error"))
+
+        file_descriptors = [
+            {"id": file_info["id"], "type": file_info["type"], "name": file_info["name"]}
+            for file_info in upload_response["files"]
+        ]
+        logger.debug("File descriptors for uploaded files: %s", Payload(file_descriptors))
+        return file_descriptors
+
+    async def resolve_prompts(self) -> Tuple[str, str]:
+        """
+        Expand the reviewer and action prompt names to their Danswer input prompt
+        content, once per pipeline so a review cache key and the messages sent
+        are built from the same text
+        """
+        if self._resolved_prompts is None:
+            self._resolved_prompts = await self._lookup_prompts()
+        return self._resolved_prompts
+
+    async def _lookup_prompts(self) -> Tuple[str, str]:
+        names = (self.protocol_reviewer_prompt, self.protocol_action_prompt)
+        if self.prompt_catalogue is None:
+            return names
+        try:
+            with span("resolve_prompts"):
+                contents = await self.prompt_catalogue.get_many(names)
+        except DanswerAPIError as e:
+            logger.warning("Input prompts unavailable, sending the prompt names: %s", Payload(e.response_text))
+            return names
+        # A name Danswer doesn't know is sent as-is
+        return tuple(contents[name] if contents[name] is not None else name for name in names)
+
+    async def _stream_turn(
+        self,
+        payload: Dict[str, Any],
+        parser: DanswerStreamParser,
+        turn: int,
+        emit_tokens: bool,
+        send_error: str,
+    ) -> AsyncIterator[PipelineEvent]:
+        try:
+            with span(f"turn_{turn}"):
+                started = time.perf_counter()
+                async with self.client.send_message(payload) as response:
+                    chunks = metered_stream(response.content.iter_any(), "send_message", started)
+                    async for event in parser.events(chunks):
+                        if isinstance(event, StreamError):
+                            logger.error("%s, Danswer streamed an error: %s", send_error, Payload(event.message))
+                            raise ChatPipelineError(send_error, 502, event.message)
+                        if emit_tokens and isinstance(event, TokenDelta):
+                            yield PipelineEvent("token", {"turn": turn, "text": event.text})
+        except DanswerAPIError as e:
+            logger.error("%s: %s", send_error, Payload(e.response_text))
+            raise ChatPipelineError(send_error, e.status_code, e.response_text)
+        last_message = parser.last_message
+        if last_message is not None and not isinstance(last_message.get("message"), str):
+            logger.error("%s, final packet has no message: %s", send_error, Payload(last_message))
+            raise ChatPipelineError(send_error, 502, "Danswer response has no message")
+
+    async def stream(
+        self,
+        user_request: str,
+        file_descriptors: List[Dict[str, Any]],
+        emit_tokens: bool = True,
+    ) -> AsyncIterator[PipelineEvent]:
+        """Run both chat turns, yielding stage markers, token deltas and the final result"""
+        # Step 2: Create chat session
+        try:
+            with span("create_session"):
+                if self.session_pool is not None:
+                    chat_session_id = await self.session_pool.acquire()
+                else:
+                    chat_session_id = await self.client.create_chat_session()
+        except DanswerAPIError as e:
+            logger.error("Failed to create chat session")
+            raise ChatPipelineError("Failed to create chat session", e.status_code, e.response_text)
+        yield PipelineEvent("stage", {"stage": "session_created", "chat_session_id": chat_session_id})
+
+        # Step 3: Prepare and send initial message
+        reviewer_prompt, action_prompt = await self.resolve_prompts()
+        message = reviewer_prompt + user_request
+        logger.info("Initial message to send: %s", Payload(message))
+        base_payload = get_base_payload(chat_session_id)
+        payload = base_payload.copy()
+        payload.update({
+            "parent_message_id": None,
+            "message": message,
+            "file_descriptors": file_descriptors  # Attach file descriptors here
+        })
+
+        parser = DanswerStreamParser()
+        async for event in self._stream_turn(payload, parser, 1, emit_tokens, "Failed to send message"):
+            yield event
+        last_message_data = parser.last_message
+        if not last_message_data:
+            logger.error("Failed to process initial response in streaming")
+            raise ChatPipelineError("Failed to process initial response")
+        logger.info("Last message data no.1: %s", Payload(last_message_data))
+        protocol_summary = extract_json_from_message(last_message_data.get('message'))
+        logger.info("Extracted protocol summary: %s", Payload(protocol_summary))
+
+        parent_message_id = last_message_data.get('parent_message')
+        reserved_assistant_message_id = parent_message_id + 1 if parent_message_id is not None else None
+        logger.info("Reserved assistant message ID: %s", reserved_assistant_message_id)
+
+        if reserved_assistant_message_id is None:
+            logger.error("Failed to calculate reserved_assistant_message_id")
+            raise ChatPipelineError("Failed to calculate reserved_assistant_message_id")
+        yield PipelineEvent("stage", {"stage": "turn_1_done"})
+
+        message2 = action_prompt
+        logger.info("Second message to send: %s", Payload(message2))
+
+        payload2 = base_payload.copy()
+        payload2.update({
+            "parent_message_id": reserved_assistant_message_id,
+            "message": message2,
+            "file_descriptors": []
+        })
+
+        parser = DanswerStreamParser()
+        async for event in self._stream_turn(payload2, parser, 2, emit_tokens, "Failed to send second message"):
+            yield event
+        last_message_data2 = parser.last_message
+        if not last_message_data2:
+            logger.error("Failed to process second response in streaming")
+            raise ChatPipelineError("Failed to process second response")
+        logger.info("Last message data no.2: %s", Payload(last_message_data2))
+
+        final_protocol_summary = extract_json_from_message(last_message_data2.get('message'))
+        logger.info("Final protocol summary: %s", Payload(final_protocol_summary))
+
+        if not final_protocol_summary:
+            logger.error("Failed to extract final protocol summary from response")
+            raise ChatPipelineError("Failed to extract final protocol summary from response")
+
+        yield PipelineEvent("result", final_protocol_summary)
+
+    async def run(
+        self,
+        user_request: str,
+        files: Optional[List[UploadFile]] = None,
+        digests: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Run the whole pipeline and return the final protocol summary"""
+        file_descriptors = await self.upload_files(files, digests)
+        return await self.review(user_request, file_descriptors)
+
+    async def review(self, user_request: str, file_descriptors: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Run both chat turns on already uploaded files and return the final protocol summary"""
+        async for event in self.stream(user_request, file_descriptors, emit_tokens=False):
+            if event.event == "result":
+                return event.data
+        raise ChatPipelineError("Failed to extract final protocol summary from response")
+
+    async def run_cached(
+        self,
+        user_request: str,
+        files: Optional[List[UploadFile]],
+        review_cache: ReviewCache,
+        cache_mode: str = ReviewCache.USE
+    ) -> Tuple[Dict[str, Any], str]:
+        """Run through the review cache; returns the summary and the cache status"""
+        # Editing a prompt in Danswer changes the key, so old reviews stop being served
+        prompts = await self.resolve_prompts()
+        # A run can outlive this request and serve coalesced ones, so it gets
+        # its own copies of the files rather than the request's UploadFiles
+        try:
+            with span("hash_files"):
+                copies, digests = await asyncio.to_thread(self._copy_files, files or [])
+        except FileValidationError as e:
+            raise ChatPipelineError("Failed to upload files", 500, e.message)
+        key = ReviewCache.make_key(user_request, digests, self.config.version, prompts)
+
+        handed_off = False
+
+        def run() -> Awaitable[Dict[str, Any]]:
+            nonlocal handed_off
+            handed_off = True
+            return self._run_and_close(user_request, copies, digests)
+
+        try:
+            return await review_cache.get_or_run(key, run, cache_mode)
+        finally:
+            if not handed_off:
+                self._close_files(copies)
+
+    @staticmethod
+    def _copy_files(files: List[UploadFile]) -> Tuple[List[UploadFile], List[str]]:
+        copies, digests = [], []
+        try:
+            for file in files:
+                copy, digest = FileService.copy_and_hash(file)
+                copies.append(copy)
+                digests.append(digest)
+        except BaseException:
+            ProtocolReviewPipeline._close_files(copies)
+            raise
+        return copies, digests
+
+    @staticmethod
+    def _close_files(files: List[UploadFile]) -> None:
+        for file in files:
+            file.file.close()
+
+    async def _run_and_close(self, user_request: str, files: List[UploadFile], digests: List[str]) -> Dict[str, Any]:
+        try:
+            return await self.run(user_request, files or None, digests)
+        finally:
+            self._close_files(files)
@@ -0,0 +1,123 @@
+# services/config_registry.py
+import asyncio
+import hashlib
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+
+import yaml
+from fastapi import Request
+from pydantic import ValidationError
+
+from models.config import ConfigSnapshot, DanswerEndpoints
+from utils.initialize import load_api_endpoints, load_prompt_sequence
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigRegistry:
+    """Parses the YAML/JSON config once and swaps in a new snapshot when the files change"""
+
+    POLL_INTERVAL = 2.0
+
+    def __init__(
+        self,
+        prompt_sequence_path: str = "config/prompt_sequence.yaml",
+        endpoints_path: str = "config/danswer_endpoints.yaml",
+        poll_interval: float = POLL_INTERVAL,
+    ):
+        self.prompt_sequence_path = prompt_sequence_path
+        self.endpoints_path = endpoints_path
+        self.poll_interval = poll_interval
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._mtimes: Dict[str, int] = {}
+        self._listeners: List[Callable[[ConfigSnapshot], None]] = []
+        self._watch_task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        if self._snapshot is None:
+            self.load()
+        return self._snapshot
+
+    def add_listener(self, listener: Callable[[ConfigSnapshot], None]) -> None:
+        """Call `listener` with every new snapshot, starting with the current one"""
+        self._listeners.append(listener)
+        if self._snapshot is not None:
+            listener(self._snapshot)
+
+    def _current_mtimes(self) -> Dict[str, int]:
+        return {path: os.stat(path).st_mtime_ns for path in (self.prompt_sequence_path, self.endpoints_path)}
+
+    def load(self) -> ConfigSnapshot:
+        """Parse and validate the config files, then publish the result as the current snapshot"""
+        mtimes = self._current_mtimes()
+        digest = hashlib.sha256()
+        for path in (self.prompt_sequence_path, self.endpoints_path):
+            with open(path, "rb") as file:
+                digest.update(file.read())
+
+        # An empty or half-written file parses as None rather than failing
+        endpoints = load_api_endpoints(self.endpoints_path)
+        if not isinstance(endpoints, dict):
+            raise ValueError(f"{self.endpoints_path} must contain a mapping of endpoint names to paths")
+        snapshot = ConfigSnapshot(
+            endpoints=DanswerEndpoints(**endpoints),
+            prompt_sequence=load_prompt_sequence(self.prompt_sequence_path),
+            version=digest.hexdigest()[:12],
+        )
+        # A single reference assignment, so readers see either the old or the new snapshot
+        self._snapshot = snapshot
+        self._mtimes = mtimes
+        for listener in self._listeners:
+            listener(snapshot)
+        logger.info("Loaded config version %s", snapshot.version)
+        return snapshot
+
+    def reload_if_changed(self) -> bool:
+        """Reload when a file's mtime moved; an invalid edit keeps the previous snapshot"""
+        try:
+            mtimes = self._current_mtimes()
+        except OSError as e:
+            logger.error("Config files unavailable, keeping version %s: %s", self._snapshot.version, e)
+            return False
+        if mtimes == self._mtimes:
+            return False
+        try:
+            self.load()
+            return True
+        except (OSError, ValueError, AttributeError, ValidationError, yaml.YAMLError) as e:
+            # Don't retry until the files change again
+            self._mtimes = mtimes
+            logger.error("Config reload failed, keeping version %s: %s", self._snapshot.version, e)
+            return False
+
+    async def start(self) -> None:
+        """Load the config and start watching the files for changes"""
+        if self._snapshot is None:
+            self.load()
+        if self._watch_task is None and self.poll_interval > 0:
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def close(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                self.reload_if_changed()
+            except Exception:
+                # Keep watching; the next edit may well fix it
+                logger.exception("Config reload crashed, keeping version %s", self._snapshot.version)
+
+
+def get_config(request: Request) -> ConfigSnapshot:
+    """FastAPI dependency returning the current config snapshot"""
+    return request.app.state.config_registry.snapshot
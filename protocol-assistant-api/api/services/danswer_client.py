@@ -0,0 +1,198 @@
+# services/danswer_client.py
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiohttp
+from fastapi import Request
+
+from exceptions.danswer_exceptions import DanswerAPIError
+from logging_config import Payload
+from services.metrics import UPSTREAM_BYTES, UPSTREAM_DURATION, UPSTREAM_ERRORS, UPSTREAM_TTFB
+
+logger = logging.getLogger(__name__)
+
+
+class DanswerClient:
+    """Async client for the Danswer API sharing one pooled HTTP session per process"""
+
+    POOL_SIZE = 100
+    POOL_SIZE_PER_HOST = 50
+    KEEPALIVE_TIMEOUT = 30.0
+    CONNECT_TIMEOUT = 10.0
+    REQUEST_TIMEOUT = 30.0
+    STREAM_TIMEOUT = 300.0
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        endpoints: Dict[str, str],
+        pool_size: int = POOL_SIZE,
+        pool_size_per_host: int = POOL_SIZE_PER_HOST,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+        request_timeout: float = REQUEST_TIMEOUT,
+        stream_timeout: float = STREAM_TIMEOUT,
+    ):
+        self.base_url = base_url
+        # aiohttp sets the body Content-Type per request (JSON or multipart)
+        self.headers = {k: v for k, v in headers.items() if k.lower() != "content-type"}
+        self.endpoints = endpoints
+        self.pool_size = pool_size
+        self.pool_size_per_host = pool_size_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = aiohttp.ClientTimeout(
+            total=request_timeout, connect=self.CONNECT_TIMEOUT
+        )
+        # Streamed LLM turns have no overall deadline, only a gap between reads
+        self.stream_timeout = aiohttp.ClientTimeout(
+            total=None, connect=self.CONNECT_TIMEOUT, sock_read=stream_timeout
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> None:
+        """Open the shared session; call once from the application lifespan"""
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.pool_size_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.headers,
+            timeout=self.request_timeout,
+        )
+        logger.info("Danswer client started with pool size %d", self.pool_size)
+
+    async def close(self) -> None:
+        """Close the shared session and release pooled connections"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            logger.info("Danswer client closed")
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            raise RuntimeError("DanswerClient.start() must be called before use")
+        return self._session
+
+    def set_endpoints(self, endpoints: Dict[str, str]) -> None:
+        """Swap in a new endpoint map, e.g. after a config reload"""
+        self.endpoints = endpoints
+
+    def _url(self, endpoint_name: str) -> str:
+        return f"{self.base_url}{self.endpoints[endpoint_name]}"
+
+    @staticmethod
+    async def _read_metered(response: aiohttp.ClientResponse, endpoint_name: str, started: float) -> bytes:
+        """Read a whole response body, recording time to headers, size and duration"""
+        UPSTREAM_TTFB.observe(time.perf_counter() - started, endpoint=endpoint_name)
+        body = await response.read()
+        UPSTREAM_BYTES.inc(len(body), endpoint=endpoint_name)
+        UPSTREAM_DURATION.observe(time.perf_counter() - started, endpoint=endpoint_name)
+        return body
+
+    async def _request_json(self, method: str, endpoint_name: str, error_message: str, **kwargs) -> Any:
+        url = self._url(endpoint_name)
+        started = time.perf_counter()
+        try:
+            async with self.session.request(method, url, **kwargs) as response:
+                logger.debug("%s %s response status: %d", method, url, response.status)
+                await self._read_metered(response, endpoint_name, started)
+                if response.status != 200:
+                    text = await response.text()
+                    logger.error("%s: %s", error_message, Payload(text))
+                    UPSTREAM_ERRORS.inc(endpoint=endpoint_name, status=str(response.status))
+                    raise DanswerAPIError(error_message, response.status, text)
+                return await response.json()
+        except aiohttp.ClientError as e:
+            logger.error("%s: %s", error_message, e)
+            UPSTREAM_ERRORS.inc(endpoint=endpoint_name, status="502")
+            raise DanswerAPIError(error_message, 502, str(e)) from e
+        except asyncio.TimeoutError:
+            logger.error("%s: request timed out", error_message)
+            UPSTREAM_ERRORS.inc(endpoint=endpoint_name, status="504")
+            raise DanswerAPIError(error_message, 504, "Upstream request timed out")
+
+    async def create_chat_session(self, persona_id: int = 0, description: str = "New chat session") -> str:
+        """Create a chat session and return its ID"""
+        logger.info("Creating chat session...")
+        payload = {"persona_id": persona_id, "description": description}
+        data = await self._request_json(
+            "POST", "create_chat_session", "Error creating chat session", json=payload
+        )
+        chat_session_id = data.get("chat_session_id")
+        if not chat_session_id:
+            raise DanswerAPIError("Error creating chat session", 502, str(data))
+        logger.info("Chat session ID: %s", chat_session_id)
+        return chat_session_id
+
+    async def list_input_prompts(self, etag: Optional[str] = None) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """
+        Fetch the input prompts configured in Danswer along with the response ETag.
+        Returns (None, etag) when `etag` is given and the list has not changed.
+        """
+        headers = {"If-None-Match": etag} if etag else None
+        error_message = "Error retrieving prompts"
+        started = time.perf_counter()
+        try:
+            async with self.session.get(self._url("input_prompt"), headers=headers) as response:
+                logger.debug("Get input prompt response status: %d", response.status)
+                await self._read_metered(response, "input_prompt", started)
+                if response.status == 304:
+                    return None, etag
+                if response.status != 200:
+                    text = await response.text()
+                    logger.error("%s: %s", error_message, Payload(text))
+                    UPSTREAM_ERRORS.inc(endpoint="input_prompt", status=str(response.status))
+                    raise DanswerAPIError(error_message, response.status, text)
+                return await response.json(), response.headers.get("ETag")
+        except aiohttp.ClientError as e:
+            logger.error("%s: %s", error_message, e)
+            UPSTREAM_ERRORS.inc(endpoint="input_prompt", status="502")
+            raise DanswerAPIError(error_message, 502, str(e)) from e
+        except asyncio.TimeoutError:
+            logger.error("%s: request timed out", error_message)
+            UPSTREAM_ERRORS.inc(endpoint="input_prompt", status="504")
+            raise DanswerAPIError(error_message, 504, "Upstream request timed out")
+
+    async def upload_files(self, form_data: aiohttp.FormData) -> Dict[str, Any]:
+        """Upload multipart form data to the Danswer file endpoint"""
+        return await self._request_json(
+            "POST", "upload_file", "Failed to upload files", data=form_data
+        )
+
+    @asynccontextmanager
+    async def send_message(self, payload: Dict[str, Any]) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Send a chat message and yield the open streaming response. Readers
+        wrap the body in services.metrics.metered_stream to record its TTFB and size.
+        """
+        logger.info("Sending chat message...")
+        url = self._url("send_message")
+        try:
+            async with self.session.post(url, json=payload, timeout=self.stream_timeout) as response:
+                logger.debug("Send message response status: %d", response.status)
+                if response.status != 200:
+                    text = await response.text()
+                    UPSTREAM_ERRORS.inc(endpoint="send_message", status=str(response.status))
+                    raise DanswerAPIError("Failed to send message", response.status, text)
+                yield response
+        except aiohttp.ClientError as e:
+            logger.error("Error sending message: %s", e)
+            UPSTREAM_ERRORS.inc(endpoint="send_message", status="502")
+            raise DanswerAPIError("Failed to send message", 502, str(e))
+        except asyncio.TimeoutError:
+            logger.error("Error sending message: stream timed out")
+            UPSTREAM_ERRORS.inc(endpoint="send_message", status="504")
+            raise DanswerAPIError("Failed to send message", 504, "Upstream stream timed out")
+
+
+def get_danswer_client(request: Request) -> DanswerClient:
+    """FastAPI dependency returning the client created in the app lifespan"""
+    return request.app.state.danswer_client
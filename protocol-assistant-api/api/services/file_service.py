@@ -1,7 +1,8 @@
 # services/file_service.py
+import hashlib
 import logging
-import io
-from typing import List, Tuple, BinaryIO
+import tempfile
+from typing import AsyncIterator, Optional, Tuple
 from fastapi import UploadFile
 from exceptions.upload_exceptions import FileValidationError
 
@@ -15,10 +16,51 @@ class FileService:
         'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
     }
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+    CHUNK_SIZE = 64 * 1024  # 64KB
+
+    # Leading bytes of each binary format we accept
+    MAGIC_NUMBERS = {
+        b'%PDF-': 'application/pdf',
+        b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1': 'application/msword',  # OLE2 compound file
+        b'PK\x03\x04': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',  # ZIP container
+    }
+    # UTF-16 text is full of NUL bytes, so it is recognised by its byte order mark
+    TEXT_BOMS = (b'\xff\xfe', b'\xfe\xff')
+    # Control bytes that plain text has next to none of, whatever its encoding
+    BINARY_BYTES = bytes(set(range(0x20)) - {0x08, 0x09, 0x0a, 0x0c, 0x0d, 0x1b}) + b'\x7f'
+    MAX_BINARY_RATIO = 0.05
+    # Copies larger than this are spooled to disk
+    SPOOL_MAX_MEMORY = 1024 * 1024
+
+    @staticmethod
+    def sniff_content_type(head: bytes) -> Optional[str]:
+        """Guess the content type from the first bytes of a file"""
+        for magic, mime_type in FileService.MAGIC_NUMBERS.items():
+            if head.startswith(magic):
+                return mime_type
+        if head.startswith(FileService.TEXT_BOMS):
+            return 'text/plain'
+        if b'\x00' in head:
+            return None
+        # Any single-byte or UTF-8 text passes, e.g. Latin-1 "µL"
+        binary_bytes = len(head) - len(head.translate(None, FileService.BINARY_BYTES))
+        if head and binary_bytes / len(head) > FileService.MAX_BINARY_RATIO:
+            return None
+        return 'text/plain'
+
+    @staticmethod
+    def validate_size(file: UploadFile) -> None:
+        """Reject files whose spooled size is already known to exceed MAX_FILE_SIZE"""
+        # The multipart parser records the size while spooling the upload
+        if file.size is not None and file.size > FileService.MAX_FILE_SIZE:
+            raise FileValidationError(
+                "File too large",
+                {"max_size": FileService.MAX_FILE_SIZE, "received_size": file.size}
+            )
 
     @staticmethod
     async def validate_file(file: UploadFile) -> None:
-        """Validate a single file's size and type"""
+        """Validate a single file's size and type without reading the whole body"""
         if not file.filename:
             raise FileValidationError("File must have a name")
 
@@ -28,25 +70,68 @@ class FileService:
                 {"allowed_types": list(FileService.ALLOWED_MIME_TYPES)}
             )
 
-        # Read file content for size validation
-        content = await file.read()
-        if len(content) > FileService.MAX_FILE_SIZE:
+        FileService.validate_size(file)
+
+        # Only the first chunk is read to check the content matches the declared type
+        await file.seek(0)
+        head = await file.read(FileService.CHUNK_SIZE)
+        await file.seek(0)
+        sniffed_type = FileService.sniff_content_type(head)
+        if sniffed_type != file.content_type:
             raise FileValidationError(
-                "File too large",
-                {"max_size": FileService.MAX_FILE_SIZE, "received_size": len(content)}
+                f"File content does not match declared type: {file.content_type}",
+                {"declared_type": file.content_type, "detected_type": sniffed_type}
             )
-        
-        # Reset file pointer
+
+    @staticmethod
+    async def iter_chunks(file: UploadFile) -> AsyncIterator[bytes]:
+        """Yield the file body in chunks, enforcing MAX_FILE_SIZE as it is read"""
         await file.seek(0)
+        received_size = 0
+        while True:
+            chunk = await file.read(FileService.CHUNK_SIZE)
+            if not chunk:
+                break
+            received_size += len(chunk)
+            if received_size > FileService.MAX_FILE_SIZE:
+                raise FileValidationError(
+                    "File too large",
+                    {"max_size": FileService.MAX_FILE_SIZE, "received_size": received_size}
+                )
+            yield chunk
 
     @staticmethod
-    async def prepare_file(file: UploadFile) -> Tuple[str, str, BinaryIO, str]:
-        """Prepare a single file for upload"""
-        content = await file.read()
+    async def hash_file(file: UploadFile) -> str:
+        """Return the SHA-256 of the file body, read in chunks"""
+        digest = hashlib.sha256()
+        async for chunk in FileService.iter_chunks(file):
+            digest.update(chunk)
         await file.seek(0)
-        return (
-            'file',
-            file.filename,
-            io.BytesIO(content),
-            file.content_type
-        )
\ No newline at end of file
+        return digest.hexdigest()
+
+    @staticmethod
+    def copy_and_hash(file: UploadFile) -> Tuple[UploadFile, str]:
+        """
+        Copy the body into a temporary file owned by the caller and return the
+        copy with the body's SHA-256. Blocking; run it in a thread.
+        """
+        digest = hashlib.sha256()
+        copy = tempfile.SpooledTemporaryFile(max_size=FileService.SPOOL_MAX_MEMORY)
+        try:
+            file.file.seek(0)
+            received_size = 0
+            while chunk := file.file.read(FileService.CHUNK_SIZE):
+                received_size += len(chunk)
+                if received_size > FileService.MAX_FILE_SIZE:
+                    raise FileValidationError(
+                        "File too large",
+                        {"max_size": FileService.MAX_FILE_SIZE, "received_size": received_size}
+                    )
+                digest.update(chunk)
+                copy.write(chunk)
+            file.file.seek(0)
+            copy.seek(0)
+        except BaseException:
+            copy.close()
+            raise
+        return UploadFile(copy, size=received_size, filename=file.filename, headers=file.headers), digest.hexdigest()
@@ -0,0 +1,219 @@
+# services/job_runner.py
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import Request, UploadFile
+from starlette.datastructures import Headers
+
+from exceptions.chat_exceptions import ChatPipelineError
+from exceptions.job_exceptions import JobQueueFullError
+from services.chat_service import ProtocolReviewPipeline
+from services.file_service import FileService
+from services.job_store import FAILED, FINISHED, QUEUED, RUNNING, SUCCEEDED, JobStore
+from services.metrics import span
+
+logger = logging.getLogger(__name__)
+
+
+class JobRunner:
+    """
+    Runs protocol reviews in the background on a bounded pool of asyncio
+    workers. Uploaded files are spooled to disk and jobs are recorded in a
+    JobStore, so jobs queued or running at shutdown are picked up again on
+    the next start. One process owns a store and spool directory.
+    """
+
+    CONCURRENCY = 4
+    QUEUE_DEPTH = 100
+    TTL = 86400.0
+    POLL_INTERVAL = 1.0
+    PURGE_INTERVAL = 3600.0
+
+    def __init__(
+        self,
+        store: JobStore,
+        pipeline_factory: Callable[[], ProtocolReviewPipeline],
+        spool_dir: str,
+        concurrency: int = CONCURRENCY,
+        queue_depth: int = QUEUE_DEPTH,
+        ttl: float = TTL,
+    ):
+        self.store = store
+        self.pipeline_factory = pipeline_factory
+        self.spool_dir = spool_dir
+        self.concurrency = concurrency
+        self.ttl = ttl
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_depth)
+        self._workers: List[asyncio.Task] = []
+        self._recovery_task: Optional[asyncio.Task] = None
+        # Set when a job finishes, for long-polling clients of this process
+        self._done_events: Dict[str, asyncio.Event] = {}
+        self._last_purge = 0.0
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def start(self) -> None:
+        """Purge expired jobs, re-queue unfinished ones and start the workers"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        await self._purge_expired()
+        unfinished = await self.store.unfinished()
+        if unfinished:
+            logger.info("Resuming %d unfinished jobs", len(unfinished))
+            for job in unfinished:
+                self._done_events[job["job_id"]] = asyncio.Event()
+            # More jobs than the queue holds are fed in as workers free up
+            self._recovery_task = asyncio.create_task(self._requeue([job["job_id"] for job in unfinished]))
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def close(self) -> None:
+        """Stop the workers; interrupted jobs stay queued or running and resume on the next start"""
+        tasks = self._workers + ([self._recovery_task] if self._recovery_task is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._recovery_task = None
+
+    async def _purge_expired(self) -> None:
+        self._last_purge = time.monotonic()
+        purged = await self.store.purge(time.time() - self.ttl)
+        if purged:
+            logger.info("Purged %d expired jobs", purged)
+
+    async def _requeue(self, job_ids: List[str]) -> None:
+        for job_id in job_ids:
+            await self._queue.put(job_id)
+
+    def _spool(self, job_dir: str, files: List[UploadFile]) -> List[Dict[str, Any]]:
+        os.makedirs(job_dir, exist_ok=True)
+        spooled = []
+        for index, file in enumerate(files):
+            path = os.path.join(job_dir, str(index))
+            file.file.seek(0)
+            with open(path, "wb") as out:
+                shutil.copyfileobj(file.file, out, FileService.CHUNK_SIZE)
+            spooled.append({
+                "path": path,
+                "filename": file.filename,
+                "content_type": file.content_type,
+                "size": os.path.getsize(path),
+            })
+        return spooled
+
+    async def submit(self, owner: str, user_request: str, files: Optional[List[UploadFile]]) -> Dict[str, Any]:
+        """Spool the files, record the job and queue it; raises JobQueueFullError when at capacity"""
+        if self._queue.full():
+            self.rejected += 1
+            raise JobQueueFullError(self._queue.maxsize)
+        for file in files or []:
+            FileService.validate_size(file)
+
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.spool_dir, job_id)
+        with span("spool_files"):
+            spooled = await asyncio.to_thread(self._spool, job_dir, files or [])
+        await self.store.create(job_id, owner, user_request, spooled)
+        self._done_events[job_id] = asyncio.Event()
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            # Filled up while the files were being spooled
+            self.rejected += 1
+            await self._finish(job_id, FAILED, error={"detail": "Job queue is full"})
+            raise JobQueueFullError(self._queue.maxsize)
+        return await self.store.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Return the job once it has finished or `timeout` seconds have passed"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.store.get(job_id)
+            remaining = deadline - time.monotonic()
+            if job is None or job["status"] in FINISHED or remaining <= 0:
+                return job
+            event = self._done_events.get(job_id)
+            try:
+                if event is not None:
+                    await asyncio.wait_for(event.wait(), remaining)
+                else:
+                    # Not running in this process; fall back to polling the store
+                    await asyncio.sleep(min(self.POLL_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[Dict[str, Any]] = None) -> None:
+        await self.store.update(job_id, status, result=result, error=error)
+        await asyncio.to_thread(shutil.rmtree, os.path.join(self.spool_dir, job_id), True)
+        event = self._done_events.pop(job_id, None)
+        if event is not None:
+            event.set()
+        if time.monotonic() - self._last_purge > self.PURGE_INTERVAL:
+            await self._purge_expired()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = await self.store.get(job_id)
+        if job is None or job["status"] not in (QUEUED, RUNNING):
+            return
+        self.running += 1
+        files: List[UploadFile] = []
+        try:
+            await self.store.update(job_id, RUNNING)
+            # Open one at a time so only the files actually opened are closed below
+            for info in job["files"]:
+                files.append(UploadFile(
+                    open(info["path"], "rb"),
+                    size=info["size"],
+                    filename=info["filename"],
+                    headers=Headers({"content-type": info["content_type"] or "application/octet-stream"}),
+                ))
+            result = await self.pipeline_factory().run(job["user_request"], files or None)
+        except ChatPipelineError as e:
+            self.failed += 1
+            await self._finish(job_id, FAILED, error={"status_code": e.status_code, **e.to_content()})
+        except Exception:
+            logger.exception("Job %s failed", job_id)
+            self.failed += 1
+            await self._finish(job_id, FAILED, error={"status_code": 500, "detail": "Internal server error"})
+        else:
+            self.succeeded += 1
+            await self._finish(job_id, SUCCEEDED, result=result)
+        finally:
+            self.running -= 1
+            for file in files:
+                file.file.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "running": self.running,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+def get_job_runner(request: Request) -> Optional[JobRunner]:
+    """FastAPI dependency returning the background job runner, or None when jobs are disabled"""
+    return getattr(request.app.state, "job_runner", None)
@@ -0,0 +1,120 @@
+# services/job_store.py
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+
+class JobStore:
+    """SQLite-backed record of review jobs, so queued and finished jobs survive a restart"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                status TEXT NOT NULL,
+                user_request TEXT NOT NULL,
+                files TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs (updated_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _row_to_job(row) -> Dict[str, Any]:
+        job_id, owner, status, user_request, files, result, error, created_at, updated_at = row
+        return {
+            "job_id": job_id,
+            "owner": owner,
+            "status": status,
+            "user_request": user_request,
+            "files": json.loads(files),
+            "result": json.loads(result) if result is not None else None,
+            "error": json.loads(error) if error is not None else None,
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def _create(self, job_id: str, owner: str, user_request: str, files: List[Dict[str, Any]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, owner, status, user_request, files, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, owner, QUEUED, user_request, json.dumps(files), now, now),
+            )
+            self._conn.commit()
+
+    def _update(self, job_id: str, status: str, result: Any = None, error: Optional[Dict[str, Any]] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    json.dumps(error) if error is not None else None,
+                    time.time(),
+                    job_id,
+                ),
+            )
+            self._conn.commit()
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def _unfinished(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def _purge(self, older_than: float) -> int:
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (*FINISHED, older_than)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    async def create(self, job_id: str, owner: str, user_request: str, files: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self._create, job_id, owner, user_request, files)
+
+    async def update(self, job_id: str, status: str, result: Any = None, error: Optional[Dict[str, Any]] = None) -> None:
+        await asyncio.to_thread(self._update, job_id, status, result, error)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def unfinished(self) -> List[Dict[str, Any]]:
+        """Jobs that were queued or running, oldest first"""
+        return await asyncio.to_thread(self._unfinished)
+
+    async def purge(self, older_than: float) -> int:
+        """Delete finished jobs last updated before `older_than` (epoch seconds)"""
+        return await asyncio.to_thread(self._purge, older_than)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
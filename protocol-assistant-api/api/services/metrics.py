@@ -0,0 +1,204 @@
+# services/metrics.py
+import bisect
+import time
+from contextvars import ContextVar
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds; LLM turns run far longer than the usual web-latency buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Fixed-bucket histogram per label set; observe() is one bisect and two additions"""
+
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label set -> [count per bucket (+Inf last), sum]
+        self._series: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = series
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {total[0]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(labels)} {value}" for labels, value in self._values.items())
+        return lines
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text format. Every worker
+    process keeps its own registry, like the caches whose stats it exports.
+    """
+
+    PREFIX = "protocol_assistant"
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(f"{self.PREFIX}_{name}", help_text, buckets))
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._metrics.setdefault(name, Counter(f"{self.PREFIX}_{name}", help_text))
+
+    def register_collector(self, component: str, stats: Callable[[], Dict[str, float]]) -> None:
+        """Export a component's stats() dict as gauges when /metrics is scraped"""
+        self._collectors[component] = stats
+
+    def unregister_collector(self, component: str) -> None:
+        self._collectors.pop(component, None)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for component, stats in self._collectors.items():
+            for stat, value in stats().items():
+                name = f"{self.PREFIX}_{component}_{stat}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUEST_DURATION = metrics.histogram("http_request_duration_seconds", "Request latency by handler and status")
+STAGE_DURATION = metrics.histogram("stage_duration_seconds", "Latency of each request stage")
+UPSTREAM_TTFB = metrics.histogram("upstream_ttfb_seconds", "Time from sending a Danswer request to its first body byte")
+UPSTREAM_DURATION = metrics.histogram("upstream_duration_seconds", "Duration of Danswer requests including the body")
+UPSTREAM_BYTES = metrics.counter("upstream_response_bytes_total", "Response body bytes received from Danswer")
+UPSTREAM_ERRORS = metrics.counter("upstream_errors_total", "Failed Danswer requests by status")
+
+
+class RequestTimings:
+    """Stage durations of the current request, for the Server-Timing header"""
+
+    __slots__ = ("stages",)
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+
+    def header_value(self, total: float) -> str:
+        entries = [f"{name};dur={duration * 1000:.1f}" for name, duration in self.stages]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+class span:
+    """Time a block as a request stage: `with span("upload"): ...`"""
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        duration = time.perf_counter() - self.started
+        STAGE_DURATION.observe(duration, stage=self.stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.stages.append((self.stage, duration))
+
+
+async def metered_stream(chunks: AsyncIterable[bytes], endpoint: str, started: float) -> AsyncIterator[bytes]:
+    """Pass a streamed Danswer body through, recording its TTFB, size and duration"""
+    received = 0
+    async for chunk in chunks:
+        if not received:
+            UPSTREAM_TTFB.observe(time.perf_counter() - started, endpoint=endpoint)
+        received += len(chunk)
+        yield chunk
+    UPSTREAM_BYTES.inc(received, endpoint=endpoint)
+    UPSTREAM_DURATION.observe(time.perf_counter() - started, endpoint=endpoint)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by handler and adding a
+    Server-Timing header with the stages completed before the response starts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header_value(time.perf_counter() - started).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            # The endpoint's name keeps the label bounded, unlike the raw path
+            route = scope.get("route")
+            REQUEST_DURATION.observe(
+                time.perf_counter() - started,
+                handler=getattr(route, "name", "unmatched"),
+                method=scope["method"],
+                status=str(status),
+            )
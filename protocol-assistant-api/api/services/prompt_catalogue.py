@@ -0,0 +1,92 @@
+# services/prompt_catalogue.py
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Request
+
+from exceptions.danswer_exceptions import DanswerAPIError
+from services.danswer_client import DanswerClient
+
+logger = logging.getLogger(__name__)
+
+
+class PromptCatalogue:
+    """Name-indexed cache of Danswer's input prompts, refreshed on a TTL with ETag revalidation"""
+
+    TTL = 300.0
+    RETRY_INTERVAL = 30.0
+
+    def __init__(self, client: DanswerClient, ttl: float = TTL):
+        self.client = client
+        self.ttl = ttl
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._etag: Optional[str] = None
+        self._fetched_at = 0.0
+        # After a failed refresh the stale index is served until then
+        self._retry_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.fetches = 0
+
+    def _is_fresh(self) -> bool:
+        now = time.monotonic()
+        return self._index is not None and (now - self._fetched_at < self.ttl or now < self._retry_at)
+
+    def invalidate(self) -> None:
+        """Force the next lookup to revalidate against Danswer"""
+        self._fetched_at = 0.0
+        self._retry_at = 0.0
+
+    async def _refresh(self) -> None:
+        self.fetches += 1
+        try:
+            prompts, etag = await self.client.list_input_prompts(etag=self._etag if self._index is not None else None)
+        except DanswerAPIError:
+            self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+            raise
+        if prompts is not None:
+            self._index = {prompt.get("prompt"): prompt for prompt in prompts if prompt.get("prompt")}
+            self._etag = etag
+            logger.info("Loaded %d input prompts", len(self._index))
+        self._fetched_at = time.monotonic()
+
+    async def _ensure_fresh(self) -> None:
+        if self._is_fresh():
+            return
+        # Single flight: concurrent callers share one upstream fetch
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh())
+            self._refresh_task.add_done_callback(self._clear_refresh_task)
+        try:
+            await asyncio.shield(self._refresh_task)
+        except DanswerAPIError:
+            if self._index is None:
+                raise
+            logger.warning("Failed to refresh input prompts, serving the cached catalogue")
+
+    def _clear_refresh_task(self, task: asyncio.Task) -> None:
+        self._refresh_task = None
+
+    async def get(self, prompt_name: str) -> Optional[str]:
+        """Return the content of one prompt, or None if Danswer has no prompt by that name"""
+        return (await self.get_many([prompt_name]))[prompt_name]
+
+    async def get_many(self, prompt_names: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Look up several prompts with at most one upstream fetch"""
+        await self._ensure_fresh()
+        contents = {}
+        for prompt_name in prompt_names:
+            prompt = self._index.get(prompt_name)
+            if prompt is None:
+                logger.warning("Prompt '%s' not found", prompt_name)
+            contents[prompt_name] = prompt.get("content", "") if prompt is not None else None
+        return contents
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._index or {}), "fetches": self.fetches}
+
+
+def get_prompt_catalogue(request: Request) -> Optional[PromptCatalogue]:
+    """FastAPI dependency returning the catalogue created in the app lifespan"""
+    return getattr(request.app.state, "prompt_catalogue", None)
@@ -0,0 +1,110 @@
+# services/review_cache.py
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+
+class ReviewCache:
+    """
+    TTL- and size-bounded cache of final protocol summaries, keyed on the
+    user request, the uploaded files' hashes, the prompt-sequence version and
+    the prompt text sent to Danswer.
+    Concurrent identical requests share one upstream run.
+    """
+
+    USE = "use"
+    BYPASS = "bypass"  # run upstream, leave the cache untouched
+    REFRESH = "refresh"  # run upstream and overwrite the cached result
+    MODES = (USE, BYPASS, REFRESH)
+
+    MAX_ENTRIES = 1000
+
+    def __init__(self, ttl: float, max_entries: int = MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(user_request: str, file_hashes: List[str], config_version: str, prompts: Sequence[str] = ()) -> str:
+        material = json.dumps([user_request, file_hashes, config_version, list(prompts)])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _store(self, key: str, result: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_run(
+        self,
+        key: str,
+        run: Callable[[], Awaitable[Dict[str, Any]]],
+        mode: str = USE,
+    ) -> Tuple[Dict[str, Any], str]:
+        """Return (result, status) where status is hit, coalesced, miss, bypass or refresh"""
+        if mode == self.BYPASS:
+            return await run(), self.BYPASS
+
+        if mode == self.USE:
+            result = self._lookup(key)
+            if result is not None:
+                self.hits += 1
+                return result, "hit"
+            task = self._inflight.get(key)
+            if task is not None:
+                self.coalesced += 1
+                return await asyncio.shield(task), "coalesced"
+
+        self.misses += 1
+        # run() is called here rather than in the task, so the caller knows
+        # synchronously whether the run took over anything it handed in
+        task = asyncio.create_task(self._run_and_store(key, run()))
+        self._inflight[key] = task
+        task.add_done_callback(functools.partial(self._clear_inflight, key))
+        return await asyncio.shield(task), "miss" if mode == self.USE else self.REFRESH
+
+    def _clear_inflight(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def _run_and_store(self, key: str, run: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+        result = await run
+        self._store(key, result)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+def get_review_cache(request: Request) -> Optional[ReviewCache]:
+    """FastAPI dependency returning the review result cache, or None when disabled"""
+    return getattr(request.app.state, "review_cache", None)
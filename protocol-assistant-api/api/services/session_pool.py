@@ -0,0 +1,125 @@
+# services/session_pool.py
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request
+
+from exceptions.danswer_exceptions import DanswerAPIError
+from logging_config import Payload
+from services.danswer_client import DanswerClient
+
+logger = logging.getLogger(__name__)
+
+
+class ChatSessionPool:
+    """
+    Keeps pre-created Danswer chat sessions ready per persona so a request
+    can skip the create-session round trip. Sessions older than `max_age`
+    are dropped unused and left to Danswer.
+    """
+
+    MAX_AGE = 600.0
+    REFILL_INTERVAL = 30.0
+    REFILL_RETRY_INTERVAL = 5.0
+
+    def __init__(
+        self,
+        client: DanswerClient,
+        size: int,
+        max_age: float = MAX_AGE,
+        persona_ids: Iterable[int] = (0,),
+    ):
+        self.client = client
+        self.size = size
+        self.max_age = max_age
+        self._sessions: Dict[int, Deque[Tuple[str, float]]] = {persona_id: deque() for persona_id in persona_ids}
+        self._refill_needed = asyncio.Event()
+        self._refill_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    async def start(self) -> None:
+        if self._refill_task is None:
+            self._refill_needed.set()
+            self._refill_task = asyncio.create_task(self._refill_loop())
+
+    async def close(self) -> None:
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+
+    def _drop_expired(self, persona_id: int) -> None:
+        sessions = self._sessions[persona_id]
+        cutoff = time.monotonic() - self.max_age
+        while sessions and sessions[0][1] < cutoff:
+            sessions.popleft()
+            self.expired += 1
+
+    async def acquire(self, persona_id: int = 0) -> str:
+        """Hand out a pooled session, creating one inline when the pool is empty"""
+        sessions = self._sessions.get(persona_id)
+        if sessions is not None:
+            self._drop_expired(persona_id)
+            self._refill_needed.set()
+            if sessions:
+                self.hits += 1
+                # Oldest first, so sessions are used before they expire
+                return sessions.popleft()[0]
+        self.misses += 1
+        return await self.client.create_chat_session(persona_id=persona_id)
+
+    async def _refill(self) -> None:
+        for persona_id, sessions in self._sessions.items():
+            self._drop_expired(persona_id)
+            missing = self.size - len(sessions)
+            if missing <= 0:
+                continue
+            created = await asyncio.gather(
+                *(self.client.create_chat_session(persona_id=persona_id) for _ in range(missing)),
+                return_exceptions=True,
+            )
+            errors = [result for result in created if isinstance(result, BaseException)]
+            sessions.extend(
+                (chat_session_id, time.monotonic()) for chat_session_id in created
+                if not isinstance(chat_session_id, BaseException)
+            )
+            if errors:
+                raise errors[0]
+
+    async def _refill_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._refill_needed.wait(), timeout=self.REFILL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._refill_needed.clear()
+            try:
+                await self._refill()
+            except DanswerAPIError as e:
+                logger.warning("Failed to refill chat session pool: %s", Payload(e.response_text))
+                await asyncio.sleep(self.REFILL_RETRY_INTERVAL)
+            except Exception:
+                # Anything else must not end the loop either, or every request falls back to inline sessions
+                logger.exception("Unexpected error refilling chat session pool")
+                await asyncio.sleep(self.REFILL_RETRY_INTERVAL)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "depth": sum(len(sessions) for sessions in self._sessions.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+        }
+
+
+def get_session_pool(request: Request) -> Optional[ChatSessionPool]:
+    """FastAPI dependency returning the session pool, or None when pooling is disabled"""
+    return getattr(request.app.state, "session_pool", None)
@@ -0,0 +1,203 @@
+# services/token_service.py
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Protocol, Tuple
+
+import aiohttp
+from google.auth import jwt
+
+logger = logging.getLogger(__name__)
+
+FIREBASE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+FIREBASE_ISSUER_PREFIX = "https://securetoken.google.com/"
+
+
+class KeySet(Protocol):
+    """Source of the X.509 certificates (keyed by `kid`) that sign ID tokens"""
+
+    async def get_certs(self) -> Dict[str, str]: ...
+
+    async def refresh(self, force: bool = False) -> None: ...
+
+    def seconds_until_refresh(self) -> float: ...
+
+
+class StaticKeySet:
+    """Fixed key set, used to verify tokens offline in tests and benchmarks"""
+
+    def __init__(self, certs: Dict[str, str]):
+        self.certs = certs
+
+    async def get_certs(self) -> Dict[str, str]:
+        return self.certs
+
+    async def refresh(self, force: bool = False) -> None:
+        pass
+
+    def seconds_until_refresh(self) -> float:
+        return float("inf")
+
+
+class GoogleKeySet:
+    """Google's published Firebase signing certificates, cached until their max-age runs out"""
+
+    FETCH_TIMEOUT = 10.0
+    REFRESH_MARGIN = 300.0  # refresh this many seconds before the certs expire
+    RETRY_INTERVAL = 30.0
+    FORCED_REFRESH_INTERVAL = 30.0  # at most one refetch this often for tokens with an unknown `kid`
+
+    def __init__(self, certs_url: str = FIREBASE_CERTS_URL):
+        self.certs_url = certs_url
+        self._certs: Dict[str, str] = {}
+        self._expires_at = 0.0
+        self._fetched_at = float("-inf")
+        self._forced_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def get_certs(self) -> Dict[str, str]:
+        if not self._certs or time.time() >= self._expires_at:
+            await self.refresh()
+        return self._certs
+
+    async def refresh(self, force: bool = False) -> None:
+        """
+        Fetch the certs unless they are still fresh. `force` refetches fresh
+        certs too, in case Google rotated its keys, but not more than once
+        per FORCED_REFRESH_INTERVAL.
+        """
+        requested_at = time.monotonic()
+        async with self._lock:
+            # Callers queued on the lock find the certs another caller just fetched
+            if force:
+                if self._fetched_at > requested_at or requested_at - self._forced_at < self.FORCED_REFRESH_INTERVAL:
+                    return
+                self._forced_at = requested_at
+            elif self._certs and self.seconds_until_refresh() > 0:
+                return
+            certs, max_age = await self._fetch()
+            self._certs = certs
+            self._expires_at = time.time() + max_age
+            self._fetched_at = time.monotonic()
+            logger.info("Refreshed %d Firebase signing certs, valid for %.0fs", len(certs), max_age)
+
+    async def _fetch(self) -> Tuple[Dict[str, str], float]:
+        timeout = aiohttp.ClientTimeout(total=self.FETCH_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(self.certs_url) as response:
+                response.raise_for_status()
+                certs = await response.json()
+                return certs, self._parse_max_age(response.headers.get("Cache-Control", ""))
+
+    def seconds_until_refresh(self) -> float:
+        if not self._certs:
+            return 0.0
+        return max(self._expires_at - time.time() - self.REFRESH_MARGIN, 0.0)
+
+    @staticmethod
+    def _parse_max_age(cache_control: str) -> float:
+        match = re.search(r"max-age=(\d+)", cache_control)
+        return float(match.group(1)) if match else 3600.0
+
+
+class TokenVerifier:
+    """Verifies Firebase ID tokens against a KeySet and caches the decoded claims until `exp`"""
+
+    MAX_ENTRIES = 10000
+
+    def __init__(self, key_set: KeySet, project_id: str, max_entries: int = MAX_ENTRIES):
+        self.key_set = key_set
+        self.project_id = project_id
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    async def start(self) -> None:
+        """Start refreshing the signing certs in the background"""
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.key_set.seconds_until_refresh())
+            try:
+                await self.key_set.refresh()
+            except Exception as e:
+                logger.warning("Failed to refresh Firebase signing certs: %s", e)
+                await asyncio.sleep(GoogleKeySet.RETRY_INTERVAL)
+
+    async def verify(self, id_token: str) -> Dict[str, Any]:
+        """Return the decoded claims for a valid token, raising ValueError otherwise"""
+        cache_key = hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+        now = time.time()
+        entry = self._cache.get(cache_key)
+        if entry is not None:
+            expires_at, claims = entry
+            if now < expires_at:
+                self._cache.move_to_end(cache_key)
+                self.hits += 1
+                return claims
+            del self._cache[cache_key]
+
+        self.misses += 1
+        try:
+            key_id = self._check_header(id_token)
+            certs = await self.key_set.get_certs()
+            if key_id not in certs:
+                # Google may have started signing with a key published after our last fetch
+                await self.key_set.refresh(force=True)
+                certs = await self.key_set.get_certs()
+                if key_id not in certs:
+                    raise ValueError("Firebase ID token has an unknown \"kid\" claim")
+            # RSA verification is CPU-bound, keep it off the event loop
+            claims = await asyncio.to_thread(self._decode, id_token, certs)
+        except Exception:
+            self.failures += 1
+            raise
+
+        self._cache[cache_key] = (float(claims["exp"]), claims)
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return claims
+
+    @staticmethod
+    def _check_header(id_token: str) -> Optional[str]:
+        """Return the signing key ID; same header checks firebase_admin.auth.verify_id_token applies"""
+        header = jwt.decode_header(id_token)
+        if header.get("alg") != "RS256":
+            raise ValueError(f'Firebase ID token has incorrect algorithm: "{header.get("alg")}"')
+        return header.get("kid")
+
+    def _decode(self, id_token: str, certs: Dict[str, str]) -> Dict[str, Any]:
+        """Verify the signature and the claims firebase_admin.auth.verify_id_token checks"""
+        claims = jwt.decode(id_token, certs=certs, audience=self.project_id)
+        if claims.get("iss") != FIREBASE_ISSUER_PREFIX + self.project_id:
+            raise ValueError(f'Firebase ID token has incorrect "iss" claim: "{claims.get("iss")}"')
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise ValueError('Firebase ID token has an invalid "sub" claim')
+        claims["uid"] = subject
+        return claims
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "entries": len(self._cache),
+        }
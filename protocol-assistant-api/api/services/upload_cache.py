@@ -0,0 +1,103 @@
+# services/upload_cache.py
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+
+logger = logging.getLogger(__name__)
+
+
+class FileDescriptorCache:
+    """
+    SQLite-backed LRU map from a file's SHA-256 to the Danswer file descriptor
+    it was uploaded as. Danswer doesn't tell us when it deletes a file, so an
+    entry is only trusted for `max_age` seconds after the upload; after that
+    the file is uploaded again and the entry replaced.
+    """
+
+    MAX_ENTRIES = 10000
+    MAX_AGE = 7 * 86400.0
+
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES, max_age: float = MAX_AGE):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_descriptors (
+                sha256 TEXT PRIMARY KEY,
+                file_id TEXT NOT NULL,
+                file_type TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                uploaded_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON file_descriptors (last_used)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id, file_type FROM file_descriptors WHERE sha256 = ? AND uploaded_at >= ?",
+                (sha256, time.time() - self.max_age),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE file_descriptors SET last_used = ? WHERE sha256 = ?", (time.time(), sha256)
+            )
+            self._conn.commit()
+            return {"id": row[0], "type": row[1]}
+
+    def _put(self, sha256: str, descriptor: Dict[str, Any]) -> None:
+        with self._lock:
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_descriptors (sha256, file_id, file_type, last_used, uploaded_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (sha256, descriptor["id"], descriptor["type"], now, now),
+            )
+            # Evict the least recently used entries beyond the size bound
+            self._conn.execute(
+                """
+                DELETE FROM file_descriptors WHERE sha256 IN (
+                    SELECT sha256 FROM file_descriptors ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    async def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Return the cached {id, type} for a content hash, if any"""
+        descriptor = await asyncio.to_thread(self._get, sha256)
+        if descriptor is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return descriptor
+
+    async def put(self, sha256: str, descriptor: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._put, sha256, descriptor)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def get_descriptor_cache(request: Request) -> Optional[FileDescriptorCache]:
+    """FastAPI dependency returning the upload de-duplication cache, or None when disabled"""
+    return getattr(request.app.state, "descriptor_cache", None)
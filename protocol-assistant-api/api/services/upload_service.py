@@ -1,17 +1,28 @@
 # services/upload_service.py
 import aiohttp
 import logging
-from typing import List, Dict, Any
+import mimetypes
+from typing import List, Dict, Any, Optional
 from fastapi import UploadFile
-from exceptions.upload_exceptions import UpstreamServiceError
+from exceptions.danswer_exceptions import DanswerAPIError
+from exceptions.upload_exceptions import FileValidationError, UpstreamServiceError
+from logging_config import Payload
+from services.danswer_client import DanswerClient
 from services.file_service import FileService
+from services.upload_cache import FileDescriptorCache
 
 logger = logging.getLogger(__name__)
 
 class UploadService:
-    def __init__(self, base_url: str, headers: Dict[str, str]):
-        self.base_url = base_url
-        self.headers = headers
+    def __init__(self, client: DanswerClient):
+        self.client = client
+
+    @staticmethod
+    def _raise_body_error(error: DanswerAPIError) -> None:
+        """Re-raise a validation error from a streamed file body that aborted the request"""
+        connection_error = error.__cause__
+        if connection_error is not None and isinstance(connection_error.__cause__, FileValidationError):
+            raise connection_error.__cause__
 
     async def prepare_upload_data(self, files: List[UploadFile]) -> aiohttp.FormData:
         """Prepare form data for upload"""
@@ -19,45 +30,85 @@ class UploadService:
         
         for file in files:
             await FileService.validate_file(file)
-            # Get file content
-            file_content = await file.read()
             field_name = "files"  # Consistent field name for each file
             
+            # Stream the body so it is never held in memory as a whole
             form.add_field(
                 field_name,
-                file_content,
+                FileService.iter_chunks(file),
                 filename=file.filename,
                 content_type=file.content_type or 'application/octet-stream'
             )
         
         return form
 
-    async def upload_files(self, endpoint: str, form_data: aiohttp.FormData) -> Dict[str, Any]:
-        """Upload files to the specified endpoint"""
-        async with aiohttp.ClientSession() as session:
-            try:
-                url = f"{self.base_url}{endpoint}"
-                logger.debug(f"Uploading files to {url}")
-                
-                async with session.post(
-                    url,
-                    headers=self.headers,
-                    data=form_data
-                ) as response:
-                    response_data = await response.json()
-                    
-                    if response.status != 200:
-                        logger.error(f"Upload failed: {response.status} - {response_data}")
-                        raise UpstreamServiceError(
-                            "Failed to upload files to upstream service",
-                            {"response": response_data, "status": response.status}
-                        )
-                    
-                    return response_data
-                    
-            except aiohttp.ClientError as e:
-                logger.error(f"Client error during upload: {str(e)}")
-                raise UpstreamServiceError(
-                    "Connection error with upstream service",
-                    {"error": str(e)}
-                )
+    async def _forward(self, files: List[UploadFile]) -> Dict[str, Any]:
+        form = aiohttp.FormData()
+        for idx, file in enumerate(files):
+            FileService.validate_size(file)
+            mime_type, _ = mimetypes.guess_type(file.filename)
+            logger.debug("MIME type for file %d: %s", idx, mime_type)
+            if mime_type is None:
+                mime_type = 'application/octet-stream'  # Fallback if type is unknown
+
+            form.add_field('files', FileService.iter_chunks(file), filename=file.filename, content_type=mime_type)
+
+        try:
+            return await self.client.upload_files(form)
+        except DanswerAPIError as e:
+            self._raise_body_error(e)
+            raise
+
+    async def forward_files(
+        self,
+        files: List[UploadFile],
+        descriptor_cache: Optional[FileDescriptorCache] = None,
+        digests: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Forward files to Danswer as-is and return its file descriptors"""
+        if descriptor_cache is None:
+            return await self._forward(files)
+
+        # Content-address each file so repeat uploads reuse the existing descriptor
+        if digests is None:
+            digests = [await FileService.hash_file(file) for file in files]
+        known = {}
+        to_upload: Dict[str, UploadFile] = {}
+        for file, digest in zip(files, digests):
+            if digest in known or digest in to_upload:
+                continue
+            descriptor = await descriptor_cache.get(digest)
+            if descriptor is not None:
+                known[digest] = descriptor
+            else:
+                to_upload[digest] = file
+        logger.info("Reusing %d cached file descriptors, uploading %d files", len(known), len(to_upload))
+
+        if to_upload:
+            upload_response = await self._forward(list(to_upload.values()))
+            uploaded = upload_response.get("files", [])
+            if len(uploaded) != len(to_upload):
+                # Can't map descriptors back to hashes; pass the response through uncached
+                return upload_response
+            for digest, file_info in zip(to_upload, uploaded):
+                known[digest] = file_info
+                await descriptor_cache.put(digest, file_info)
+
+        return {
+            "files": [
+                {"id": known[digest]["id"], "type": known[digest]["type"], "name": file.filename}
+                for file, digest in zip(files, digests)
+            ]
+        }
+
+    async def upload_files(self, form_data: aiohttp.FormData) -> Dict[str, Any]:
+        """Upload files through the shared Danswer client"""
+        try:
+            return await self.client.upload_files(form_data)
+        except DanswerAPIError as e:
+            self._raise_body_error(e)
+            logger.error("Upload failed: %d - %s", e.status_code, Payload(e.response_text))
+            raise UpstreamServiceError(
+                "Failed to upload files to upstream service",
+                {"response": e.response_text, "status": e.status_code}
+            )
@@ -9,6 +9,45 @@ load_dotenv()
 DANSWER_BASE_URL = os.getenv("DANSWER_BASE_URL")
 DANSWER_ADMIN_API_KEY = os.getenv("DANSWER_ADMIN_API_KEY")
 
+# Shared Danswer HTTP client tuning
+DANSWER_POOL_SIZE = int(os.getenv("DANSWER_POOL_SIZE", "100"))
+DANSWER_REQUEST_TIMEOUT = float(os.getenv("DANSWER_REQUEST_TIMEOUT", "30"))
+DANSWER_STREAM_TIMEOUT = float(os.getenv("DANSWER_STREAM_TIMEOUT", "300"))
+
+# Pre-created chat sessions kept per persona (0 disables the pool)
+CHAT_SESSION_POOL_SIZE = int(os.getenv("CHAT_SESSION_POOL_SIZE", "0"))
+CHAT_SESSION_MAX_AGE = float(os.getenv("CHAT_SESSION_MAX_AGE", "600"))
+
+# SQLite file mapping uploaded content hashes to Danswer file descriptors (empty disables it)
+UPLOAD_CACHE_PATH = os.getenv("UPLOAD_CACHE_PATH", "upload_cache.sqlite3")
+UPLOAD_CACHE_MAX_ENTRIES = int(os.getenv("UPLOAD_CACHE_MAX_ENTRIES", "10000"))
+# Seconds a cached file ID is reused before the file is uploaded again
+UPLOAD_CACHE_MAX_AGE = float(os.getenv("UPLOAD_CACHE_MAX_AGE", "604800"))
+
+# Seconds a final protocol summary stays cached (0 disables the review cache)
+REVIEW_CACHE_TTL = float(os.getenv("REVIEW_CACHE_TTL", "0"))
+REVIEW_CACHE_MAX_ENTRIES = int(os.getenv("REVIEW_CACHE_MAX_ENTRIES", "1000"))
+
+# Seconds before the cached input-prompt catalogue is revalidated
+PROMPT_CATALOGUE_TTL = float(os.getenv("PROMPT_CATALOGUE_TTL", "300"))
+
+# Per-stage timings, Server-Timing headers and the Prometheus /metrics endpoint
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Limits of the /chat/batch endpoint, per request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_UPLOAD_CONCURRENCY = int(os.getenv("BATCH_UPLOAD_CONCURRENCY", "4"))
+BATCH_REVIEW_CONCURRENCY = int(os.getenv("BATCH_REVIEW_CONCURRENCY", "8"))
+
+# SQLite file recording background review jobs (empty disables the job API)
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.sqlite3")
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", "job_spool")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "4"))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "100"))
+# Seconds a finished job's result is kept
+JOB_TTL = float(os.getenv("JOB_TTL", "86400"))
+# Upper bound on ?wait= when long-polling a job
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "30"))
+
 def load_prompt_sequence(config_path: str = "config/prompt_sequence.yaml"):
     """Load prompt sequences from YAML config file."""
     with open(config_path, 'r') as file:
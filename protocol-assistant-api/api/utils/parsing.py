@@ -1,6 +1,8 @@
 import re
 import json
 from logging_config import logger  # Import the logger
+from utils.streaming import DanswerStreamParser
+
 def extract_json_markdown(text):
     pattern = r'```json(.*?)```'
     matches = re.findall(pattern, text, re.DOTALL)
@@ -9,29 +11,20 @@ def extract_json_markdown(text):
         try:
             return json.loads(json_str)
         except json.JSONDecodeError as e:
-            logger.error(f"JSON decode error: {e}")
+            logger.error("JSON decode error: %s", e)
             return None
     return None
   
-# Enhanced collect_streamed_response function with detailed logging
-def collect_streamed_response(response):
+# Collect a send-message stream keeping only the latest complete message
+async def collect_streamed_response(response):
     logger.info("Collecting streamed response...")
-    messages = []
-    for line in response.iter_lines():
-        if line:
-            decoded_line = line.decode('utf-8')
-            logger.debug(f"Received line: {decoded_line}")  # Log each received line for debugging
-            try:
-                message_json = json.loads(decoded_line)
-                messages.append(message_json)
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error: {e} - Line content: {decoded_line}")  # Log the exact line causing issues
-                continue  # Skip this line and continue to the next one
+    parser = DanswerStreamParser()
+    async for _event in parser.events(response.content.iter_any()):
+        pass
 
-    if messages:
-        last_message = messages[-1]
-        logger.debug(f"Last streamed message: {last_message}")
-        return last_message
+    if parser.last_message is not None:
+        logger.debug("Stream finished after %d packets (%d tokens)", parser.packet_count, parser.token_count)
+        return parser.last_message
     else:
         logger.warning("No valid messages received in stream")
         return None
@@ -41,5 +34,5 @@ def extract_json_from_message(message_text):
         json_data = json.loads(message_text)
         return json_data
     except json.JSONDecodeError as e:
-        logger.error(f"JSON decode error: {e}")
+        logger.error("JSON decode error: %s", e)
         return None
\ No newline at end of file
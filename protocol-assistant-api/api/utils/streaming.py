@@ -0,0 +1,123 @@
+# utils/streaming.py
+import json
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Union
+
+from logging_config import SAMPLED, logger
+
+
+@dataclass(slots=True)
+class TokenDelta:
+    """A streamed answer fragment; the JSON is only decoded if `text` is read"""
+    raw: bytes
+
+    @property
+    def text(self) -> str:
+        return json.loads(self.raw).get("answer_piece") or ""
+
+
+@dataclass(slots=True)
+class Citation:
+    data: Dict[str, Any]
+
+
+@dataclass(slots=True)
+class FinalMessage:
+    data: Dict[str, Any]
+
+
+@dataclass(slots=True)
+class StreamError:
+    message: str
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+StreamEvent = Union[TokenDelta, Citation, FinalMessage, StreamError]
+
+
+class DanswerStreamParser:
+    """Incremental parser for the NDJSON stream returned by Danswer's send-message"""
+
+    # Token packets are by far the most frequent line type and are recognised
+    # by prefix so they never need a full json.loads on the collect path
+    TOKEN_PREFIX = b'{"answer_piece"'
+
+    def __init__(self):
+        self._buffer = bytearray()
+        # Bytes of the buffer already searched for a newline
+        self._scanned = 0
+        self.last_message: Optional[Dict[str, Any]] = None
+        self.token_count = 0
+        self.packet_count = 0
+
+    def feed(self, chunk: bytes) -> List[StreamEvent]:
+        """Consume a chunk of bytes and return the events completed by it"""
+        self._buffer += chunk
+        events = []
+        start = 0
+        # Only the new bytes can hold a newline, so a long line is scanned once
+        end = self._buffer.find(b"\n", self._scanned)
+        while end != -1:
+            event = self._parse_line(bytes(self._buffer[start:end]))
+            if event is not None:
+                events.append(event)
+            start = end + 1
+            end = self._buffer.find(b"\n", start)
+        if start:
+            del self._buffer[:start]
+        self._scanned = len(self._buffer)
+        return events
+
+    def close(self) -> List[StreamEvent]:
+        """Flush a trailing line that was not newline-terminated"""
+        if not self._buffer:
+            return []
+        event = self._parse_line(bytes(self._buffer))
+        self._buffer.clear()
+        self._scanned = 0
+        return [event] if event is not None else []
+
+    def _parse_line(self, line: bytes) -> Optional[StreamEvent]:
+        line = line.strip()
+        if not line:
+            return None
+        self.packet_count += 1
+
+        if line.startswith(self.TOKEN_PREFIX):
+            self.token_count += 1
+            return TokenDelta(line)
+
+        try:
+            packet = json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.error("JSON decode error: %s - Line content: %r", e, line[:200], extra=SAMPLED)
+            return None
+        if not isinstance(packet, dict):
+            return None
+
+        self.last_message = packet
+        if "error" in packet:
+            return StreamError(str(packet.get("error")), packet)
+        if "message_id" in packet:
+            return FinalMessage(packet)
+        if "citation_num" in packet or "citations" in packet:
+            return Citation(packet)
+        return None
+
+    async def events(self, chunks: AsyncIterable[bytes]) -> AsyncIterator[StreamEvent]:
+        """Yield typed events as the underlying byte chunks arrive"""
+        async for chunk in chunks:
+            for event in self.feed(chunk):
+                yield event
+        for event in self.close():
+            yield event
+
+
+def format_sse(event: str, data: Any) -> bytes:
+    """Encode one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+def format_ndjson(data: Any) -> bytes:
+    """Encode one newline-delimited JSON record"""
+    return json.dumps(data).encode("utf-8") + b"\n"
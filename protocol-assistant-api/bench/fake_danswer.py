@@ -0,0 +1,135 @@
+# bench/fake_danswer.py
+"""
+Local stand-in for the Danswer endpoints the API calls, with configurable
+latency and token rate so the API can be load-tested without a real LLM.
+
+    python fake_danswer.py --port 9100 --first-token-delay 0.5 --token-rate 50
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+import uuid
+
+from aiohttp import web
+
+ENDPOINTS = {
+    "create_chat_session": "/chat/create-chat-session",
+    "input_prompt": "/admin/input_prompt",
+    "send_message": "/chat/send-message",
+    "upload_file": "/chat/file",
+}
+
+PROMPTS = [
+    {"id": 1, "prompt": "GenericProtocolJSONParser", "content": "Summarise the protocol as JSON: "},
+    {"id": 2, "prompt": "StepwiseProtocolJSONParser", "content": "List the protocol steps as JSON."},
+]
+PROMPTS_ETAG = '"bench-prompts-1"'
+
+TICK = 0.02  # Seconds between token bursts when the token rate is limited
+
+
+class FakeDanswer:
+    """In-memory Danswer: sessions, file descriptors and NDJSON message streams"""
+
+    def __init__(self, first_token_delay: float, token_rate: float, tokens: int, session_delay: float, upload_delay: float):
+        self.first_token_delay = first_token_delay
+        self.token_rate = token_rate
+        self.tokens = tokens
+        self.session_delay = session_delay
+        self.upload_delay = upload_delay
+        self._message_ids = itertools.count(1)
+        self.requests = {name: 0 for name in ENDPOINTS}
+
+    async def create_chat_session(self, request: web.Request) -> web.Response:
+        self.requests["create_chat_session"] += 1
+        await request.json()
+        await asyncio.sleep(self.session_delay)
+        return web.json_response({"chat_session_id": str(uuid.uuid4())})
+
+    async def input_prompt(self, request: web.Request) -> web.Response:
+        self.requests["input_prompt"] += 1
+        if request.headers.get("If-None-Match") == PROMPTS_ETAG:
+            return web.Response(status=304)
+        return web.json_response(PROMPTS, headers={"ETag": PROMPTS_ETAG})
+
+    async def upload_file(self, request: web.Request) -> web.Response:
+        self.requests["upload_file"] += 1
+        files = []
+        reader = await request.multipart()
+        async for part in reader:
+            # Drain the body like a real upload would
+            while await part.read_chunk():
+                pass
+            files.append({"id": str(uuid.uuid4()), "type": "plain_text", "name": part.filename})
+        await asyncio.sleep(self.upload_delay)
+        return web.json_response({"files": files})
+
+    def _answer(self, payload: dict) -> str:
+        turn = "review" if payload.get("parent_message_id") is None else "actions"
+        steps = [f"Step {i}: transfer 10 uL to well A{i}" for i in range(1, max(self.tokens // 12, 1) + 1)]
+        return json.dumps({"turn": turn, "summary": "Benchmark protocol", "steps": steps})
+
+    async def send_message(self, request: web.Request) -> web.StreamResponse:
+        self.requests["send_message"] += 1
+        payload = await request.json()
+        answer = self._answer(payload)
+        # Split the answer into `tokens` pieces, the way Danswer streams answer_piece packets
+        size = max(len(answer) // self.tokens, 1)
+        pieces = [answer[i:i + size] for i in range(0, len(answer), size)]
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        await asyncio.sleep(self.first_token_delay)
+
+        started = time.monotonic()
+        sent = 0
+        while sent < len(pieces):
+            if self.token_rate > 0:
+                due = min(len(pieces), max(int((time.monotonic() - started) * self.token_rate), sent + 1))
+            else:
+                due = len(pieces)
+            await response.write(b"".join(
+                json.dumps({"answer_piece": piece}).encode() + b"\n" for piece in pieces[sent:due]
+            ))
+            sent = due
+            if sent < len(pieces):
+                await asyncio.sleep(TICK)
+
+        parent_message = next(self._message_ids)
+        final = {"message_id": parent_message + 1, "parent_message": parent_message, "message": answer}
+        await response.write(json.dumps(final).encode() + b"\n")
+        await response.write_eof()
+        return response
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.requests)
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post(ENDPOINTS["create_chat_session"], self.create_chat_session)
+        app.router.add_get(ENDPOINTS["input_prompt"], self.input_prompt)
+        app.router.add_post(ENDPOINTS["send_message"], self.send_message)
+        app.router.add_post(ENDPOINTS["upload_file"], self.upload_file)
+        app.router.add_get("/bench/stats", self.stats)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Danswer server for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="Seconds before the first answer piece")
+    parser.add_argument("--token-rate", type=float, default=100.0, help="Answer pieces per second (0 = unthrottled)")
+    parser.add_argument("--tokens", type=int, default=200, help="Answer pieces per message")
+    parser.add_argument("--session-delay", type=float, default=0.02, help="Seconds to create a chat session")
+    parser.add_argument("--upload-delay", type=float, default=0.05, help="Seconds to process an upload")
+    args = parser.parse_args()
+
+    danswer = FakeDanswer(args.first_token_delay, args.token_rate, args.tokens, args.session_delay, args.upload_delay)
+    web.run_app(danswer.app(), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# bench/load.py
+"""
+Closed-loop load driver: for every endpoint and concurrency level, N workers
+send requests back to back for a fixed time. Reports requests per second
+and p50/p95/p99 latency, and writes the results as JSON for comparison
+between commits.
+
+    python load.py --url http://127.0.0.1:8100 --keys /tmp/bench-keys.json --concurrency 1,8,32
+"""
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import math
+import os
+import subprocess
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+import stub_firebase
+
+ENDPOINTS = {
+    "chat": "/protocol-assistant/chat",
+    "upload-protocol": "/protocol-assistant/upload-protocol",
+    "async-upload-protocol": "/protocol-assistant/async-upload-protocol",
+    "chat-batch": "/protocol-assistant/chat/batch",
+}
+
+USER_REQUEST = "Review this PCR protocol for a 96-well plate."
+
+
+def protocol_text(size: int) -> bytes:
+    line = b"Step: transfer 10 uL of master mix to each well, mix 3 times, incubate 2 min at 95 C.\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+class RequestFactory:
+    """Builds the multipart body for each request; file contents vary unless repeat_files is set"""
+
+    def __init__(self, endpoint: str, file_size: int, repeat_files: bool, batch_size: int = 1):
+        self.endpoint = endpoint
+        self.body = protocol_text(file_size)
+        self.repeat_files = repeat_files
+        self.batch_size = batch_size
+        self._counter = itertools.count()
+
+    def form(self) -> aiohttp.FormData:
+        form = aiohttp.FormData()
+        if self.endpoint == "chat":
+            form.add_field("user_request", USER_REQUEST)
+        if self.endpoint == "chat-batch":
+            items = [{"user_request": USER_REQUEST, "files": [index]} for index in range(self.batch_size)]
+            form.add_field("items", json.dumps(items))
+        for _ in range(self.batch_size if self.endpoint == "chat-batch" else 1):
+            body = self.body if self.repeat_files else self.body + f"\nRun {next(self._counter)}\n".encode()
+            form.add_field("files", body, filename="protocol.txt", content_type="text/plain")
+        return form
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+async def run_level(
+    session: aiohttp.ClientSession,
+    base_url: str,
+    endpoint: str,
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    tokens: List[str],
+    factory: RequestFactory,
+) -> Dict:
+    url = base_url.rstrip("/") + ENDPOINTS[endpoint]
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def worker(index: int, deadline: float, record: bool):
+        headers = {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+        # Requests sent before the deadline count even if they finish after it,
+        # so turns longer than the window are still measured
+        while time.perf_counter() < deadline:
+            sent = time.perf_counter()
+            try:
+                async with session.post(url, data=factory.form(), headers=headers) as response:
+                    await response.read()
+                    status = str(response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            if record:
+                latencies.append(time.perf_counter() - sent)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    async def phase(seconds: float, record: bool):
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(worker(index, deadline, record) for index in range(concurrency)))
+
+    if warmup > 0:
+        await phase(warmup, record=False)
+    started = time.perf_counter()
+    await phase(duration, record=True)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    completed = len(latencies)
+    errors = completed - statuses.get("200", 0)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": completed,
+        "errors": errors,
+        "statuses": statuses,
+        "rps": round(completed / elapsed, 2),
+        "latency_ms": {
+            "mean": round(1000 * sum(latencies) / completed, 2) if completed else 0.0,
+            "p50": round(1000 * percentile(latencies, 0.50), 2),
+            "p95": round(1000 * percentile(latencies, 0.95), 2),
+            "p99": round(1000 * percentile(latencies, 0.99), 2),
+            "max": round(1000 * latencies[-1], 2) if completed else 0.0,
+        },
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_header() -> None:
+    print(f"{'endpoint':<24}{'conc':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+
+
+def print_results(results: List[Dict], baseline: Optional[List[Dict]] = None) -> None:
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline or []}
+    for result in results:
+        latency = result["latency_ms"]
+        line = (
+            f"{result['endpoint']:<24}{result['concurrency']:>6}{result['rps']:>10.1f}"
+            f"{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}{result['errors']:>8}"
+        )
+        before = previous.get((result["endpoint"], result["concurrency"]))
+        if before and before["rps"] and before["latency_ms"]["p95"]:
+            rps_change = 100 * (result["rps"] / before["rps"] - 1)
+            p95_change = 100 * (latency["p95"] / before["latency_ms"]["p95"] - 1)
+            line += f"   rps {rps_change:+.1f}%  p95 {p95_change:+.1f}%"
+        print(line)
+
+
+async def run(args) -> Dict:
+    tokens = stub_firebase.mint_tokens(args.keys, args.users)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    endpoints = args.endpoints.split(",")
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=0)
+    results = []
+    print_header()
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        for endpoint in endpoints:
+            factory = RequestFactory(endpoint, args.file_size, args.repeat_files, args.batch_size)
+            for concurrency in levels:
+                result = await run_level(
+                    session, args.url, endpoint, concurrency, args.duration, args.warmup, tokens, factory
+                )
+                results.append(result)
+                print_results([result])
+    return {
+        "commit": git_commit(),
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "params": {
+            "url": args.url,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "users": args.users,
+            "file_size": args.file_size,
+            "repeat_files": args.repeat_files,
+            "batch_size": args.batch_size,
+        },
+        "results": results,
+    }
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated endpoints to load")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level during which measured requests are sent")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each level")
+    parser.add_argument("--users", type=int, default=50, help="Distinct ID tokens to rotate through")
+    parser.add_argument("--file-size", type=int, default=20_000, help="Bytes per uploaded protocol")
+    parser.add_argument("--repeat-files", action="store_true", help="Upload identical files (exercises the upload cache)")
+    parser.add_argument("--batch-size", type=int, default=8, help="Protocols per chat-batch request")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--out", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Earlier results JSON to print changes against")
+
+
+def write_report(report: Dict, args) -> None:
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        print(f"\nCompared with {baseline.get('commit')} ({baseline.get('created')}):")
+        print_header()
+        print_results(report["results"], baseline["results"])
+    if args.out:
+        with open(args.out, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load driver for the protocol-assistant API")
+    parser.add_argument("--url", default="http://127.0.0.1:8100", help="API base URL")
+    parser.add_argument("--keys", required=True, help="Key file written by stub_firebase.generate_keys")
+    add_arguments(parser)
+    args = parser.parse_args()
+    write_report(asyncio.run(run(args)), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# bench/run.py
+"""
+One-command benchmark: starts the fake Danswer and the API with the stub
+Firebase identity, runs the load driver, writes the results and stops both.
+
+    python run.py --concurrency 1,8,32 --out results/$(git rev-parse --short HEAD).json
+    python run.py --compare results/<earlier>.json
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import load
+import stub_firebase
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_for_port(host: str, port: int, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with status {process.returncode}")
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on {host}:{port} after {timeout:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API against a local fake Danswer")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--danswer-port", type=int, default=9100)
+    parser.add_argument("--first-token-delay", default="0.2", help="Passed to fake_danswer.py")
+    parser.add_argument("--token-rate", default="100", help="Passed to fake_danswer.py")
+    parser.add_argument("--tokens", default="200", help="Passed to fake_danswer.py")
+    parser.add_argument("--log-file", default=os.path.join(BENCH_DIR, "bench.log"), help="API log file")
+    load.add_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        args.keys = os.path.join(workdir, "keys.json")
+        stub_firebase.generate_keys(args.keys)
+        args.url = f"http://{args.host}:{args.api_port}"
+
+        danswer = subprocess.Popen([
+            sys.executable, os.path.join(BENCH_DIR, "fake_danswer.py"),
+            "--host", args.host, "--port", str(args.danswer_port),
+            "--first-token-delay", args.first_token_delay, "--token-rate", args.token_rate, "--tokens", args.tokens,
+        ])
+        # The API's own log goes to --log-file; its console copy would drown the results
+        api = subprocess.Popen([
+            sys.executable, os.path.join(BENCH_DIR, "serve.py"),
+            "--host", args.host, "--port", str(args.api_port),
+            "--danswer-url", f"http://{args.host}:{args.danswer_port}",
+            "--keys", args.keys, "--log-file", args.log_file,
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_port(args.host, args.danswer_port, danswer)
+            wait_for_port(args.host, args.api_port, api)
+            report = asyncio.run(load.run(args))
+            report["params"].update(
+                first_token_delay=float(args.first_token_delay),
+                token_rate=float(args.token_rate),
+                tokens=int(args.tokens),
+            )
+        finally:
+            for process in (api, danswer):
+                process.terminate()
+            for process in (api, danswer):
+                process.wait(timeout=10)
+    load.write_report(report, args)
+
+
+if __name__ == "__main__":
+    main()
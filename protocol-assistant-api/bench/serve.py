@@ -0,0 +1,45 @@
+# bench/serve.py
+"""
+Run the API for a load test: Danswer calls go to the given URL (normally
+fake_danswer.py) and ID tokens are checked against the stub Firebase key.
+
+    python serve.py --port 8100 --danswer-url http://127.0.0.1:9100 --keys /tmp/bench-keys.json
+"""
+import argparse
+import os
+import sys
+
+import uvicorn
+
+import stub_firebase
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "api")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the API against a fake Danswer and the stub Firebase identity")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--danswer-url", default="http://127.0.0.1:9100")
+    parser.add_argument("--keys", required=True, help="Key file written by stub_firebase.generate_keys")
+    parser.add_argument("--log-file", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench.log"))
+    args = parser.parse_args()
+
+    # Settings are read when the API modules are imported; explicit env vars still win
+    os.environ["DANSWER_BASE_URL"] = args.danswer_url
+    os.environ.setdefault("UPLOAD_CACHE_PATH", "")
+    os.environ.setdefault("JOB_STORE_PATH", "")
+    os.environ.setdefault("LOG_FILE", args.log_file)
+    os.environ.setdefault("FIREBASE_CREDENTIALS_PATH", "")
+
+    # Config files are resolved relative to the API directory
+    os.chdir(API_DIR)
+    sys.path.insert(0, API_DIR)
+    stub_firebase.install(args.keys)
+
+    import main as api
+    uvicorn.run(api.app, host=args.host, port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
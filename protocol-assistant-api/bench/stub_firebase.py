@@ -0,0 +1,87 @@
+# bench/stub_firebase.py
+"""
+Stub Firebase identity for load tests: a throwaway signing key whose
+certificate the API's TokenVerifier trusts, and ID tokens minted with it.
+Tokens go through the real verification and cache path, only the Google
+certificate download is replaced.
+"""
+import datetime
+import json
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+PROJECT_ID = "bench-project"
+KEY_ID = "bench-key"
+ISSUER_PREFIX = "https://securetoken.google.com/"
+
+
+def generate_keys(path: str) -> None:
+    """Write a new private key and its self-signed certificate to a JSON file"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "bench")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    keys = {
+        "private_key": key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode(),
+        "certs": {KEY_ID: cert.public_bytes(serialization.Encoding.PEM).decode()},
+    }
+    with open(path, "w") as file:
+        json.dump(keys, file)
+
+
+def load_certs(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)["certs"]
+
+
+def mint_tokens(path: str, users: int) -> list:
+    """One ID token per simulated user, valid for an hour"""
+    with open(path) as file:
+        signer = crypt.RSASigner.from_string(json.load(file)["private_key"], key_id=KEY_ID)
+    now = int(time.time())
+    return [
+        jwt.encode(signer, {
+            "iss": ISSUER_PREFIX + PROJECT_ID,
+            "aud": PROJECT_ID,
+            "sub": f"bench-user-{user}",
+            "iat": now,
+            "exp": now + 3600,
+        }).decode()
+        for user in range(users)
+    ]
+
+
+def install(keys_path: str) -> None:
+    """
+    Point the API at the stub identity. Must run before `auth` is imported,
+    with the API directory on sys.path.
+    """
+    import firebase_admin
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(options={"projectId": PROJECT_ID})
+
+    import auth
+    import main
+    from services.token_service import StaticKeySet, TokenVerifier
+
+    verifier = TokenVerifier(StaticKeySet(load_certs(keys_path)), project_id=PROJECT_ID)
+    # The route dependency and the lifespan each hold their own reference
+    auth.token_verifier = verifier
+    main.token_verifier = verifier
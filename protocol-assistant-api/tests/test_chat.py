@@ -1,9 +1,21 @@
 # /tests/test_chat.py
 
+import asyncio
+import io
+import json
 import pytest
-from unittest.mock import patch, AsyncMock
+from contextlib import asynccontextmanager
+from unittest.mock import patch, AsyncMock, MagicMock
+from fastapi import UploadFile
 from fastapi.testclient import TestClient
-from api.main import app
+from main import app
+from auth import verify_firebase_token
+from models.config import ConfigSnapshot, DanswerEndpoints
+from services.chat_service import ProtocolReviewPipeline
+from services.config_registry import get_config
+from services.danswer_client import get_danswer_client
+from services.prompt_catalogue import PromptCatalogue, get_prompt_catalogue
+from services.review_cache import ReviewCache, get_review_cache
 
 client = TestClient(app)
 
@@ -27,23 +39,48 @@ mock_send_message_response = {
     "message": "{\"summary\": \"This is a protocol summary.\"}"
 }
 
-# Patching dependencies in the chat route
-@patch("api.routes.chat.upload_protocol", new_callable=AsyncMock)
-@patch("api.routes.chat.create_chat_session")
-@patch("api.routes.chat.send_chat_message")
-@patch("api.routes.chat.collect_streamed_response")
-def test_chat_endpoint(mock_collect_streamed_response, mock_send_chat_message, mock_create_chat_session, mock_upload_protocol):
-    # Step 1: Mock upload_protocol function
-    mock_upload_protocol.return_value = mock_upload_response
-    # Step 2: Mock create_chat_session function
-    mock_create_chat_session.return_value = (mock_create_chat_session_response["chat_session_id"], None)
-    # Step 3: Mock send_chat_message function for initial and secondary messages
-    mock_send_chat_message.return_value = AsyncMock(status_code=200)
-    # Step 4: Mock collect_streamed_response for sequential responses
-    mock_collect_streamed_response.side_effect = [
-        mock_send_message_response,  # First response for initial message
-        mock_send_message_response   # Second response for action message
-    ]
+mock_config = ConfigSnapshot(
+    endpoints=DanswerEndpoints(
+        send_message="/chat/send-message",
+        create_chat_session="/chat/create-chat-session",
+        upload_file="/chat/file",
+        input_prompt="/admin/input_prompt"
+    ),
+    prompt_sequence=("GenericProtocolJSONParser", "StepwiseProtocolJSONParser"),
+    version="test"
+)
+
+
+@pytest.fixture
+def mock_danswer_client():
+    danswer_client = MagicMock()
+    danswer_client.create_chat_session = AsyncMock(
+        return_value=mock_create_chat_session_response["chat_session_id"]
+    )
+
+    @asynccontextmanager
+    async def send_message(payload):
+        async def iter_any():
+            yield b'{"answer_piece": "{\\"summary\\": "}\n{"answer_piece": "\\"ok\\"}"}\n'
+            yield json.dumps(mock_send_message_response).encode() + b"\n"
+
+        response = MagicMock(status=200)
+        response.content.iter_any = iter_any
+        yield response
+
+    danswer_client.send_message = MagicMock(side_effect=send_message)
+    app.dependency_overrides[get_danswer_client] = lambda: danswer_client
+    app.dependency_overrides[verify_firebase_token] = lambda: {"uid": "test-user"}
+    app.dependency_overrides[get_config] = lambda: mock_config
+    yield danswer_client
+    app.dependency_overrides.clear()
+
+
+# Patching dependencies in the chat pipeline
+@patch("services.chat_service.UploadService.forward_files", new_callable=AsyncMock)
+def test_chat_endpoint(mock_forward_files, mock_danswer_client):
+    # Mock file forwarding to Danswer
+    mock_forward_files.return_value = mock_upload_response
 
     # Test data
     user_request = "This is a user request."
@@ -51,7 +88,7 @@ def test_chat_endpoint(mock_collect_streamed_response, mock_send_chat_message, m
 
     # Send request to the /chat endpoint
     response = client.post(
-        "/api/chat",
+        "/protocol-assistant/chat",
         data={"user_request": user_request},
         files=files
     )
@@ -63,7 +100,207 @@ def test_chat_endpoint(mock_collect_streamed_response, mock_send_chat_message, m
     assert response_data["summary"] == "This is a protocol summary."
 
     # Check that each function was called as expected
-    mock_upload_protocol.assert_called_once()
-    mock_create_chat_session.assert_called_once()
-    assert mock_send_chat_message.call_count == 2
-    assert mock_collect_streamed_response.call_count == 2
+    mock_forward_files.assert_called_once()
+    mock_danswer_client.create_chat_session.assert_called_once()
+    assert mock_danswer_client.send_message.call_count == 2
+    second_payload = mock_danswer_client.send_message.call_args_list[1].args[0]
+    assert second_payload["parent_message_id"] == 2
+
+
+@patch("services.chat_service.UploadService.forward_files", new_callable=AsyncMock)
+def test_chat_stream_endpoint(mock_forward_files, mock_danswer_client):
+    mock_forward_files.return_value = mock_upload_response
+
+    response = client.post(
+        "/protocol-assistant/chat/stream",
+        data={"user_request": "This is a user request."},
+        files=[("files", ("protocol.pdf", b"File content", "application/pdf"))]
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+        for block in response.text.strip().split("\n\n")
+    ]
+    names = [name for name, _ in events]
+    assert names[0] == "stage" and events[0][1]["stage"] == "upload_done"
+    assert names.count("token") == 4
+    assert {"stage": "turn_1_done"} in [data for _, data in events]
+    assert events[-1] == ("result", {"summary": "This is a protocol summary."})
+
+
+@patch("services.chat_service.UploadService.forward_files", new_callable=AsyncMock)
+def test_chat_endpoints_report_streamed_danswer_error(mock_forward_files, mock_danswer_client):
+    mock_forward_files.return_value = mock_upload_response
+
+    @asynccontextmanager
+    async def send_message(payload):
+        async def iter_any():
+            yield b'{"answer_piece": "partial"}\n{"error": "LLM provider overloaded"}\n'
+
+        response = MagicMock(status=200)
+        response.content.iter_any = iter_any
+        yield response
+
+    mock_danswer_client.send_message = MagicMock(side_effect=send_message)
+    request = dict(
+        data={"user_request": "This is a user request."},
+        files=[("files", ("protocol.pdf", b"File content", "application/pdf"))]
+    )
+
+    response = client.post("/protocol-assistant/chat", **request)
+    assert response.status_code == 502
+    assert response.json() == {"detail": "Failed to send message", "error": "LLM provider overloaded"}
+
+    response = client.post("/protocol-assistant/chat/stream", **request)
+    assert response.status_code == 200
+    last_block = response.text.strip().split("\n\n")[-1]
+    assert last_block.split("\n")[0] == "event: error"
+    assert json.loads(last_block.split("\n")[1].removeprefix("data: ")) == {
+        "status_code": 502, "detail": "Failed to send message", "error": "LLM provider overloaded"
+    }
+
+
+@patch("services.chat_service.UploadService.forward_files", new_callable=AsyncMock)
+def test_chat_endpoint_review_cache(mock_forward_files, mock_danswer_client):
+    mock_forward_files.return_value = mock_upload_response
+    app.dependency_overrides[get_review_cache] = lambda: review_cache
+    review_cache = ReviewCache(ttl=60)
+
+    def post(**headers):
+        return client.post(
+            "/protocol-assistant/chat",
+            data={"user_request": "This is a user request."},
+            files=[("files", ("protocol.pdf", b"File content", "application/pdf"))],
+            headers=headers
+        )
+
+    first, second = post(), post()
+    assert first.headers["X-Review-Cache"] == "miss"
+    assert second.headers["X-Review-Cache"] == "hit"
+    assert second.json() == {"summary": "This is a protocol summary."}
+    assert mock_danswer_client.create_chat_session.call_count == 1
+
+    assert post(**{"X-Review-Cache": "bypass"}).headers["X-Review-Cache"] == "bypass"
+    assert mock_danswer_client.create_chat_session.call_count == 2
+
+
+@patch("services.chat_service.UploadService.forward_files", new_callable=AsyncMock)
+def test_review_cache_misses_after_a_prompt_edit(mock_forward_files, mock_danswer_client):
+    mock_forward_files.return_value = mock_upload_response
+    reviewer_prompt = {"prompt": "GenericProtocolJSONParser", "content": "Summarise the protocol as JSON."}
+
+    async def list_input_prompts(etag=None):
+        return [dict(reviewer_prompt)], None
+
+    mock_danswer_client.list_input_prompts = list_input_prompts
+    review_cache = ReviewCache(ttl=60)
+    catalogue = PromptCatalogue(mock_danswer_client, ttl=0)
+    app.dependency_overrides[get_review_cache] = lambda: review_cache
+    app.dependency_overrides[get_prompt_catalogue] = lambda: catalogue
+
+    def post():
+        return client.post(
+            "/protocol-assistant/chat",
+            data={"user_request": "This is a user request."},
+            files=[("files", ("protocol.pdf", b"File content", "application/pdf"))]
+        )
+
+    assert post().headers["X-Review-Cache"] == "miss"
+    assert post().headers["X-Review-Cache"] == "hit"
+    reviewer_prompt["content"] = "Summarise the protocol as strict JSON."
+    assert post().headers["X-Review-Cache"] == "miss"
+    sent = [call.args[0]["message"] for call in mock_danswer_client.send_message.call_args_list]
+    assert sent[-2].startswith("Summarise the protocol as strict JSON.")
+
+
+@patch("services.chat_service.UploadService.forward_files", new_callable=AsyncMock)
+def test_chat_batch_endpoint(mock_forward_files, mock_danswer_client):
+    async def forward_files(files, descriptor_cache=None, digests=None):
+        if files[0].filename == "broken.pdf":
+            return {"error": "Upstream rejected the file"}
+        if files[0].filename == "empty.pdf":
+            return {"files": []}
+        return {"files": [{"id": files[0].filename, "type": "plain_text", "name": files[0].filename}]}
+
+    mock_forward_files.side_effect = forward_files
+    items = [
+        {"user_request": "First", "files": [0]},
+        {"user_request": "Second", "files": [0, 1]},
+        {"user_request": "Third", "files": [1]},
+        {"user_request": "Broken", "files": [2]},
+        {"user_request": "Empty", "files": [4]},
+    ]
+    response = client.post(
+        "/protocol-assistant/chat/batch",
+        data={"items": json.dumps(items)},
+        files=[
+            ("files", ("a.pdf", b"A", "application/pdf")),
+            ("files", ("b.pdf", b"B", "application/pdf")),
+            ("files", ("broken.pdf", b"C", "application/pdf")),
+            ("files", ("unused.pdf", b"D", "application/pdf")),
+            ("files", ("empty.pdf", b"E", "application/pdf")),
+        ]
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda record: record["index"])
+    assert [record["status"] for record in records] == ["succeeded"] * 3 + ["failed"] * 2
+    assert records[0]["result"] == {"summary": "This is a protocol summary."}
+    assert records[3]["error"]["detail"] == "Failed to upload files"
+    assert records[4]["error"]["status_code"] == 502
+    # Each attached file is uploaded once however many items attach it; unattached files are not uploaded
+    assert sorted(call.args[0][0].filename for call in mock_forward_files.call_args_list) == ["a.pdf", "b.pdf", "broken.pdf", "empty.pdf"]
+    assert mock_danswer_client.create_chat_session.call_count == 3
+    second_turn_one = [
+        call.args[0] for call in mock_danswer_client.send_message.call_args_list if call.args[0]["message"].endswith("Second")
+    ]
+    assert [descriptor["id"] for descriptor in second_turn_one[0]["file_descriptors"]] == ["a.pdf", "b.pdf"]
+
+
+def test_chat_batch_endpoint_rejects_bad_items(mock_danswer_client):
+    def post(items, files=None):
+        return client.post("/protocol-assistant/chat/batch", data={"items": items}, files=files)
+
+    assert post("not json").status_code == 400
+    assert post("[]").status_code == 400
+    no_files = post(json.dumps([{"user_request": "x", "files": [0]}]))
+    assert no_files.status_code == 400
+    assert no_files.json() == {"detail": "At least one file is required"}
+    assert post(json.dumps([{"user_request": "x", "files": [1]}]),
+                [("files", ("a.pdf", b"A", "application/pdf"))]).status_code == 400
+
+
+def test_cached_run_survives_its_caller_going_away(mock_danswer_client):
+    release = asyncio.Event()
+    uploaded = []
+
+    async def forward_files(files, descriptor_cache=None, digests=None):
+        await release.wait()
+        uploaded.append([await file.read() for file in files])
+        return mock_upload_response
+
+    async def run():
+        review_cache = ReviewCache(ttl=60)
+        pipeline = ProtocolReviewPipeline(mock_danswer_client, mock_config)
+        first_file = UploadFile(io.BytesIO(b"File content"), filename="protocol.pdf")
+        second_file = UploadFile(io.BytesIO(b"File content"), filename="protocol.pdf")
+        first = asyncio.create_task(pipeline.run_cached("Review", [first_file], review_cache))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(pipeline.run_cached("Review", [second_file], review_cache))
+        await asyncio.sleep(0.05)
+
+        # The client that started the run disconnects and Starlette closes its files
+        first.cancel()
+        first_file.file.close()
+        second_file.file.close()
+        release.set()
+        return await second
+
+    with patch("services.chat_service.UploadService.forward_files", side_effect=forward_files):
+        result, status = asyncio.run(run())
+
+    assert (result, status) == ({"summary": "This is a protocol summary."}, "coalesced")
+    assert uploaded == [[b"File content"]]
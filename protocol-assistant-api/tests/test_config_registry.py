@@ -0,0 +1,66 @@
+# /tests/test_config_registry.py
+
+import os
+
+import pytest
+
+from services.config_registry import ConfigRegistry
+
+ENDPOINTS = """send_message: /chat/send-message
+create_chat_session: /chat/create-chat-session
+upload_file: /chat/file
+input_prompt: /admin/input_prompt
+"""
+
+
+@pytest.fixture
+def registry(tmp_path):
+    prompts = tmp_path / "prompt_sequence.yaml"
+    prompts.write_text("protocol-assistant:\n  - Reviewer\n  - Action\n")
+    endpoints = tmp_path / "danswer_endpoints.yaml"
+    endpoints.write_text(ENDPOINTS)
+    return ConfigRegistry(str(prompts), str(endpoints), poll_interval=0)
+
+
+def touch_later(path):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_reload_swaps_snapshot_when_file_changes(registry, tmp_path):
+    first = registry.snapshot
+    assert first.prompt_sequence == ("Reviewer", "Action")
+    assert registry.reload_if_changed() is False
+
+    prompts = tmp_path / "prompt_sequence.yaml"
+    prompts.write_text("protocol-assistant:\n  - Reviewer2\n  - Action2\n")
+    touch_later(prompts)
+
+    assert registry.reload_if_changed() is True
+    assert registry.snapshot.prompt_sequence == ("Reviewer2", "Action2")
+    assert registry.snapshot.version != first.version
+    assert first.prompt_sequence == ("Reviewer", "Action")
+
+
+def test_invalid_edit_keeps_previous_snapshot(registry, tmp_path):
+    first = registry.snapshot
+
+    endpoints = tmp_path / "danswer_endpoints.yaml"
+    endpoints.write_text("send_message: /chat/send-message\n")
+    touch_later(endpoints)
+
+    assert registry.reload_if_changed() is False
+    assert registry.snapshot is first
+
+
+@pytest.mark.parametrize("name", ["danswer_endpoints.yaml", "prompt_sequence.yaml"])
+def test_empty_file_keeps_previous_snapshot(registry, tmp_path, name):
+    first = registry.snapshot
+
+    # An editor truncates the file before writing the new contents
+    path = tmp_path / name
+    path.write_text("")
+    touch_later(path)
+
+    assert registry.reload_if_changed() is False
+    assert registry.snapshot is first
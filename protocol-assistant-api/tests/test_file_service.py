@@ -0,0 +1,70 @@
+# /tests/test_file_service.py
+
+import asyncio
+import io
+import os
+import random
+
+import pytest
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from exceptions.upload_exceptions import FileValidationError
+from services.file_service import FileService
+
+
+def make_upload(content, content_type="text/plain", filename="protocol.txt"):
+    return UploadFile(io.BytesIO(content), filename=filename, headers=Headers({"content-type": content_type}))
+
+
+@pytest.mark.parametrize("head, expected", [
+    (b"%PDF-1.7\n%\xe2\xe3\xcf\xd3", "application/pdf"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1\x00\x00", "application/msword"),
+    (b"PK\x03\x04\x14\x00", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"),
+    ("Add 10 µL of buffer\r\n".encode("utf-8"), "text/plain"),
+    ("Add 10 µL of buffer\r\n".encode("latin-1"), "text/plain"),
+    ("Add 10 µL of buffer\r\n".encode("utf-16"), "text/plain"),
+    ("Add 10 µL of buffer\r\n".encode("utf-8")[:-13], "text/plain"),
+    (b"", "text/plain"),
+    (b"\x7fELF\x02\x01\x01\x00", None),
+    (random.Random(0).randbytes(4096).replace(b"\x00", b"\x01"), None),
+])
+def test_sniff_content_type(head, expected):
+    assert FileService.sniff_content_type(head) == expected
+
+
+def test_validate_file_rejects_mismatched_content():
+    with pytest.raises(FileValidationError) as excinfo:
+        asyncio.run(FileService.validate_file(make_upload(b"%PDF-1.7 ...", "text/plain")))
+    assert excinfo.value.additional_info["detected_type"] == "application/pdf"
+
+    # Latin-1 text is accepted and left at the start for the upload
+    file = make_upload("Incubate at 37 °C".encode("latin-1"))
+    asyncio.run(FileService.validate_file(file))
+    assert file.file.tell() == 0
+
+
+def test_iter_chunks_streams_whole_body():
+    body = os.urandom(FileService.CHUNK_SIZE * 2 + 10)
+
+    async def collect():
+        return [chunk async for chunk in FileService.iter_chunks(make_upload(body, "application/pdf"))]
+
+    chunks = asyncio.run(collect())
+    assert [len(chunk) for chunk in chunks] == [FileService.CHUNK_SIZE, FileService.CHUNK_SIZE, 10]
+    assert b"".join(chunks) == body
+
+
+def test_iter_chunks_rejects_oversize_body_while_streaming(monkeypatch):
+    monkeypatch.setattr(FileService, "MAX_FILE_SIZE", FileService.CHUNK_SIZE + 1)
+    received = []
+
+    async def collect():
+        async for chunk in FileService.iter_chunks(make_upload(b"x" * (FileService.CHUNK_SIZE * 3))):
+            received.append(chunk)
+
+    with pytest.raises(FileValidationError) as excinfo:
+        asyncio.run(collect())
+    # The limit is enforced before the second chunk is handed on
+    assert len(received) == 1
+    assert excinfo.value.additional_info["received_size"] == FileService.CHUNK_SIZE * 2
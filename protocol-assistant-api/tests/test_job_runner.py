@@ -0,0 +1,175 @@
+# /tests/test_job_runner.py
+
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+from auth import verify_firebase_token
+from exceptions.chat_exceptions import ChatPipelineError
+from exceptions.job_exceptions import JobQueueFullError
+from main import app
+from services.job_runner import JobRunner, get_job_runner
+from services.job_store import FAILED, QUEUED, RUNNING, SUCCEEDED, JobStore
+
+
+class FakePipeline:
+    def __init__(self, calls, gate=None):
+        self.calls = calls
+        self.gate = gate
+
+    async def run(self, user_request, files):
+        if self.gate is not None:
+            await self.gate.wait()
+        contents = [file.file.read().decode() for file in files or []]
+        self.calls.append((user_request, contents))
+        if user_request == "fail":
+            raise ChatPipelineError("Danswer rejected the request", status_code=502)
+        return {"summary": user_request, "files": contents}
+
+
+def make_upload(name, content):
+    return UploadFile(io.BytesIO(content.encode()), filename=name)
+
+
+def test_job_runs_and_long_poll_returns_result(tmp_path):
+    calls = []
+
+    async def run():
+        store = JobStore(str(tmp_path / "jobs.sqlite3"))
+        runner = JobRunner(store, lambda: FakePipeline(calls), str(tmp_path / "spool"), concurrency=2)
+        await runner.start()
+        try:
+            job = await runner.submit("alice", "review", [make_upload("protocol.txt", "step 1")])
+            assert job["status"] == QUEUED
+            finished = await runner.wait(job["job_id"], timeout=5)
+            failed = await runner.wait((await runner.submit("alice", "fail", None))["job_id"], timeout=5)
+            return job, finished, failed, runner.stats()
+        finally:
+            await runner.close()
+            store.close()
+
+    job, finished, failed, stats = asyncio.run(run())
+    assert finished["status"] == SUCCEEDED
+    assert finished["result"] == {"summary": "review", "files": ["step 1"]}
+    assert failed["status"] == FAILED
+    assert failed["error"]["status_code"] == 502
+    assert stats["succeeded"] == 1 and stats["failed"] == 1
+    # Spooled files are removed once a job finishes
+    assert not os.path.exists(tmp_path / "spool" / job["job_id"])
+
+
+def test_unfinished_jobs_resume_after_restart(tmp_path):
+    calls = []
+    path = str(tmp_path / "jobs.sqlite3")
+    spool = str(tmp_path / "spool")
+
+    async def first_process():
+        store = JobStore(path)
+        # The pipeline never gets past the gate, as if the process stopped mid-review
+        runner = JobRunner(store, lambda: FakePipeline(calls, asyncio.Event()), spool, concurrency=1)
+        await runner.start()
+        job_ids = [
+            (await runner.submit("alice", f"review {i}", [make_upload("p.txt", f"body {i}")]))["job_id"]
+            for i in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        await runner.close()
+        store.close()
+        return job_ids
+
+    async def second_process(job_ids):
+        store = JobStore(path)
+        runner = JobRunner(store, lambda: FakePipeline(calls), spool, concurrency=2)
+        await runner.start()
+        try:
+            return [await runner.wait(job_id, timeout=5) for job_id in job_ids]
+        finally:
+            await runner.close()
+            store.close()
+
+    job_ids = asyncio.run(first_process())
+    jobs = asyncio.run(second_process(job_ids))
+    assert [job["status"] for job in jobs] == [SUCCEEDED] * 3
+    assert sorted(calls) == [(f"review {i}", [f"body {i}"]) for i in range(3)]
+
+
+def test_full_queue_rejects_submissions(tmp_path):
+    async def run():
+        store = JobStore(str(tmp_path / "jobs.sqlite3"))
+        gate = asyncio.Event()
+        runner = JobRunner(store, lambda: FakePipeline([], gate), str(tmp_path / "spool"), concurrency=1, queue_depth=1)
+        await runner.start()
+        try:
+            await runner.submit("alice", "running", None)
+            await asyncio.sleep(0.01)
+            await runner.submit("alice", "queued", None)
+            with pytest.raises(JobQueueFullError):
+                await runner.submit("alice", "rejected", None)
+            return runner.stats()
+        finally:
+            await runner.close()
+            store.close()
+
+    stats = asyncio.run(run())
+    assert stats["rejected"] == 1 and stats["queued"] == 1
+
+
+def test_missing_spool_file_fails_the_job(tmp_path):
+    calls = []
+    spooled = tmp_path / "kept.txt"
+    spooled.write_text("body")
+
+    async def run():
+        store = JobStore(str(tmp_path / "jobs.sqlite3"))
+        # As if the spool directory lost a file while the process was down
+        await store.create("job-1", "alice", "review", [
+            {"path": str(spooled), "filename": "kept.txt", "content_type": "text/plain", "size": 4},
+            {"path": str(tmp_path / "gone.txt"), "filename": "gone.txt", "content_type": "text/plain", "size": 4},
+        ])
+        runner = JobRunner(store, lambda: FakePipeline(calls), str(tmp_path / "spool"), concurrency=1)
+        await runner.start()
+        try:
+            return await runner.wait("job-1", timeout=5), runner.stats()
+        finally:
+            await runner.close()
+            store.close()
+
+    job, stats = asyncio.run(run())
+    assert job["status"] == FAILED
+    assert job["error"]["status_code"] == 500
+    assert stats["running"] == 0 and stats["failed"] == 1
+    assert calls == []
+
+
+def test_long_poll_checks_the_owner_before_waiting():
+    class RecordingRunner:
+        def __init__(self):
+            self.waits = []
+
+        async def get(self, job_id):
+            return {
+                "job_id": job_id, "owner": "alice", "status": RUNNING, "result": None,
+                "error": None, "created_at": 0, "updated_at": 0,
+            }
+
+        async def wait(self, job_id, timeout):
+            self.waits.append(job_id)
+            return dict(await self.get(job_id), status=SUCCEEDED)
+
+    runner = RecordingRunner()
+    app.dependency_overrides[get_job_runner] = lambda: runner
+    try:
+        app.dependency_overrides[verify_firebase_token] = lambda: {"uid": "mallory"}
+        assert TestClient(app).get("/protocol-assistant/jobs/job-1?wait=30").status_code == 404
+        assert runner.waits == []
+
+        app.dependency_overrides[verify_firebase_token] = lambda: {"uid": "alice"}
+        response = TestClient(app).get("/protocol-assistant/jobs/job-1?wait=30")
+        assert response.status_code == 200 and response.json()["status"] == SUCCEEDED
+        assert runner.waits == ["job-1"]
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,66 @@
+# /tests/test_logging_config.py
+
+import json
+import logging
+import queue
+import sys
+
+from logging_config import SAMPLED, DroppingQueueHandler, JsonFormatter, Payload, SampleFilter
+
+
+def make_record(msg, *args, **extra):
+    record = logging.LogRecord("chat", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_payload_truncates_only_when_formatted():
+    class Exploding:
+        def __str__(self):
+            raise AssertionError("formatted a record that was never emitted")
+
+    logger = logging.getLogger("test.lazy")
+    logger.setLevel(logging.WARNING)
+    logger.info("Prompt: %s", Payload(Exploding()))
+
+    assert str(Payload("x" * 10, max_chars=4)) == "xxxx... [6 chars truncated]"
+    assert str(Payload({"a": 1})) == "{'a': 1}"
+
+
+def test_sample_filter_keeps_one_in_n_marked_records():
+    sample_filter = SampleFilter(every=10)
+    kept = [sample_filter.filter(make_record("line", **SAMPLED)) for _ in range(100)]
+
+    assert sum(kept) == 10
+    assert sample_filter.filter(make_record("unmarked"))
+
+
+def test_json_formatter_emits_one_object_per_record():
+    line = JsonFormatter().format(make_record("Loaded %d input prompts", 3))
+
+    entry = json.loads(line)
+    assert entry["message"] == "Loaded 3 input prompts"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "chat"
+
+
+def test_queue_handler_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(make_record("first"))
+    handler.handle(make_record("second"))
+
+    assert handler.queue.get_nowait().msg == "first"
+    assert handler.dropped == 1
+
+
+def test_queue_handler_leaves_the_callers_record_untouched():
+    handler = DroppingQueueHandler(queue.Queue())
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("chat", logging.ERROR, __file__, 1, "Failed %s", ("upload",), sys.exc_info())
+    handler.handle(record)
+
+    queued = handler.queue.get_nowait()
+    assert queued.msg == "Failed upload" and queued.exc_info is None and "ValueError: boom" in queued.exc_text
+    assert record.msg == "Failed %s" and record.args == ("upload",) and record.exc_info[0] is ValueError
@@ -0,0 +1,47 @@
+# /tests/test_metrics.py
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.metrics import Histogram, MetricsMiddleware, MetricsRegistry, span
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Test latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value, stage="upload")
+
+    lines = histogram.render()
+
+    assert 'latency_seconds_bucket{stage="upload",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="upload",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{stage="upload",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{stage="upload"} 4' in lines
+
+
+def test_registry_exports_collector_stats():
+    registry = MetricsRegistry()
+    registry.register_collector("review_cache", lambda: {"hits": 3, "misses": 1})
+
+    output = registry.render()
+
+    assert "protocol_assistant_review_cache_hits 3" in output
+    assert "protocol_assistant_review_cache_misses 1" in output
+
+
+def test_server_timing_header_lists_stages():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/work")
+    async def work():
+        with span("verify_token"):
+            pass
+        with span("upload"):
+            pass
+        return {"ok": True}
+
+    response = TestClient(app).get("/work")
+
+    stages = [entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")]
+    assert stages == ["verify_token", "upload", "total"]
@@ -0,0 +1,103 @@
+# /tests/test_prompt_catalogue.py
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from exceptions.danswer_exceptions import DanswerAPIError
+from models.config import ConfigSnapshot, DanswerEndpoints
+from services.chat_service import ProtocolReviewPipeline
+from services.prompt_catalogue import PromptCatalogue
+
+prompts = [
+    {"prompt": "GenericProtocolJSONParser", "content": "Summarise the protocol as JSON."},
+    {"prompt": "StepwiseProtocolJSONParser", "content": "List each step as JSON."},
+]
+
+
+def make_client(responses):
+    client = MagicMock()
+    calls = []
+
+    async def list_input_prompts(etag=None):
+        calls.append(etag)
+        await asyncio.sleep(0.01)
+        return responses[len(calls) - 1]
+
+    client.list_input_prompts = list_input_prompts
+    return client, calls
+
+
+def test_concurrent_lookups_share_one_fetch():
+    client, calls = make_client([(prompts, '"v1"')])
+    catalogue = PromptCatalogue(client)
+
+    async def run():
+        return await asyncio.gather(*(catalogue.get("GenericProtocolJSONParser") for _ in range(10)))
+
+    assert asyncio.run(run()) == ["Summarise the protocol as JSON."] * 10
+    assert calls == [None]
+
+
+def test_get_many_and_etag_revalidation():
+    client, calls = make_client([(prompts, '"v1"'), (None, '"v1"')])
+    catalogue = PromptCatalogue(client)
+
+    contents = asyncio.run(catalogue.get_many(["GenericProtocolJSONParser", "StepwiseProtocolJSONParser", "Missing"]))
+    assert contents == {
+        "GenericProtocolJSONParser": "Summarise the protocol as JSON.",
+        "StepwiseProtocolJSONParser": "List each step as JSON.",
+        "Missing": None,
+    }
+
+    # A 304 on revalidation keeps serving the cached index
+    catalogue.invalidate()
+    assert asyncio.run(catalogue.get("StepwiseProtocolJSONParser")) == "List each step as JSON."
+    assert calls == [None, '"v1"']
+
+
+def test_failed_refresh_serves_stale_index_until_retry(monkeypatch):
+    client = MagicMock()
+    calls = []
+
+    async def list_input_prompts(etag=None):
+        calls.append(etag)
+        if len(calls) > 1:
+            raise DanswerAPIError("Danswer unavailable", 503)
+        return prompts, '"v1"'
+
+    client.list_input_prompts = list_input_prompts
+    catalogue = PromptCatalogue(client)
+    asyncio.run(catalogue.get("GenericProtocolJSONParser"))
+
+    # During an outage only one lookup per retry interval goes upstream
+    catalogue.invalidate()
+    for _ in range(5):
+        assert asyncio.run(catalogue.get("GenericProtocolJSONParser")) == "Summarise the protocol as JSON."
+    assert len(calls) == 2
+
+    monkeypatch.setattr(catalogue, "_retry_at", 0.0)
+    asyncio.run(catalogue.get("GenericProtocolJSONParser"))
+    assert len(calls) == 3
+
+
+def test_pipeline_resolves_prompt_names_through_catalogue():
+    client, _ = make_client([(prompts, '"v1"')])
+    config = ConfigSnapshot(
+        endpoints=DanswerEndpoints(
+            send_message="/chat/send-message",
+            create_chat_session="/chat/create-chat-session",
+            upload_file="/chat/file",
+            input_prompt="/admin/input_prompt"
+        ),
+        prompt_sequence=("GenericProtocolJSONParser", "UnknownPrompt"),
+        version="test"
+    )
+
+    pipeline = ProtocolReviewPipeline(client, config, prompt_catalogue=PromptCatalogue(client))
+    # Names Danswer doesn't know are sent unchanged
+    assert asyncio.run(pipeline.resolve_prompts()) == ("Summarise the protocol as JSON.", "UnknownPrompt")
+
+    unavailable = MagicMock()
+    unavailable.list_input_prompts = AsyncMock(side_effect=DanswerAPIError("Danswer unavailable", 503))
+    pipeline = ProtocolReviewPipeline(unavailable, config, prompt_catalogue=PromptCatalogue(unavailable))
+    assert asyncio.run(pipeline.resolve_prompts()) == ("GenericProtocolJSONParser", "UnknownPrompt")
@@ -0,0 +1,121 @@
+# /tests/test_session_pool.py
+
+import asyncio
+import itertools
+from unittest.mock import MagicMock
+
+from exceptions.danswer_exceptions import DanswerAPIError
+from services.session_pool import ChatSessionPool
+
+
+def make_client(fail=False):
+    client = MagicMock()
+    counter = itertools.count(1)
+    calls = []
+
+    async def create_chat_session(persona_id=0):
+        calls.append(persona_id)
+        if fail:
+            raise DanswerAPIError("Danswer unavailable", 503)
+        return f"session-{next(counter)}"
+
+    client.create_chat_session = create_chat_session
+    return client, calls
+
+
+async def settle():
+    # Let the refill task run to completion
+    await asyncio.sleep(0.01)
+
+
+def test_pool_prewarms_and_hands_out_oldest_first():
+    client, calls = make_client()
+    pool = ChatSessionPool(client, size=3)
+
+    async def run():
+        await pool.start()
+        await settle()
+        prewarmed = len(calls)
+        acquired = [await pool.acquire(), await pool.acquire()]
+        await settle()
+        await pool.close()
+        return prewarmed, acquired
+
+    prewarmed, acquired = asyncio.run(run())
+    assert prewarmed == 3
+    assert acquired == ["session-1", "session-2"]
+    # The refill after each acquire tops the pool back up
+    assert pool.stats() == {"depth": 3, "hits": 2, "misses": 0, "expired": 0}
+
+
+def test_expired_sessions_are_dropped_unused():
+    client, calls = make_client()
+    pool = ChatSessionPool(client, size=2, max_age=60)
+
+    async def run():
+        await pool._refill()
+        # Age the pooled sessions past max_age
+        sessions = pool._sessions[0]
+        for index, (chat_session_id, _) in enumerate(list(sessions)):
+            sessions[index] = (chat_session_id, -1000.0)
+        return await pool.acquire()
+
+    assert asyncio.run(run()) == "session-3"
+    assert pool.stats()["expired"] == 2
+    assert pool.stats()["misses"] == 1
+
+
+def test_acquire_falls_back_to_creating_inline():
+    client, calls = make_client()
+    pool = ChatSessionPool(client, size=2)
+
+    # Nothing pooled yet, and a persona the pool doesn't cover
+    assert asyncio.run(pool.acquire()) == "session-1"
+    assert asyncio.run(pool.acquire(persona_id=7)) == "session-2"
+    assert calls == [0, 7]
+    assert pool.stats()["misses"] == 2
+
+
+def test_refill_failure_keeps_loop_running():
+    client, calls = make_client(fail=True)
+    pool = ChatSessionPool(client, size=2)
+    pool.REFILL_RETRY_INTERVAL = 0.01
+
+    async def run():
+        await pool.start()
+        await asyncio.sleep(0.05)
+        running = not pool._refill_task.done()
+        await pool.close()
+        return running
+
+    assert asyncio.run(run()) is True
+    assert pool.stats()["depth"] == 0
+
+
+def test_unexpected_refill_error_keeps_loop_running():
+    client, calls = make_client()
+    create_chat_session = client.create_chat_session
+    failures = iter([AttributeError("'NoneType' object has no attribute 'get'")])
+
+    async def flaky_create_chat_session(persona_id=0):
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        return await create_chat_session(persona_id)
+
+    client.create_chat_session = flaky_create_chat_session
+    pool = ChatSessionPool(client, size=2)
+    pool.REFILL_RETRY_INTERVAL = 0.01
+
+    async def run():
+        await pool.start()
+        await asyncio.sleep(0.05)
+        # Ask for another refill, as an acquire would; this one succeeds
+        pool._refill_needed.set()
+        await asyncio.sleep(0.05)
+        running = not pool._refill_task.done()
+        await pool.close()
+        return running
+
+    assert asyncio.run(run()) is True
+    assert pool.stats()["depth"] == 2
@@ -0,0 +1,70 @@
+# /tests/test_streaming.py
+
+import asyncio
+import json
+
+from utils.streaming import DanswerStreamParser, TokenDelta, Citation, FinalMessage, StreamError
+
+
+def ndjson(*packets):
+    return b"".join(json.dumps(packet).encode() + b"\n" for packet in packets)
+
+
+async def iterate(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def collect_events(parser, chunks):
+    async def run():
+        return [event async for event in parser.events(iterate(chunks))]
+    return asyncio.run(run())
+
+
+def test_events_across_chunk_boundaries():
+    stream = ndjson(
+        {"answer_piece": "Hel"},
+        {"answer_piece": "lo"},
+        {"citation_num": 1, "document_id": "doc-1"},
+        {"message_id": 2, "parent_message": 1, "message": "Hello"},
+    )
+    # Split into small chunks so lines straddle chunk boundaries
+    chunks = [stream[i:i + 7] for i in range(0, len(stream), 7)]
+
+    parser = DanswerStreamParser()
+    events = collect_events(parser, chunks)
+
+    assert [type(event) for event in events] == [TokenDelta, TokenDelta, Citation, FinalMessage]
+    assert "".join(event.text for event in events if isinstance(event, TokenDelta)) == "Hello"
+    assert parser.last_message == {"message_id": 2, "parent_message": 1, "message": "Hello"}
+    assert parser.token_count == 2
+
+
+def test_trailing_line_without_newline_and_errors():
+    stream = ndjson({"answer_piece": "x"}) + b"not json\n" + json.dumps({"error": "boom"}).encode()
+
+    parser = DanswerStreamParser()
+    events = collect_events(parser, [stream])
+
+    assert isinstance(events[-1], StreamError)
+    assert events[-1].message == "boom"
+    assert parser.last_message == {"error": "boom"}
+
+
+def test_token_deltas_are_not_kept_as_last_message():
+    parser = DanswerStreamParser()
+    parser.feed(ndjson({"message_id": 3, "message": "done"}, {"answer_piece": ""}))
+
+    assert parser.last_message == {"message_id": 3, "message": "done"}
+
+
+def test_long_line_split_across_many_chunks():
+    message = "step " * 20_000
+    stream = ndjson({"answer_piece": "a"}, {"message_id": 4, "parent_message": 3, "message": message}, {"answer_piece": "b"})
+    chunks = [stream[i:i + 64] for i in range(0, len(stream), 64)]
+
+    parser = DanswerStreamParser()
+    events = [event for chunk in chunks for event in parser.feed(chunk)] + parser.close()
+
+    assert [type(event) for event in events] == [TokenDelta, FinalMessage, TokenDelta]
+    assert events[1].data["message"] == message
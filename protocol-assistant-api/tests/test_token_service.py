@@ -0,0 +1,139 @@
+# /tests/test_token_service.py
+
+import asyncio
+import datetime
+import time
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+from services.token_service import FIREBASE_ISSUER_PREFIX, GoogleKeySet, StaticKeySet, TokenVerifier
+
+PROJECT_ID = "lab-test-project"
+KEY_ID = "test-key"
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    private_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    signer = crypt.RSASigner.from_string(private_pem, key_id=KEY_ID)
+    certs = {KEY_ID: cert.public_bytes(serialization.Encoding.PEM).decode()}
+    return signer, certs
+
+
+def make_token(signer, **overrides):
+    now = int(time.time())
+    claims = {
+        "iss": FIREBASE_ISSUER_PREFIX + PROJECT_ID,
+        "aud": PROJECT_ID,
+        "sub": "user-123",
+        "iat": now,
+        "exp": now + 3600,
+    }
+    claims.update(overrides)
+    return jwt.encode(signer, claims).decode()
+
+
+def test_verify_caches_valid_tokens(signing_key):
+    signer, certs = signing_key
+    verifier = TokenVerifier(StaticKeySet(certs), PROJECT_ID)
+    token = make_token(signer)
+
+    claims = asyncio.run(verifier.verify(token))
+    assert claims["uid"] == "user-123"
+    assert asyncio.run(verifier.verify(token)) == claims
+    assert verifier.stats() == {"hits": 1, "misses": 1, "failures": 0, "entries": 1}
+
+
+def test_verify_rejects_wrong_audience_and_issuer(signing_key):
+    signer, certs = signing_key
+    verifier = TokenVerifier(StaticKeySet(certs), PROJECT_ID)
+
+    with pytest.raises(ValueError):
+        asyncio.run(verifier.verify(make_token(signer, aud="other-project")))
+    with pytest.raises(ValueError):
+        asyncio.run(verifier.verify(make_token(signer, iss="https://example.com/")))
+    assert verifier.stats()["failures"] == 2
+    assert verifier.stats()["entries"] == 0
+
+
+def test_cached_entries_expire_at_exp_claim(signing_key):
+    signer, certs = signing_key
+    verifier = TokenVerifier(StaticKeySet(certs), PROJECT_ID)
+    token = make_token(signer)
+    asyncio.run(verifier.verify(token))
+
+    # Pretend the token has since expired
+    cache_key = next(iter(verifier._cache))
+    verifier._cache[cache_key] = (time.time() - 1, verifier._cache[cache_key][1])
+    asyncio.run(verifier.verify(token))
+    assert verifier.stats()["misses"] == 2
+
+
+class FakeGoogleKeySet(GoogleKeySet):
+    """GoogleKeySet serving canned responses instead of fetching them"""
+
+    def __init__(self, responses):
+        super().__init__()
+        self.responses = responses
+        self.fetches = 0
+
+    async def _fetch(self):
+        await asyncio.sleep(0.01)
+        certs = self.responses[min(self.fetches, len(self.responses) - 1)]
+        self.fetches += 1
+        return certs, 3600.0
+
+
+def test_concurrent_cert_lookups_fetch_once(signing_key):
+    _, certs = signing_key
+    key_set = FakeGoogleKeySet([certs])
+
+    async def run():
+        return await asyncio.gather(*(key_set.get_certs() for _ in range(10)))
+
+    assert asyncio.run(run()) == [certs] * 10
+    assert key_set.fetches == 1
+
+
+def test_unknown_kid_forces_one_refresh(signing_key):
+    signer, certs = signing_key
+    # The first fetch predates the key that signed the token
+    key_set = FakeGoogleKeySet([{"old-key": "unused"}, certs])
+    verifier = TokenVerifier(key_set, PROJECT_ID)
+
+    async def run():
+        return await asyncio.gather(*(verifier.verify(make_token(signer, sub=f"user-{i}")) for i in range(5)))
+
+    assert [claims["uid"] for claims in asyncio.run(run())] == [f"user-{i}" for i in range(5)]
+    assert key_set.fetches == 2
+
+    # Unknown keys don't trigger another fetch within the forced refresh interval
+    other_signer = crypt.RSASigner.from_string(
+        rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ),
+        key_id="rotated-key",
+    )
+    with pytest.raises(ValueError):
+        asyncio.run(verifier.verify(make_token(other_signer)))
+    assert key_set.fetches == 2
@@ -0,0 +1,83 @@
+# /tests/test_upload_service.py
+
+import asyncio
+import io
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import UploadFile
+
+from services.upload_cache import FileDescriptorCache
+from services.upload_service import UploadService
+
+
+def make_upload(filename, content):
+    return UploadFile(io.BytesIO(content), filename=filename)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = FileDescriptorCache(str(tmp_path / "upload_cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def forwarded():
+    """Patches the Danswer upload; records each batch and returns an ID per file name"""
+    batches = []
+
+    async def forward(self, files):
+        batches.append([file.filename for file in files])
+        return {"files": [{"id": f"id-{file.filename}", "type": "plain_text", "name": file.filename} for file in files]}
+
+    with patch.object(UploadService, "_forward", forward):
+        yield batches
+
+
+def forward_files(files, cache):
+    return asyncio.run(UploadService(MagicMock()).forward_files(files, cache))
+
+
+def test_identical_content_is_uploaded_once(cache, forwarded):
+    files = [make_upload("a.txt", b"same"), make_upload("b.txt", b"same"), make_upload("c.txt", b"other")]
+
+    response = forward_files(files, cache)
+
+    assert forwarded == [["a.txt", "c.txt"]]
+    # Every file keeps its own name, duplicates share the uploaded ID
+    assert response["files"] == [
+        {"id": "id-a.txt", "type": "plain_text", "name": "a.txt"},
+        {"id": "id-a.txt", "type": "plain_text", "name": "b.txt"},
+        {"id": "id-c.txt", "type": "plain_text", "name": "c.txt"},
+    ]
+
+
+def test_cache_hit_skips_upload(cache, forwarded):
+    forward_files([make_upload("a.txt", b"protocol")], cache)
+    response = forward_files([make_upload("renamed.txt", b"protocol")], cache)
+
+    assert forwarded == [["a.txt"]]
+    assert response["files"] == [{"id": "id-a.txt", "type": "plain_text", "name": "renamed.txt"}]
+    assert cache.stats() == {"hits": 1, "misses": 1}
+
+
+def test_partial_hit_merges_descriptors_in_request_order(cache, forwarded):
+    forward_files([make_upload("b.txt", b"B")], cache)
+
+    response = forward_files([make_upload("a.txt", b"A"), make_upload("b2.txt", b"B"), make_upload("c.txt", b"C")], cache)
+
+    assert forwarded == [["b.txt"], ["a.txt", "c.txt"]]
+    assert [(d["id"], d["name"]) for d in response["files"]] == [
+        ("id-a.txt", "a.txt"), ("id-b.txt", "b2.txt"), ("id-c.txt", "c.txt")
+    ]
+
+
+def test_expired_entry_is_uploaded_again(cache, forwarded):
+    forward_files([make_upload("a.txt", b"protocol")], cache)
+    # Danswer may have deleted the file since; the ID is only trusted for max_age
+    cache.max_age = 0
+    cache._conn.execute("UPDATE file_descriptors SET uploaded_at = uploaded_at - 1")
+
+    forward_files([make_upload("again.txt", b"protocol")], cache)
+    assert forwarded == [["a.txt"], ["again.txt"]]